@@ -0,0 +1,74 @@
+"""Memory per row of the ANES files with default dtypes and with their typed readers.
+
+`ANES_EXAMPLE_SCHEMA` describes the 177 columns of the 2016 pilot example
+that chapter 2 reads. `--path` defaults to `anes_cleaned.csv`, the copy of
+all 1,200 rows of that file which chapter 2 saves; pass `ANES_EXAMPLE_URL`
+to read the published file instead. The full 2019 pilot file
+(`anes_pilot2019_clean.csv`, 3,165 rows, `--pilot`) has other columns, so
+the schema does not apply to it; it is measured with `load_anes()` and
+`ANES_CATEGORIES` instead. Run from the repository root:
+
+    python -m benchmarks.bench_anes_schema --copies 50
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from datapipe.anes import load_anes, memory_per_row, read_anes_example
+from datapipe.httpcache import local_path
+
+
+def measure(label, read):
+    start = time.perf_counter()
+    df = read()
+    elapsed = time.perf_counter() - start
+    del df
+    tracemalloc.start()
+    df = read()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{:<22} {:8.3f}s  {:8.1f} bytes/row  peak {:7.1f} MB".format(
+        label, elapsed, memory_per_row(df), peak / 2**20))
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="anes_cleaned.csv",
+                        help="the 2016 pilot example, a file or URL")
+    parser.add_argument("--pilot", default="anes_pilot2019_clean.csv",
+                        help="the 2019 pilot file, a file or URL such as ANES_URL")
+    parser.add_argument("--copies", type=int, default=1,
+                        help="stack the file this many times to make a larger input")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = local_path(args.path)
+        if args.copies > 1:
+            base = pd.read_csv(path, index_col=0)
+            path = os.path.join(tmp, "anes_example.csv")
+            pd.concat([base] * args.copies, ignore_index=True).to_csv(path)
+        print("{} rows".format(len(pd.read_csv(path, usecols=[0]))))
+
+        default = measure("pd.read_csv", lambda: pd.read_csv(path, index_col=0))
+        compact = measure("read_anes_example", lambda: read_anes_example(path, index_col=0))
+        print("dtypes before: {}".format(default.dtypes.astype(str).value_counts().to_dict()))
+        print("dtypes after:  {}".format(compact.dtypes.astype(str).value_counts().to_dict()))
+
+        pilot = local_path(args.pilot)
+        print("\n2019 pilot: {} rows".format(len(pd.read_csv(pilot, usecols=[0]))))
+        # The first read parses the CSV and writes the sidecar, the second reads the sidecar
+        sidecar = os.path.join(tmp, "anes_pilot.feather")
+        default = measure("pd.read_csv", lambda: pd.read_csv(pilot))
+        typed = measure("load_anes", lambda: load_anes(pilot, sidecar=sidecar))
+        print("dtypes before: {}".format(default.dtypes.astype(str).value_counts().to_dict()))
+        print("dtypes after:  {}".format(typed.dtypes.astype(str).value_counts().to_dict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare one `requests.get()` per call with `APIClient` against a throttling Census stub.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_api --states 56 --latency 0.05 --throttle 0.1
+"""
+
+import argparse
+import time
+
+import requests
+
+from benchmarks.fixtures import CensusStub, serve
+from datapipe.api import APIClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--states", type=int, default=56)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle", type=float, default=0.1,
+                        help="share of requests the stub answers with 429")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="client-side limit in requests per second")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    stub = CensusStub(throttle=args.throttle, retry_after=0)
+    path = "/data/2019/pep/charagegroups"
+    params = [{'get': 'GEO_ID,POP', 'for': 'state:{:02d}'.format(s), 'key': 'demo'}
+              for s in range(1, args.states + 1)]
+
+    with serve({path: stub}, latency=args.latency) as url:
+        url += path
+
+        start = time.perf_counter()
+        failed = sum(requests.get(url, params=p).status_code != 200 for p in params)
+        print("serial requests.get      {:8.3f}s  {} of {} got 429".format(
+            time.perf_counter() - start, failed, len(params)))
+
+        with APIClient(url, backoff=0.01) as client:
+            start = time.perf_counter()
+            for p in params:
+                client.get(p)
+            print("APIClient.get (pooled)   {:8.3f}s  {} requests, {} retries".format(
+                time.perf_counter() - start, client.requests, client.retried))
+
+        with APIClient(url, rate=args.rate, limit=args.limit, backoff=0.01) as client:
+            start = time.perf_counter()
+            client.gather(params)
+            print("APIClient.gather         {:8.3f}s  {} requests, {} retries".format(
+                time.perf_counter() - start, client.requests, client.retried))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Cold and warm runs of a Census fan-out through `APIClient` with a `ResponseCache`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_apicache --states 56 --latency 0.05
+"""
+
+import argparse
+import tempfile
+import time
+
+from benchmarks.fixtures import CensusStub, serve
+from datapipe.api import APIClient
+from datapipe.apicache import ResponseCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--states", type=int, default=56)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub = CensusStub()
+    path = "/data/2019/pep/charagegroups"
+    params = [{'get': 'GEO_ID,POP', 'for': 'state:{:02d}'.format(s)}
+              for s in range(1, args.states + 1)]
+
+    with tempfile.TemporaryDirectory() as tmp, serve({path: stub}, latency=args.latency) as url:
+        url += path
+        cases = [("no cache", lambda: APIClient(url, params={'key': 'a'})),
+                 ("cold cache", lambda: APIClient(url, params={'key': 'a'},
+                                                  cache=ResponseCache(tmp))),
+                 ("disk hits, new key", lambda: APIClient(url, params={'key': 'b'},
+                                                          cache=ResponseCache(tmp)))]
+        for label, make in cases:
+            client = make()
+            start = time.perf_counter()
+            client.gather(params)
+            print("{:<22} {:8.3f}s  {} requests".format(label, time.perf_counter() - start,
+                                                      client.requests))
+        start = time.perf_counter()
+        client.gather(params)
+        print("{:<22} {:8.3f}s  {}".format("memory hits", time.perf_counter() - start,
+                                           client.cache.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""The chapter 4 Census loop versus `read_census()` over year and state shards.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_census --years 5 --states 20 --rows 1000 --latency 0.05
+"""
+
+import argparse
+import json
+import time
+
+import pandas as pd
+import requests
+
+from benchmarks.fixtures import CensusStub, serve
+from datapipe.census import STATE_FIPS, census_shards, read_census
+
+VARIABLES = ['NAME', 'GEO_ID', 'B01003_001E', 'B19013_001E', 'B25077_001E']
+
+
+def chapter_loop(shards):
+    """One requests.get() per shard, json.loads(), then a frame from the list of lists"""
+
+    frames = []
+    for year, url, params in shards:
+        r = requests.get(url, params=params)
+        table = json.loads(r.text)
+        df = pd.DataFrame(table[1:], columns=table[0])
+        df.insert(0, 'year', year)
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    for name in ['B01003_001E', 'B19013_001E', 'B25077_001E']:
+        df[name] = pd.to_numeric(df[name]).where(lambda v: v != -666666666)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--states", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=1000, help="tracts per state")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    years = list(range(2019 - args.years + 1, 2020))
+    states = STATE_FIPS[:args.states]
+    stub = CensusStub(rows=args.rows)
+    routes = {"/data/{}/acs/acs5".format(year): stub for year in years}
+
+    with serve(routes, latency=args.latency) as base:
+        base += "/data"
+        shards = census_shards('acs/acs5', VARIABLES, years, 'tract:*', states=states,
+                               base_url=base)
+        start = time.perf_counter()
+        loop = chapter_loop(shards)
+        print("requests.get loop        {:8.3f}s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        df = read_census('acs/acs5', VARIABLES, years, 'tract:*', states=states,
+                         base_url=base)
+        print("read_census              {:8.3f}s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        for _, url, params in shards:
+            stub.table(params)
+        print("  (stub formatting alone {:8.3f}s)".format(time.perf_counter() - start))
+
+    assert len(df) == len(loop)
+    print("{} shards, {} rows; dtypes: {}".format(
+        len(shards), len(df), ', '.join('{}={}'.format(k, v) for k, v in df.dtypes.items())))
+
+
+if __name__ == "__main__":
+    main()
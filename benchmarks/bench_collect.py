@@ -0,0 +1,64 @@
+"""Compare growing a data frame inside a loop with `FrameCollector`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_collect --pages 250 500 1000 2000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from datapipe.collect import FrameCollector
+
+
+def page(i, rows):
+    return pd.DataFrame({'time': ['{}:00 AM'.format(i % 12)] * rows,
+                         'artist': ['artist {}'.format(i)] * rows,
+                         'song': ['song {}'.format(j) for j in range(rows)],
+                         'album': ['album {}'.format(i)] * rows})
+
+
+def grow(pages, rows):
+    total = page(0, rows)
+    for i in range(1, pages):
+        total = pd.concat([total, page(i, rows)])
+    return total
+
+
+def collect(pages, rows):
+    collector = FrameCollector()
+    for i in range(pages):
+        collector.add(page(i, rows))
+    return collector.to_frame()
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[250, 500, 1000, 2000])
+    parser.add_argument("--rows", type=int, default=20)
+    args = parser.parse_args()
+
+    print("{:>6} {:>12} {:>12} {:>12} {:>12}".format(
+        "pages", "loop s", "loop MiB", "collect s", "collect MiB"))
+    for pages in args.pages:
+        loop_s, loop_mb = measure(grow, pages, args.rows)
+        coll_s, coll_mb = measure(collect, pages, args.rows)
+        print("{:>6} {:>12.3f} {:>12.1f} {:>12.3f} {:>12.1f}".format(
+            pages, loop_s, loop_mb, coll_s, coll_mb))
+
+
+if __name__ == "__main__":
+    main()
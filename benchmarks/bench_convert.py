@@ -0,0 +1,71 @@
+"""Excel, Stata and SPSS loads with pandas versus `datapipe.convert.ColumnarStore`.
+
+Run from the repository root (Excel needs openpyxl, SPSS needs pyreadstat):
+
+    python -m benchmarks.bench_convert --rows 50000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from datapipe.convert import ColumnarStore
+
+
+def write_files(directory, rows, seed=0):
+    """An NBA-style workbook, a Stata poll with value labels and, if possible, an SPSS file"""
+
+    rng = np.random.default_rng(seed)
+    games = pd.DataFrame({'team': rng.choice(['ATL', 'BOS', 'CHI', 'DAL'], rows),
+                          'pts': rng.integers(80, 130, rows),
+                          'fg_pct': rng.random(rows).round(3)})
+    poll = pd.DataFrame({'q1': pd.Categorical(rng.choice(['Approve', 'Disapprove'], rows)),
+                         'q2': pd.Categorical(rng.choice(['Yes', 'No', "Don't know"], rows)),
+                         'age': rng.integers(18, 90, rows).astype('int16')})
+    files = {}
+    files['excel'] = os.path.join(directory, 'nba.xlsx')
+    with pd.ExcelWriter(files['excel']) as writer:
+        games.to_excel(writer, sheet_name='NBA-TEAM-SAMPLE', index=False)
+        games.head(30).to_excel(writer, sheet_name='TEAMS', index=False)
+    files['stata'] = os.path.join(directory, 'cbspoll.dta')
+    poll.to_stata(files['stata'], write_index=False)
+    try:
+        import pyreadstat
+    except ImportError:
+        return files
+    files['spss'] = os.path.join(directory, 'survey.sav')
+    codes = pd.DataFrame({'q1': rng.choice([1.0, 2.0], rows), 'age': rng.integers(18, 90, rows)})
+    pyreadstat.write_sav(codes, files['spss'],
+                         variable_value_labels={'q1': {1.0: 'Approve', 2.0: 'Disapprove'}})
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_files(tmp, args.rows)
+        store = ColumnarStore(os.path.join(tmp, 'store'))
+        for kind, path in files.items():
+            pandas_read = getattr(pd, 'read_' + kind)
+            store_read = getattr(store, 'read_' + kind)
+            start = time.perf_counter()
+            pandas_read(path)
+            print("{:<6} pandas        {:8.4f}s".format(kind, time.perf_counter() - start))
+            for label in ["first read", "later read"]:
+                start = time.perf_counter()
+                store_read(path)
+                print("{:<6} {:<13} {:8.4f}s".format(kind, label, time.perf_counter() - start))
+            start = time.perf_counter()
+            store_read(path, columns=['age'] if kind != 'excel' else ['pts'])
+            print("{:<6} one column    {:8.4f}s".format(kind, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
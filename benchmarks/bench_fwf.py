@@ -0,0 +1,80 @@
+"""Compare `pd.read_fwf()` with the memory-mapped fixed-width reader.
+
+Generates a synthetic file laid out like `njcc33850.dat` from chapter 2. Run
+from the repository root:
+
+    python -m benchmarks.bench_fwf --rows 2000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from datapipe.fwf import read_fixed_width
+
+DATANAMES = ['psraid', 'sample', 'int_date', 'area',
+             'state', 'cregion', 'density', 'usr', 'cc1', 'cc1a',
+             'cc2', 'cc3', 'cc4', 'cc5', 'cc6', 'cc7', 'ql1', 'ql1a',
+             'qc1', 'hh1', 'employ', 'par', 'sex', 'age', 'educ2',
+             'hisp', 'race', 'inc', 'income', 'reg', 'party',
+             'partyln', 'iphoneus', 'hphoneus', 'recage', 'receduc',
+             'racethn', 'standwt', 'raceos']
+DATAWIDTHS = [6, 1, 6, 3, 2, 1, 1, 3, 1, 1,
+              1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+              1, 1, 1, 2, 1, 1, 1, 2, 1, 1,
+              1, 1, 1, 1, 1, 1, 1, 4, 30]
+
+
+def write_fixture(path, rows, seed=0, block=250000):
+    """Write `rows` records in blocks, building each block as a byte matrix"""
+
+    rng = np.random.default_rng(seed)
+    reclen = sum(DATAWIDTHS) + 1
+    with open(path, 'wb') as f:
+        for offset in range(0, rows, block):
+            n = min(block, rows - offset)
+            out = np.full((n, reclen), ord(' '), dtype=np.uint8)
+            out[:, -1] = ord('\n')
+            pos = 0
+            for name, w in zip(DATANAMES, DATAWIDTHS):
+                if name == 'raceos':
+                    text = np.where(rng.random(n) < 0.02, 'Other: mixed', '')
+                    field = np.char.ljust(text.astype('S{}'.format(w)), w)
+                elif name == 'standwt':
+                    field = np.char.mod('%4.2f', rng.random(n) * 3).astype('S4')
+                else:
+                    values = rng.integers(0, 10 ** w, n)
+                    field = np.char.rjust(values.astype('S{}'.format(w)), w)
+                out[:, pos:pos + w] = field.view(np.uint8).reshape(n, w)
+                pos += w
+            out.tofile(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "njcc.dat")
+        write_fixture(path, args.rows)
+        print("{} records, {:.1f} MiB".format(args.rows, os.path.getsize(path) / 2**20))
+
+        start = time.perf_counter()
+        fast = read_fixed_width(path, widths=DATAWIDTHS, names=DATANAMES)
+        print("read_fixed_width   {:8.3f}s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        slow = pd.read_fwf(path, widths=DATAWIDTHS, header=None, names=DATANAMES)
+        print("pd.read_fwf        {:8.3f}s".format(time.perf_counter() - start))
+
+        different = [c for c in DATANAMES if not fast[c].equals(slow[c])]
+        print("columns that differ:", different or "none")
+
+
+if __name__ == "__main__":
+    main()
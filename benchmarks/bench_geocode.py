@@ -0,0 +1,89 @@
+"""One `gmaps.geocode()` call per row versus `geocode_many()` with a local stand-in geocoder.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_geocode --rows 2000 --distinct 200 --latency 0.01
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from datapipe.geocode import GeocodeStore, geocode_many
+
+STREETS = ['Bonnycastle Drive', 'University Avenue', 'Main Street', 'Emmet Street North',
+           'Jefferson Park Avenue', 'Rugby Road', 'Alderman Road', 'Ivy Road']
+SPELLINGS = [lambda a: a, str.upper, lambda a: a.replace('Drive', 'Dr.').replace('Avenue', 'Ave'),
+             lambda a: '  ' + a.replace(',', ' ,') + ' ', lambda a: a.replace('Street', 'St.')]
+
+
+class FakeGeocoder:
+    """Answers like `gmaps.geocode()` after `latency` seconds, and counts the calls"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        if address.startswith('0 '):
+            return []
+        digest = hashlib.sha256(address.encode('utf-8')).digest()
+        lat = 38.0 + digest[0] / 2550
+        lng = -78.5 + digest[1] / 2550
+        return [{'formatted_address': address.title(),
+                 'geometry': {'location': {'lat': lat, 'lng': lng}}}]
+
+
+def survey_addresses(rows, distinct, seed=0):
+    """Survey-style addresses: `distinct` places, each written several ways"""
+
+    rng = np.random.default_rng(seed)
+    places = ['{} {}, Charlottesville, VA 22904'.format(i, STREETS[i % len(STREETS)])
+              for i in range(1, distinct + 1)]
+    picks = rng.integers(0, distinct, rows)
+    spellings = rng.integers(0, len(SPELLINGS), rows)
+    return pd.Series([SPELLINGS[s](places[p]) for p, s in zip(picks, spellings)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=None)
+    args = parser.parse_args()
+
+    addresses = survey_addresses(args.rows, args.distinct)
+
+    gmaps = FakeGeocoder(args.latency)
+    start = time.perf_counter()
+    locations = [gmaps.geocode(a)[0]['geometry']['location'] for a in addresses]
+    print("one call per row         {:8.3f}s  {} calls".format(time.perf_counter() - start,
+                                                              gmaps.calls))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = GeocodeStore(os.path.join(tmp, 'geocodes.db'))
+        for label in ["geocode_many, cold", "geocode_many, stored"]:
+            gmaps = FakeGeocoder(args.latency)
+            start = time.perf_counter()
+            result = geocode_many(addresses, gmaps.geocode, store=store, workers=args.workers,
+                                  rate=args.rate)
+            print("{:<24} {:8.3f}s  {} calls".format(label, time.perf_counter() - start,
+                                                   gmaps.calls))
+        store.close()
+    print(result['status'].value_counts().to_dict(), len(locations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Cold and warm load times for remote CSVs read through `datapipe.httpcache`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_httpcache --rows 200000 --files 5
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import serve
+from datapipe.httpcache import HTTPCache, read_csv
+
+
+def anes_like_csv(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'caseid': np.arange(1, rows + 1)})
+    for name in ['ftobama', 'fttrump', 'fthrc', 'ftsanders', 'ftpolice', 'ftsci']:
+        df[name] = rng.integers(0, 101, rows)
+    df['state'] = rng.integers(1, 57, rows)
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    routes = {"/localdata/anes_example_{}.csv".format(i): anes_like_csv(args.rows, i)
+              for i in range(args.files)}
+    with serve(routes, latency=args.latency) as base, tempfile.TemporaryDirectory() as tmp:
+        urls = [base + path for path in routes]
+
+        start = time.perf_counter()
+        for url in urls:
+            pd.read_csv(url)
+        print("pd.read_csv(url)      {:8.3f}s".format(time.perf_counter() - start))
+
+        cache = HTTPCache(tmp)
+        for label in ["cold cache", "warm cache"]:
+            start = time.perf_counter()
+            for url in urls:
+                read_csv(url, cache=cache)
+            print("{:<20}  {:8.3f}s".format(label, time.perf_counter() - start))
+
+        cache.offline = True
+        start = time.perf_counter()
+        for url in urls:
+            read_csv(url, cache=cache)
+        print("{:<20}  {:8.3f}s".format("offline", time.perf_counter() - start))
+        print(cache.stats())
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
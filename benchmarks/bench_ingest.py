@@ -0,0 +1,79 @@
+"""Sequential reads versus `datapipe.ingest` for the chapter 9 state-level sources.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingest --latency 0.2 --rows 50000
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import serve
+from datapipe.httpcache import HTTPCache, read_csv
+from datapipe.ingest import ingest
+
+
+def state_files(rows, seed=0):
+    """Bodies shaped like the chapter 9 files: CSV, tab with two title lines, semicolon"""
+
+    rng = np.random.default_rng(seed)
+    states = np.array(['State {}'.format(i) for i in range(rows)])
+
+    def frame(*names):
+        df = pd.DataFrame({'State': states})
+        for name in names:
+            df[name] = rng.normal(50, 10, rows).round(2)
+        return df
+
+    income = b"Per capita income by state\nSource: BEA\n" + frame(
+        'Per Capita Income', 'Median Income').to_csv(sep="\t", index=False).encode()
+    return {
+        '/state_elections.csv': (frame('Trump', 'Clinton', 'Johnson').to_csv(index=False).encode(),
+                                 {}),
+        '/state_income.txt': (income, {'sep': "\t", 'header': 2}),
+        '/state_economics.txt': (frame('GDP', 'Unemployment').to_csv(sep=";", index=False).encode(),
+                                 {'sep': ";"}),
+        '/state_area.csv': (frame('Area').to_csv(index=False).encode(), {}),
+        '/crosswalk.csv': (frame('fips', 'division').to_csv(index=False).encode(), {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    files = state_files(args.rows)
+    routes = {path: body for path, (body, _) in files.items()}
+    with serve(routes, latency=args.latency) as base:
+        manifest = {path.strip('/').split('.')[0]: dict(options, path=base + path)
+                    for path, (_, options) in files.items()}
+
+        for label in ["cold cache", "warm cache"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                cache = HTTPCache(tmp)
+                if label == "warm cache":
+                    ingest(manifest, cache=cache)
+
+                start = time.perf_counter()
+                for spec in manifest.values():
+                    options = dict(spec)
+                    read_csv(options.pop('path'), cache=cache, **options)
+                sequential = time.perf_counter() - start
+                if label == "cold cache":
+                    cache.clear()
+
+                _, report = ingest(manifest, cache=cache)
+                print("{}: sequential {:.3f}s, ingest {:.3f}s".format(
+                    label, sequential, report.loc['total', 'seconds']))
+                print(report.round(3).to_string())
+                cache.close()
+
+
+if __name__ == "__main__":
+    main()
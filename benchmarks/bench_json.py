@@ -0,0 +1,80 @@
+"""Encode and decode times of each `datapipe.jsonio` backend on chapter-shaped payloads.
+
+Run from the repository root (install orjson and ujson to compare all three):
+
+    python -m benchmarks.bench_json --records 100000
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from datapipe import jsonio
+
+
+def payloads(records, seed=0):
+    """Users-style records, a Census-style table and a frame's records with numpy values"""
+
+    rng = random.Random(seed)
+    users = [{'id': i, 'name': 'User {}'.format(i), 'email': 'user{}@example.org'.format(i),
+              'address': {'city': 'Gwenborough',
+                          'geo': {'lat': str(round(rng.uniform(-90, 90), 4)),
+                                  'lng': str(round(rng.uniform(-180, 180), 4))}},
+              'company': {'name': 'Company {}'.format(i % 100)}}
+             for i in range(records)]
+    census = [['NAME', 'B01001_001E', 'state', 'county']] + [
+        ['County {}'.format(i), str(rng.randint(1000, 10000000)), '{:02d}'.format(i % 56),
+         '{:03d}'.format(i % 1000)] for i in range(records)]
+    np_rng = np.random.default_rng(seed)
+    wine = pd.DataFrame({'country': np_rng.choice(['US', 'France', 'Italy'], records),
+                         'points': np_rng.integers(80, 101, records),
+                         'price': np_rng.random(records) * 100,
+                         'variety': np_rng.choice(['Cabernet Sauvignon', 'Pinot Noir'], records)})
+    # What a loop over df.to_dict() hands to json.dumps(): numpy scalars
+    numpy_records = [{'points': np.int64(p), 'price': np.float64(x)}
+                     for p, x in zip(wine['points'].to_numpy(), wine['price'].to_numpy())]
+    return {'users': users, 'census': census, 'numpy records': numpy_records}, wine
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data, wine = payloads(args.records)
+    print("{:<10} {:<16} {:>9} {:>9}".format("backend", "payload", "dumps", "loads"))
+    # The chapters' own calls, for reference
+    for label, obj in data.items():
+        text = json.dumps(obj, default=jsonio.default)
+        dump = best_of(lambda: json.dumps(obj, default=jsonio.default), args.repeat)
+        load = best_of(lambda: json.loads(text), args.repeat)
+        print("{:<10} {:<16} {:>8.3f}s {:>8.3f}s".format("plain json", label, dump, load))
+    elapsed = best_of(lambda: json.loads(wine.to_json(orient='records')), args.repeat)
+    print("{:<10} {:<16} {:>9} {:>8.3f}s".format("plain json", "to_records", "", elapsed))
+    for backend in jsonio.available_backends():
+        jsonio.set_backend(backend)
+        for label, obj in data.items():
+            text = jsonio.dumps(obj)
+            dump = best_of(lambda: jsonio.dumps(obj), args.repeat)
+            load = best_of(lambda: jsonio.loads(text), args.repeat)
+            print("{:<10} {:<16} {:>8.3f}s {:>8.3f}s".format(backend, label, dump, load))
+        elapsed = best_of(lambda: jsonio.to_records(wine), args.repeat)
+        print("{:<10} {:<16} {:>9} {:>8.3f}s".format(backend, "to_records", "", elapsed))
+
+
+if __name__ == "__main__":
+    main()
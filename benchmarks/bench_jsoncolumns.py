@@ -0,0 +1,64 @@
+"""`to_json()` / `pd.read_json()` versus `datapipe.jsoncolumns` for split and values orients.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_jsoncolumns --rows 1000000
+"""
+
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from datapipe.jsoncolumns import encode_json_columns, read_json_columns
+
+
+def users_frame(rows, seed=0):
+    """A frame shaped like `users_df` in chapter 3, plus a float and a boolean column"""
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'id': np.arange(1, rows + 1),
+                         'name': ['User {}'.format(i) for i in range(rows)],
+                         'email': ['user{}@example.org'.format(i) for i in range(rows)],
+                         'lat': rng.uniform(-90, 90, rows).round(4),
+                         'active': rng.random(rows) < 0.5,
+                         'city': rng.choice(['Gwenborough', 'Wisokyburgh', 'McKenziehaven'], rows)})
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def frame_from_lists(text, orient):
+    doc = json.loads(text)
+    if orient == 'values':
+        return pd.DataFrame(doc)
+    return pd.DataFrame(doc['data'], columns=doc['columns'], index=doc['index'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = users_frame(args.rows)
+    for orient in ['split', 'values']:
+        text = df.to_json(orient=orient)
+        data = text.encode('utf-8')
+        print("orient={} ({:.1f} MiB)".format(orient, len(data) / 2**20))
+        for label, fn in [
+                ("to_json", lambda: df.to_json(orient=orient)),
+                ("encode_json_columns", lambda: encode_json_columns(df, orient)),
+                ("pd.read_json", lambda: pd.read_json(io.StringIO(text), orient=orient)),
+                ("json.loads + DataFrame", lambda: frame_from_lists(text, orient)),
+                ("read_json_columns", lambda: read_json_columns(data, orient))]:
+            print("  {:<24} {:8.3f}s".format(label, timed(fn)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""`pd.read_json(lines=True)` and `to_json(lines=True)` versus `datapipe.jsonl`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_jsonl --rows 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from datapipe.jsonl import read_jsonl, write_jsonl
+
+
+def users_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'id': np.arange(rows),
+                       'name': ['User {}'.format(i) for i in range(rows)],
+                       'email': ['user{}@example.org'.format(i) for i in range(rows)],
+                       'score': rng.random(rows),
+                       'active': rng.random(rows) < 0.5,
+                       'company': rng.choice(['Romaguera-Crona', 'Deckow-Crist', 'Keebler LLC'],
+                                             rows)})
+    df.loc[::7, 'score'] = np.nan
+    return df
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    df = users_frame(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.jsonl')
+        cases = [
+            ("to_json(lines=True)",
+             lambda: df.to_json(path, orient='records', lines=True, date_format='iso')),
+            ("write_jsonl", lambda: write_jsonl(df, path)),
+            ("read_json(lines=True)", lambda: pd.read_json(path, lines=True)),
+            ("read_jsonl, 1 worker", lambda: read_jsonl(path, workers=1)),
+            ("read_jsonl, {} workers".format(args.workers),
+             lambda: read_jsonl(path, workers=args.workers, chunk_bytes=4 << 20)),
+        ]
+        for label, fn in cases:
+            elapsed, peak = measure(fn)
+            print("{:<26} {:8.3f}s  peak {:8.1f} MiB".format(label, elapsed, peak))
+        print("{} rows, {:.1f} MiB".format(args.rows, os.path.getsize(path) / 2**20))
+
+
+if __name__ == "__main__":
+    main()
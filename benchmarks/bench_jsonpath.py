@@ -0,0 +1,70 @@
+"""A list comprehension, `pd.json_normalize()` and `compile_paths()` on users-style records.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_jsonpath --records 1000000
+"""
+
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from datapipe.jsonpath import compile_paths
+
+PATHS = ['name', 'email', 'company.name', 'address.geo.lat']
+
+
+def users(records, seed=0):
+    """Records shaped like users.json, with some companies and coordinates missing"""
+
+    rng = random.Random(seed)
+    out = []
+    for i in range(records):
+        user = {'id': i + 1, 'name': 'User {}'.format(i), 'username': 'user{}'.format(i),
+                'email': 'user{}@example.org'.format(i),
+                'address': {'street': 'Kulas Light', 'city': 'Gwenborough',
+                            'geo': {'lat': str(round(rng.uniform(-90, 90), 4)),
+                                    'lng': str(round(rng.uniform(-180, 180), 4))}},
+                'company': {'name': 'Company {}'.format(i % 100), 'bs': 'harness markets'}}
+        if i % 10 == 0:
+            del user['company']
+        if i % 13 == 0:
+            user['address']['geo'] = None
+        out.append(user)
+    return out
+
+
+def comprehension(records):
+    rows = [[u['name'], u['email'],
+             u['company']['name'] if 'company' in u else None,
+             float(u['address']['geo']['lat']) if u['address']['geo'] else None]
+            for u in records]
+    return pd.DataFrame(rows, columns=PATHS)
+
+
+def normalized(records):
+    df = pd.json_normalize(records)[PATHS]
+    df['address.geo.lat'] = df['address.geo.lat'].astype(float)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1000000)
+    args = parser.parse_args()
+
+    records = users(args.records)
+    extract = compile_paths(PATHS, dtypes={'address.geo.lat': 'float64'})
+    print("{} records".format(args.records))
+    for label, fn in [("list comprehension", comprehension),
+                      ("json_normalize", normalized),
+                      ("compile_paths", extract)]:
+        start = time.perf_counter()
+        fn(records)
+        print("{:<20} {:8.3f}s".format(label, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""`json.loads()` + `pd.json_normalize()` versus streaming the same Reddit-style listing.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_jsonstream --records 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from datapipe.jsonstream import iter_normalized, normalize_stream
+
+RECORD_PATH = ["data", "children"]
+META = ['kind', ['data', 'after']]
+
+
+def write_listing(path, records, seed=0):
+    """A listing shaped like r/popular/top.json with `records` posts"""
+
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write('{"kind": "Listing", "data": {"modhash": "", "dist": %d, "children": [' % records)
+        for i in range(records):
+            post = {'kind': 't3', 'data': {
+                'subreddit': rng.choice(['pics', 'news', 'aww', 'gaming']),
+                'title': 'Post number {}'.format(i), 'score': rng.randint(0, 100000),
+                'upvote_ratio': round(rng.random(), 2), 'over_18': rng.random() < 0.05,
+                'author': 'user{}'.format(rng.randint(0, 5000)),
+                'preview': {'enabled': True, 'images': [{'id': str(i)}]},
+                'selftext': 'lorem ipsum ' * rng.randint(0, 40)}}
+            f.write((',' if i else '') + json.dumps(post))
+        f.write('], "after": "t3_next", "before": null}}')
+
+
+def whole(path):
+    with open(path) as f:
+        reddit_json = json.loads(f.read())
+    return pd.json_normalize(reddit_json, record_path=RECORD_PATH, meta=META, meta_prefix="meta")
+
+
+def streamed(path):
+    return normalize_stream(path, record_path=RECORD_PATH, meta=META, meta_prefix="meta")
+
+
+def batches_only(path):
+    rows = 0
+    for batch in iter_normalized(path, record_path=RECORD_PATH, meta=META, meta_prefix="meta"):
+        rows += len(batch)
+    return rows
+
+
+def measure(fn, path):
+    start = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(path)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "top.json")
+        write_listing(path, args.records)
+        print("{} records, {:.1f} MiB".format(args.records, os.path.getsize(path) / 2**20))
+        for label, fn in [("json.loads + json_normalize", whole),
+                          ("normalize_stream", streamed),
+                          ("iter_normalized, batches only", batches_only)]:
+            elapsed, peak = measure(fn, path)
+            print("{:<30} {:8.3f}s  peak {:8.1f} MiB".format(label, elapsed, peak))
+
+
+if __name__ == "__main__":
+    main()
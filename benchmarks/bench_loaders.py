@@ -0,0 +1,295 @@
+"""Time and peak memory of every chapter 2 loading scenario, across parser engines.
+
+Fixtures are generated locally, so the suite runs offline. Each scenario
+(comma, tab, semicolon, fixed-width, comments, header offset, sentinels, no
+header, Excel, Stata) is read with every available engine at each row count.
+Results are written as JSON so runs can be compared over time.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_loaders --rows 10000 100000 --output loaders.json
+
+Each measurement runs in a forked child process. Peak memory is the rise in
+the child's resident set size (Linux's VmHWM, reset before the read), which
+also counts memory allocated by Arrow. Elsewhere it falls back to tracemalloc,
+which sees only Python allocations.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from datapipe.fwf import read_fixed_width, widths_to_colspecs
+
+THERMOMETERS = ['ftobama', 'fttrump', 'fthrc', 'ftsanders', 'ftpolice', 'ftfem', 'ftmuslim',
+                'ftsci']
+CODED = ['vote16', 'pid7', 'ideo5', 'educ', 'marstat', 'state']
+TOPLINES = ("ANES 2016 pilot study\nGenerated fixture for the loader benchmarks\n"
+            "Values of -999 mark missing answers\n")
+
+
+def anes_like(rows, seed=0):
+    """A frame shaped like the ANES example: an id, thermometers, codes and a text column"""
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'caseid': np.arange(1, rows + 1)})
+    for name in THERMOMETERS:
+        df[name] = rng.integers(0, 101, rows)
+    for name in CODED:
+        df[name] = rng.integers(1, 9, rows)
+    df['weight'] = rng.random(rows).round(6)
+    df['religpew_t'] = rng.choice(['none', 'Christian', 'Buddhist', 'aa', ''], rows)
+    return df
+
+
+def _write_text(path, df, sep=',', toplines='', comments=False, header=True):
+    body = df.to_csv(sep=sep, index=False, header=header)
+    if comments:
+        # A stray comment line after every 50 records, as in anes_example_comments.txt
+        lines = body.splitlines(True)
+        start = 1 if header else 0
+        out = lines[:start]
+        for i, line in enumerate(lines[start:]):
+            if i % 50 == 0:
+                out.append("@ interviewer note {}\n".format(i))
+            out.append(line)
+        body = ''.join(out)
+    with open(path, 'w') as f:
+        f.write(toplines + body)
+
+
+def _write_fwf(path, df):
+    widths = [max(len(str(v)) for v in df[c].astype(str)) for c in df.columns]
+    widths = [max(w, len(c)) for w, c in zip(widths, df.columns)]
+    with open(path, 'w') as f:
+        for row in df.astype(str).itertuples(index=False):
+            f.write(''.join(v.rjust(w) for v, w in zip(row, widths)) + '\n')
+    return widths_to_colspecs(widths)
+
+
+def _excel_engines():
+    engines = []
+    for engine, module in [('openpyxl', 'openpyxl'), ('calamine', 'python_calamine')]:
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        engines.append(engine)
+    return engines
+
+
+def _csv_engines():
+    engines = ['c', 'python']
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return engines
+    return engines + ['pyarrow']
+
+
+def scenarios(directory, rows, max_excel_rows):
+    """Yield (name, build) for every scenario at one row count
+
+    build() writes the fixture and returns (path, {engine: loader}, columns), where
+    columns are what every loader should return, `rows` rows of them.
+    """
+
+    df = anes_like(rows)
+    names = list(df.columns)
+    numeric = df.drop(columns='religpew_t')
+
+    def csv_case(name, kwargs, **write):
+        def build():
+            path = os.path.join(directory, '{}_{}.txt'.format(name, rows))
+            _write_text(path, df, **write)
+            return path, {engine: (lambda e=engine: pd.read_csv(path, engine=e, **kwargs))
+                          for engine in _csv_engines()}, names
+        return name, build
+
+    yield csv_case('comma', {})
+    yield csv_case('tab', {'sep': '\t'}, sep='\t')
+    yield csv_case('semicolon', {'sep': ';'}, sep=';')
+    yield csv_case('header_offset', {'header': 3}, toplines=TOPLINES)
+    yield csv_case('comments', {'header': 3, 'comment': '@'}, toplines=TOPLINES, comments=True)
+
+    def sentinels():
+        missing = df.copy()
+        missing.loc[np.random.default_rng(1).random(rows) < 0.05, 'fttrump'] = -999
+        path = os.path.join(directory, 'sentinels_{}.csv'.format(rows))
+        _write_text(path, missing)
+        return path, {engine: (lambda e=engine: pd.read_csv(path, engine=e, na_values=['-999']))
+                      for engine in _csv_engines()}, names
+    yield 'sentinels', sentinels
+
+    yield csv_case('no_header', {'header': None, 'names': names}, header=False)
+
+    def fixed_width():
+        path = os.path.join(directory, 'fixed_width_{}.dat'.format(rows))
+        colspecs = _write_fwf(path, numeric)
+        return path, {
+            'python': lambda: pd.read_fwf(path, colspecs=colspecs, header=None),
+            'datapipe': lambda: read_fixed_width(path, colspecs=colspecs),
+        }, list(range(len(colspecs)))
+    yield 'fixed_width', fixed_width
+
+    if rows <= max_excel_rows and _excel_engines():
+        def excel():
+            path = os.path.join(directory, 'excel_{}.xlsx'.format(rows))
+            with pd.ExcelWriter(path) as writer:
+                df.to_excel(writer, sheet_name='TEAMS', index=False)
+            return path, {
+                engine: (lambda e=engine: pd.read_excel(path, sheet_name='TEAMS', engine=e))
+                for engine in _excel_engines()}, names
+        yield 'excel', excel
+
+    def stata():
+        path = os.path.join(directory, 'stata_{}.dta'.format(rows))
+        frame = df.copy()
+        frame['religpew_t'] = pd.Categorical(frame['religpew_t'].replace('', 'missing'))
+        frame.to_stata(path, write_index=False)
+        return path, {'pandas': lambda: pd.read_stata(path)}, names
+    yield 'stata', stata
+
+
+def _peak_rss_reset():
+    """Reset the kernel's peak-RSS counter; False where that is not possible"""
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _rss_kib(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def _unsupported(err):
+    """True for pandas refusing an option the engine does not have, as opposed to a failed read"""
+
+    return isinstance(err, ValueError) and 'option is not supported with the' in str(err)
+
+
+def _measure_in_child(loader, expected, conn):
+    try:
+        if _peak_rss_reset():
+            before = _rss_kib('VmRSS')
+            start = time.perf_counter()
+            df = loader()
+            elapsed = time.perf_counter() - start
+            peak, method = (_rss_kib('VmHWM') - before) * 1024, 'rss'
+        else:
+            tracemalloc.start()
+            start = time.perf_counter()
+            df = loader()
+            elapsed = time.perf_counter() - start
+            peak, method = tracemalloc.get_traced_memory()[1], 'tracemalloc'
+            tracemalloc.stop()
+        shape, columns = expected
+        if df.shape != shape or list(df.columns) != columns:
+            conn.send({'status': 'wrong', 'shape': list(df.shape),
+                       'error': 'read {} rows with columns {}, expected {} rows with {}'.format(
+                           df.shape[0], list(df.columns)[:3], shape[0], columns[:3])})
+            return
+        conn.send({'status': 'ok', 'seconds': elapsed, 'peak_bytes': peak,
+                   'memory_method': method, 'shape': list(df.shape)})
+    except Exception as err:
+        conn.send({'status': 'unsupported' if _unsupported(err) else 'error',
+                   'error': '{}: {}'.format(type(err).__name__, err)})
+    finally:
+        conn.close()
+
+
+def measure(loader, expected, repeat):
+    """Best time and peak memory of `repeat` runs, each in a fresh forked process
+
+    `expected` is the (shape, columns) the loader should return; a run that reads
+    anything else is reported with status 'wrong' rather than timed.
+    """
+
+    ctx = multiprocessing.get_context('fork')
+    best = None
+    for _ in range(repeat):
+        parent, child = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_measure_in_child, args=(loader, expected, child))
+        proc.start()
+        child.close()
+        result = parent.recv()
+        proc.join()
+        if result['status'] != 'ok':
+            return result
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-excel-rows", type=int, default=100000,
+                        help="skip Excel above this size; writing the fixture is slow")
+    parser.add_argument("--only", nargs="+", help="run only these scenarios")
+    parser.add_argument("--output", default="bench_loaders.json")
+    args = parser.parse_args()
+
+    results = []
+    print("{:<14} {:<9} {:>8} {:>10} {:>10}".format("scenario", "engine", "rows", "seconds",
+                                                    "peak MiB"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            for name, build in scenarios(tmp, rows, args.max_excel_rows):
+                if args.only and name not in args.only:
+                    continue
+                path, loaders, columns = build()
+                expected = ((rows, len(columns)), columns)
+                for engine, loader in loaders.items():
+                    result = measure(loader, expected, args.repeat)
+                    result.update({'scenario': name, 'engine': engine, 'rows': rows,
+                                   'file_bytes': os.path.getsize(path)})
+                    results.append(result)
+                    if result['status'] == 'ok':
+                        print("{:<14} {:<9} {:>8} {:>10.4f} {:>10.1f}".format(
+                            name, engine, rows, result['seconds'],
+                            result['peak_bytes'] / 2**20))
+                    else:
+                        print("{:<14} {:<9} {:>8} {:>10} ({})".format(
+                            name, engine, rows, result['status'], result['error'][:60]))
+
+    report = {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    try:
+        import pyarrow
+        report['pyarrow'] = pyarrow.__version__
+    except ImportError:
+        pass
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("wrote {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
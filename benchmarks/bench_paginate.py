@@ -0,0 +1,99 @@
+"""The chapter 4 tweet loop versus `PageCursor` over a fake paginated search API.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_paginate --pages 20 --per-page 100 --latency 0.05 --work 0.03
+
+`--work` is the time spent processing each page (saving it, say), which the
+prefetching cursor overlaps with fetching the next page.
+"""
+
+import argparse
+import datetime
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from datapipe.paginate import PageCursor
+
+
+class FakeSearch:
+    """A search endpoint that returns tweet-like objects one page at a time.
+
+    `search(max_id)` returns `(tweets, next_max_id)` after `latency` seconds,
+    like a cursor-paginated API; `next_max_id` is None after the last page.
+    """
+
+    def __init__(self, pages, per_page, latency):
+        self.total = pages * per_page
+        self.per_page = per_page
+        self.latency = latency
+        self.calls = 0
+        self.start = datetime.datetime(2021, 1, 1)
+
+    def tweet(self, i):
+        return SimpleNamespace(
+            id=i, text='Go Hoos! #uva tweet {}'.format(i),
+            created_at=self.start + datetime.timedelta(minutes=i),
+            user=SimpleNamespace(screen_name='fan{}'.format(i % 500)))
+
+    def search(self, max_id=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        first = self.total if max_id is None else max_id
+        ids = range(first - 1, max(first - 1 - self.per_page, -1), -1)
+        tweets = [self.tweet(i) for i in ids]
+        return tweets, (ids[-1] if ids and ids[-1] > 0 else None)
+
+    def items(self):
+        """Tweets one at a time, fetching a page whenever the last one runs out"""
+
+        max_id = None
+        while True:
+            tweets, max_id = self.search(max_id)
+            yield from tweets
+            if max_id is None:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--work", type=float, default=0.03)
+    parser.add_argument("--prefetch", type=int, default=2)
+    args = parser.parse_args()
+
+    api = FakeSearch(args.pages, args.per_page, args.latency)
+    start = time.perf_counter()
+    msgs = []
+    for i, tweet in enumerate(api.items(), 1):
+        msg = [tweet.text, tweet.created_at, tweet.user.screen_name]
+        msgs.append(tuple(msg))
+        if i % args.per_page == 0:
+            time.sleep(args.work)
+    loop = pd.DataFrame(msgs, columns=['text', 'created_at', 'user'])
+    print("tuple loop       {:8.3f}s".format(time.perf_counter() - start))
+
+    api = FakeSearch(args.pages, args.per_page, args.latency)
+    start = time.perf_counter()
+    cursor = PageCursor(api.search, {'text': 'text', 'created_at': 'created_at',
+                                     'user': 'user.screen_name'},
+                        prefetch=args.prefetch, attributes=True)
+    frames = 0
+    for df in cursor:
+        time.sleep(args.work)
+        frames += 1
+    print("PageCursor       {:8.3f}s  {} frames".format(time.perf_counter() - start, frames))
+
+    api = FakeSearch(args.pages, args.per_page, args.latency)
+    cursor = PageCursor(api.search, {'text': 'text', 'created_at': 'created_at',
+                                     'user': 'user.screen_name'},
+                        prefetch=args.prefetch, attributes=True)
+    pd.testing.assert_frame_equal(cursor.to_frame(), loop)
+
+
+if __name__ == "__main__":
+    main()
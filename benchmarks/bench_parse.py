@@ -0,0 +1,77 @@
+"""CPU time per page and peak memory for the playlist extraction strategies.
+
+Run from the repository root, optionally on saved Spinitron pages:
+
+    python -m benchmarks.bench_parse --html-dir saved_pages/
+"""
+
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from benchmarks.fixtures import playlist_html
+from datapipe.spider import TARGETS, playlist_columns
+
+STRAINER = SoupStrainer(['span', 'td'],
+                        attrs={'class': sorted({cls for _, cls in TARGETS})})
+
+
+def strainer_columns(html):
+    """A middle ground: BeautifulSoup, but only the target tags are built"""
+
+    soup = BeautifulSoup(html, 'html.parser', parse_only=STRAINER)
+    columns = {c: [] for c in ['time', 'artist', 'song', 'album']}
+    for tag in soup.find_all(['span', 'td']):
+        for cls in tag.get('class', []):
+            column = TARGETS.get((tag.name, cls))
+            if column is not None:
+                columns[column].append(tag.string)
+                break
+    return columns
+
+
+STRATEGIES = {
+    'full soup': lambda html: playlist_columns(html, fast=False),
+    'strainer': strainer_columns,
+    'stream': playlist_columns,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--html-dir", help="directory of saved playlist .html files")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--spins", type=int, default=40)
+    args = parser.parse_args()
+
+    if args.html_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.html_dir, "*.htm*"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append(f.read())
+    else:
+        pages = [playlist_html(args.spins, seed=i) for i in range(args.pages)]
+
+    reference = [playlist_columns(html, fast=False) for html in pages]
+    print("{:<10} {:>14} {:>14}".format("strategy", "CPU ms/page", "peak KiB"))
+    for name, fn in STRATEGIES.items():
+        start = time.process_time()
+        results = [fn(html) for html in pages]
+        cpu = (time.process_time() - start) / len(pages) * 1000
+
+        tracemalloc.start()
+        fn(pages[0])
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+        same = results == reference
+        print("{:<10} {:>14.3f} {:>14.1f}{}".format(
+            name, cpu, peak, "" if same else "  (columns differ!)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Time the chapter 5 crawl against recorded responses at several latencies and bandwidths.
+
+Record the live pages once, then benchmark offline as often as needed:
+
+    python -m benchmarks.replay record wnrn.zip https://spinitron.com/WNRN
+    python -m benchmarks.bench_replay --archive wnrn.zip --latency 0 0.05 0.2
+
+Without `--archive`, a synthetic Spinitron site from `benchmarks.fixtures` is
+recorded into a temporary archive first.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.fixtures import playlist_html, serve
+from benchmarks.replay import ReplayServer, record
+from datapipe.spider import SPINITRON, playlist_urls, wnrn_crawl, wnrn_spider_many
+
+
+def synthetic_archive(path, pages):
+    links = ["/WNRN/pl/{}/".format(i) for i in range(pages)]
+    routes = {"/WNRN": playlist_html(20, links=links)}
+    routes.update((link, playlist_html(20, seed=i)) for i, link in enumerate(links))
+    with serve(routes) as base:
+        record([base + path for path in routes], path)
+        return base + "/WNRN"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive", default=None)
+    parser.add_argument("--url", default=SPINITRON + "WNRN", help="landing page in the archive")
+    parser.add_argument("--pages", type=int, default=50, help="pages in the synthetic archive")
+    parser.add_argument("--latency", type=float, nargs="+", default=[0.0, 0.05])
+    parser.add_argument("--bandwidth", type=float, nargs="+", default=[None, 1e6],
+                        help="bytes per second")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url
+        if args.archive is None:
+            args.archive = os.path.join(tmp, "wnrn.zip")
+            url = synthetic_archive(args.archive, args.pages)
+
+        for latency in args.latency:
+            for bandwidth in args.bandwidth:
+                with ReplayServer(args.archive, latency=latency, bandwidth=bandwidth) as replay:
+                    landing = requests.get(replay.url(url))
+                    urls = playlist_urls(landing.text, base=landing.url)
+                    label = "latency {:.2f}s, {}".format(
+                        latency, "{:.1f} MB/s".format(bandwidth / 1e6) if bandwidth else "unlimited")
+                    start = time.perf_counter()
+                    wnrn_spider_many(urls)
+                    serial = time.perf_counter() - start
+                    start = time.perf_counter()
+                    wnrn_crawl(urls)
+                    crawl = time.perf_counter() - start
+                    print("{:<32} serial {:7.3f}s   async {:7.3f}s   ({} pages)".format(
+                        label, serial, crawl, len(urls)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compare the serial WNRN spider with the asynchronous crawler.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_spider --pages 100 --latency 0.05
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.fixtures import playlist_html, serve
+from datapipe.spider import wnrn_crawl, wnrn_spider, wnrn_spider_many
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--spins", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-host", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    routes = {"/WNRN/pl/{}/".format(i): playlist_html(args.spins, seed=i)
+              for i in range(args.pages)}
+
+    with serve(routes, latency=args.latency) as base:
+        urls = [base + path for path in routes]
+
+        start = time.perf_counter()
+        serial = pd.concat([wnrn_spider(u) for u in urls], ignore_index=True)
+        print("serial requests.get        {:8.3f}s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        wnrn_spider_many(urls)
+        print("serial wnrn_spider_many    {:8.3f}s".format(time.perf_counter() - start))
+
+        for per_host in args.per_host:
+            start = time.perf_counter()
+            crawled = wnrn_crawl(urls, limit=per_host, per_host=per_host)
+            print("async per_host={:<3d}        {:8.3f}s".format(
+                per_host, time.perf_counter() - start))
+            assert crawled.equals(serial)
+
+    print("{} pages, {} rows".format(args.pages, len(serial)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Peak memory of a full read versus chunked streaming as files grow.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_stream --rows 100000 400000 1600000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from datapipe.stream import aggregate_csv
+
+COLUMNS = ['ftobama', 'fttrump', 'fthrc', 'ftsanders', 'ftpolice']
+
+
+def write_fixture(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({c: rng.integers(0, 101, rows) for c in COLUMNS})
+    df.loc[rng.random(rows) < 0.05, 'fttrump'] = -999
+    df['state'] = rng.integers(1, 57, rows)
+    df.to_csv(path, index=False)
+
+
+def full_read(path):
+    df = pd.read_csv(path, na_values=-999)
+    return df.groupby('state')[COLUMNS].mean()
+
+
+def streamed(path):
+    return aggregate_csv(path, by='state', columns=COLUMNS, stats=('mean',),
+                         chunksize=50000, na_values=-999)
+
+
+def measure(fn, path):
+    start = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - start
+    # Memory is traced in a second run: tracemalloc slows the first one down
+    tracemalloc.start()
+    fn(path)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 400000, 1600000])
+    args = parser.parse_args()
+
+    print("{:>9} {:>10} {:>10} {:>10} {:>10}".format(
+        "rows", "full s", "full MiB", "stream s", "stream MiB"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, "anes_{}.csv".format(rows))
+            write_fixture(path, rows)
+            full = measure(full_read, path)
+            stream = measure(streamed, path)
+            print("{:>9} {:>10.3f} {:>10.1f} {:>10.3f} {:>10.1f}".format(rows, *(full + stream)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Repeated `to_csv()` / `to_parquet()` calls versus one `write_many()` pass.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_writers --copies 50
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from datapipe.writers import write_many
+
+NAMES = ["anes_cleaned.csv", "anes_cleaned.txt", "anes_cleaned.csv.gz", "anes_cleaned.parquet"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="anes_cleaned.csv")
+    parser.add_argument("--copies", type=int, default=50,
+                        help="stack the file this many times to make a larger frame")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.path, index_col=0)
+    df = pd.concat([base] * args.copies, ignore_index=True)
+    print("{} rows x {} columns".format(*df.shape))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, name) for name in NAMES]
+
+        start = time.perf_counter()
+        df.to_csv(paths[0])
+        df.to_csv(paths[1], sep="\t")
+        df.to_csv(paths[2])
+        df.to_parquet(paths[3])
+        print("to_csv x3 + to_parquet  {:8.3f}s".format(time.perf_counter() - start))
+
+        reference = pd.read_csv(paths[1], sep="\t")
+        start = time.perf_counter()
+        write_many(df, paths, workers=args.workers)
+        print("write_many              {:8.3f}s".format(time.perf_counter() - start))
+
+        same = reference.equals(pd.read_csv(paths[1], sep="\t"))
+        print("tab file reads back the same: {}".format(same))
+
+
+if __name__ == "__main__":
+    main()
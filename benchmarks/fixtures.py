@@ -0,0 +1,164 @@
+"""Local HTTP fixtures for the benchmarks, so nothing here touches a live site."""
+
+import contextlib
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+ARTISTS = ['Wilco', 'Alabama Shakes', 'Khruangbin', 'The National', 'Big Thief',
+           'Leon Bridges', 'Grateful Dead', 'Courtney Barnett']
+WORDS = ['river', 'night', 'gold', 'blue', 'home', 'ghost', 'summer', 'light']
+
+
+def playlist_html(n_spins=20, links=(), seed=0):
+    """Build a page shaped like a Spinitron playlist, with `n_spins` songs"""
+
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_spins):
+        rows.append(
+            '<tr class="spin-item">'
+            '<td class="spin-time"><a href="#">{}:{:02d} AM</a></td>'
+            '<td class="spin-text"><span class="artist">{}</span> '
+            '<span class="song">{}</span> '
+            '<span class="release">{}</span></td></tr>'.format(
+                1 + i // 60, i % 60, rng.choice(ARTISTS),
+                ' '.join(rng.sample(WORDS, 2)).title(),
+                ' '.join(rng.sample(WORDS, 3)).title()))
+    anchors = ''.join('<a href="{}">Playlist {}</a>'.format(h, h) for h in links)
+    return ('<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8">'
+            '<title>WNRN – Independent Music Radio</title></head><body>'
+            '<table class="table">{}</table>'
+            '<div class="recent-playlists"><a href="/WNRN/dj/1/">DJ</a>{}</div>'
+            '</body></html>').format(''.join(rows), anchors)
+
+
+class CensusStub:
+    """A route that answers like the Census API, and sometimes refuses with 429.
+
+    The body is a Census-style list of lists built from the query: a header
+    row, then `rows` rows for a `*` geography (one otherwise), with the `get`
+    variables followed by the geography codes. Numbers are quoted, as the
+    Census sends them, and about one in fifty is the missing-value code
+    -666666666. A request is throttled with probability `throttle`, or
+    whenever more than `rate` requests arrived in the last second. Throttled
+    responses carry `Retry-After: retry_after`. `requests` and `throttled`
+    count the calls.
+    """
+
+    def __init__(self, throttle=0.0, rate=None, retry_after=None, rows=1, seed=0):
+        self.rows = rows
+        self.throttle = throttle
+        self.rate = rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self._recent = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, params):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0] + [now]
+            limited = self.rate is not None and len(self._recent) > self.rate
+            if limited or self._rng.random() < self.throttle:
+                self.throttled += 1
+                headers = {"Content-Type": "application/json"}
+                if self.retry_after is not None:
+                    headers["Retry-After"] = str(self.retry_after)
+                return 429, headers, '{"error": "rate limit exceeded"}'
+        return 200, {"Content-Type": "application/json;charset=utf-8"}, self.table(params)
+
+    def table(self, params):
+        names = params.get('get', 'NAME').split(',')
+        # 'in' levels, then the 'for' level: 'state:01 county:*' -> state, county
+        levels = []
+        for clause in (params.get('in', ''), params.get('for', 'state:*')):
+            parts = clause.split(':')
+            for i, level in enumerate(parts[:-1]):
+                code = parts[i + 1].split(' ')[0]
+                if clause is not params.get('for') and code == '*':
+                    code = '001'
+                levels.append((level.split(' ', 1)[-1] if i else level, code))
+        # The same query gives the same numbers, whatever API key it carries
+        rng = random.Random(json.dumps({k: v for k, v in params.items() if k != 'key'},
+                                       sort_keys=True))
+        count = self.rows if levels[-1][1] == '*' else 1
+        table = [names + [level for level, _ in levels]]
+        for r in range(count):
+            codes = [code for _, code in levels[:-1]]
+            codes.append('{:03d}'.format(r + 1) if levels[-1][1] == '*' else levels[-1][1])
+            row = []
+            for name in names:
+                if name == 'NAME':
+                    row.append('Area {} of {}'.format(codes[-1], ' '.join(codes[:-1]) or 'US'))
+                elif name == 'GEO_ID':
+                    row.append('0500000US' + ''.join(codes))
+                elif rng.random() < 0.02:
+                    row.append('-666666666')
+                else:
+                    row.append(str(rng.randrange(100, 10**7)))
+            table.append(row + codes)
+        return json.dumps(table)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; don't let Nagle stall keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        route = self.server.routes.get(path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if route is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        status, headers = 200, {"Content-Type": "text/html; charset=utf-8"}
+        if callable(route):
+            # A handler: called with the query parameters, returns (status, headers, body)
+            status, extra, route = route(dict(parse_qsl(query)))
+            headers.update(extra)
+        body = route.encode('utf-8') if isinstance(route, str) else route
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+@contextlib.contextmanager
+def serve(routes, latency=0.0):
+    """Serve a dict of path -> body on localhost, yielding the base URL"""
+
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.routes = routes
+    server.latency = latency
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}".format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
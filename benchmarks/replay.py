@@ -0,0 +1,286 @@
+"""Record live HTTP responses once, then serve them from localhost for benchmarking.
+
+Chapters 3, 4 and 5 fetch from jsonplaceholder, reddit, Wikipedia, the Census
+API and Spinitron. Timings against live sites change from run to run, and the
+sites rate-limit repeated runs. `ReplayServer` stands in for those sites: each
+origin (scheme and host) gets its own port on 127.0.0.1, so absolute links
+such as Spinitron's `/WNRN/pl/...` keep working. `url()` maps a live URL to
+its local stand-in::
+
+    with ReplayServer("chapters.zip", latency=0.08, bandwidth=2e6) as replay:
+        wnrn_crawl(playlist_urls(html, base=replay.url(SPINITRON)))
+        census = APIClient(replay.url(CENSUS_API))
+
+With `record=True`, requests the archive cannot answer are fetched from the
+live origin and saved when the server closes. The archive is a zip file
+holding an `index.json` and one deflated body per response. Requests are
+matched by `datapipe.apicache.fingerprint()`, so the order of the query
+parameters does not matter, and API keys are neither matched nor stored.
+Conditional requests are answered with 304 when the stored ETag or
+Last-Modified date matches.
+
+To record the chapter URLs in `CHAPTER_URLS`, or serve an archive::
+
+    python -m benchmarks.replay record chapters.zip
+    python -m benchmarks.replay serve chapters.zip --latency 0.08 --bandwidth 2e6
+"""
+
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from datapipe.apicache import SECRET_PARAMS, fingerprint
+
+CHAPTER_URLS = {
+    'ch3': ["https://jsonplaceholder.typicode.com/users",
+            "https://jsonplaceholder.typicode.com/posts",
+            "http://www.reddit.com/r/popular/top.json"],
+    'ch4': ["https://en.wikipedia.org/w/api.php?action=query&prop=revisions"
+            "&titles=University_of_Virginia&rvslots=*&rvprop=content&formatversion=2"
+            "&format=json",
+            "https://api.census.gov/data/2019/pep/charagegroups?get=GEO_ID,POP&for=state:*"],
+    'ch5': ["https://spinitron.com/WNRN"],
+}
+USER_AGENT = 'Kropko class example (jkropko@virginia.edu)'
+# Response headers worth replaying; encodings and lengths are recomputed
+KEPT_HEADERS = ('content-type', 'etag', 'last-modified', 'location', 'retry-after',
+                'cache-control')
+CHUNK = 1 << 14
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return '{}://{}'.format(parts.scheme, parts.netloc.lower())
+
+
+def _public_url(url):
+    """`url` without secret query parameters, for the archive index"""
+
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query, safe=',:*')))
+
+
+class Archive:
+    """Recorded responses, keyed by request fingerprint, kept in a zip file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.changed = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with zipfile.ZipFile(path) as z:
+                for entry in json.loads(z.read('index.json')):
+                    entry['body'] = z.read('bodies/' + entry['key'])
+                    self.entries[entry['key']] = entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, url):
+        return self.entries.get(fingerprint('GET', url))
+
+    def add(self, url, status, headers, body):
+        entry = {'key': fingerprint('GET', url), 'url': _public_url(url), 'status': status,
+                 'headers': {k: v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+                 'body': body}
+        with self._lock:
+            self.entries[entry['key']] = entry
+            self.changed = True
+        return entry
+
+    def save(self):
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.part')
+            os.close(fd)
+            index = [{k: v for k, v in e.items() if k != 'body'}
+                     for e in self.entries.values()]
+            with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as z:
+                z.writestr('index.json', json.dumps(index, indent=1))
+                for e in self.entries.values():
+                    z.writestr('bodies/' + e['key'], e['body'])
+            os.replace(tmp, self.path)
+            self.changed = False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        replay = self.server.replay
+        url = self.server.origin + self.path
+        entry = replay.archive.get(url)
+        if entry is None and replay.record:
+            entry = replay._fetch(url, self.headers.get('User-Agent'))
+        if replay.latency:
+            time.sleep(replay.latency)
+        if entry is None:
+            replay._count('misses')
+            self._send(404, {}, b'')
+            return
+        replay._count('hits')
+        headers = dict(entry['headers'])
+        validators = {k.lower(): v for k, v in headers.items()}
+        etag, modified = validators.get('etag'), validators.get('last-modified')
+        if ((etag and self.headers.get('If-None-Match') == etag)
+                or (modified and self.headers.get('If-Modified-Since') == modified)):
+            self._send(304, headers, b'')
+            return
+        for name in list(headers):
+            if name.lower() == 'location':
+                headers[name] = replay.rewrite(headers[name])
+        self._send(entry['status'], headers, entry['body'])
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        bandwidth = self.server.replay.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), CHUNK):
+            block = body[start:start + CHUNK]
+            self.wfile.write(block)
+            time.sleep(len(block) / bandwidth)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class ReplayServer:
+    """Serve an `Archive` on localhost, one port per recorded origin.
+
+    `latency` (seconds) delays each response, and `bandwidth` (bytes per
+    second) limits how fast each body is sent. With `record=True` unknown
+    requests are fetched from the live site and added to the archive.
+    `hits`, `misses` and `recorded` count requests.
+    """
+
+    def __init__(self, archive, latency=0.0, bandwidth=None, record=False, timeout=30):
+        self.archive = archive if isinstance(archive, Archive) else Archive(archive)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.record = record
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._servers = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session() if record else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _fetch(self, url, user_agent=None):
+        r = self._session.get(url, headers={'User-Agent': user_agent or USER_AGENT},
+                              allow_redirects=False, timeout=self.timeout)
+        self._count('recorded')
+        return self.archive.add(url, r.status_code, r.headers, r.content)
+
+    def _base(self, origin):
+        with self._lock:
+            server = self._servers.get(origin)
+            if server is None:
+                server = _Server(("127.0.0.1", 0), _Handler)
+                server.replay = self
+                server.origin = origin
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                self._servers[origin] = server
+        return "http://127.0.0.1:{}".format(server.server_address[1])
+
+    def url(self, live_url):
+        """The local URL that serves `live_url`"""
+
+        origin = _origin(live_url)
+        return self._base(origin) + live_url[len(origin):]
+
+    def rewrite(self, location):
+        """Point a redirect at the local stand-in when it goes to a served origin"""
+
+        origin = _origin(location)
+        if origin in self._servers:
+            return self.url(location)
+        return location
+
+    def close(self):
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+        self._servers = {}
+        if self._session is not None:
+            self._session.close()
+        if self.archive.changed:
+            self.archive.save()
+
+
+def record(urls, path):
+    """Fetch `urls` through a recording `ReplayServer` and save them to the archive at `path`"""
+
+    with ReplayServer(path, record=True) as replay:
+        for url in urls:
+            requests.get(replay.url(url), headers={'User-Agent': USER_AGENT},
+                         allow_redirects=True)
+        return replay.recorded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    rec = commands.add_parser("record", help="fetch URLs into the archive")
+    rec.add_argument("archive")
+    rec.add_argument("urls", nargs="*", help="defaults to every URL in CHAPTER_URLS")
+    srv = commands.add_parser("serve", help="serve the archive until interrupted")
+    srv.add_argument("archive")
+    srv.add_argument("--latency", type=float, default=0.0)
+    srv.add_argument("--bandwidth", type=float, default=None, help="bytes per second")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        urls = args.urls or [u for chapter in CHAPTER_URLS.values() for u in chapter]
+        print("recorded {} responses into {}".format(record(urls, args.archive), args.archive))
+        return
+    with ReplayServer(args.archive, latency=args.latency, bandwidth=args.bandwidth) as replay:
+        origins = sorted({_origin(e['url']) for e in replay.archive.entries.values()})
+        for origin in origins:
+            print("{:<40} {}".format(origin, replay.url(origin)))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Lets the tests import datapipe and benchmarks when pytest is run from the repository root
@@ -0,0 +1,23 @@
+"""Reusable helpers for the data pipelines built in Surfing the Data Pipeline with Python."""
+
+from .anes import load_anes, read_anes_example
+from .api import APIClient, APIError, TokenBucket
+from .apicache import ResponseCache
+from .census import census_shards, read_census
+from .collect import FrameCollector
+from .convert import ColumnarStore
+from .crawlstate import CrawlState
+from .fwf import read_fixed_width
+from .geocode import GeocodeStore, geocode_many, normalize_addresses
+from .httpcache import HTTPCache
+from .ingest import STATE_SOURCES, ingest
+from .jsoncolumns import read_json_columns, write_json_columns
+from .jsonl import read_jsonl, write_jsonl
+from .jsonpath import PathExtractor, compile_paths
+from .jsonstream import iter_normalized, normalize_stream
+from .paginate import PageCursor, iter_pages
+from .sniff import read_sniffed, sniff
+from .stream import RunningAggregate, aggregate_csv, iter_csv
+from .spider import (parse_playlist, playlist_urls, wnrn_spider, wnrn_spider_many,
+                     wnrn_crawl, wnrn_crawl_async, wnrn_update)
+from .writers import write_many
@@ -0,0 +1,299 @@
+"""Loaders for the ANES survey files used throughout the book.
+
+Chapters 10 through 12 all start from `anes_pilot2019_clean.csv`, re-parse it
+from text, and convert the same text columns to categories by hand.
+`load_anes()` does that once and saves the typed result in a Feather
+(Arrow IPC) sidecar file next to the CSV. Later loads memory-map the sidecar
+instead of parsing. The sidecar is rebuilt when the CSV changes, which is
+detected by its modification time and size, confirmed by a SHA-256 hash.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import jsonio
+from .httpcache import is_url, local_copy
+
+ANES_URL = "https://github.com/jkropko/DS-6001/raw/master/localdata/anes_pilot2019_clean.csv"
+
+SUPPORT = ['Oppose a great deal', 'Oppose a moderate amount', 'Oppose a little',
+           'Neither favor nor oppose',
+           'Favor a little', 'Favor a moderate amount', 'Favor a great deal']
+
+# Category orders for the pilot file. The first three are the orders set in
+# chapters 10 and 11; None means a category column in the default order.
+ANES_CATEGORIES = {
+    'universal_income': SUPPORT,
+    'ideology': ['Liberal', 'Moderate', 'Conservative'],
+    'confecon': ['Not at all worried', 'A little worried', 'Moderately worried',
+                 'Very worried', 'Extremely worried'],
+    'free_college': SUPPORT,
+    'forgive_loans': SUPPORT,
+    'family_separation': ['Oppose strongly', 'Oppose somewhat',
+                          'Neither favor nor disagree',
+                          'Favor somewhat', 'Favor strongly'],
+    'education': ['No HS diploma', 'High school graduate', 'Some college',
+                  '2-year degree', '4-year degree', 'Post-graduate'],
+    'ftbiden_level': ['dislike', 'neutral', 'like'],
+    'liveurban': None,
+    'vote16': None,
+    'vote': None,
+    'partyID': None,
+    'race': None,
+    'sex': None,
+}
+
+SIDECAR_VERSION = 1
+_META_KEY = b'datapipe'
+
+
+def file_hash(path, blocksize=1 << 20):
+    """SHA-256 hex digest of a file's contents"""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def apply_categories(df, categories=ANES_CATEGORIES):
+    """Convert the listed columns to categories in the given order"""
+
+    for col, order in categories.items():
+        if col in df.columns:
+            df[col] = df[col].astype(pd.CategoricalDtype(order) if order else 'category')
+    return df
+
+
+def _source_stamp(path, categories, read_options):
+    """What a sidecar was built from: the CSV's stat and the load options"""
+
+    st = os.stat(path)
+    return {'mtime': st.st_mtime, 'size': st.st_size, 'version': SIDECAR_VERSION,
+            'categories': json.dumps(categories, sort_keys=True),
+            'read_csv': json.dumps(read_options, sort_keys=True, default=str)}
+
+
+def _read_sidecar_meta(sidecar):
+    import pyarrow as pa
+
+    try:
+        with pa.memory_map(sidecar) as source:
+            meta = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if _META_KEY not in meta:
+        return None
+    return jsonio.loads(meta[_META_KEY])
+
+
+def _write_sidecar(df, sidecar, stamp):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[_META_KEY] = jsonio.dumps(stamp).encode('utf-8')
+    table = table.replace_schema_metadata(meta)
+    tmp = sidecar + '.tmp'
+    # Uncompressed, so the file can be memory-mapped on later loads
+    feather.write_feather(table, tmp, compression='uncompressed')
+    os.replace(tmp, sidecar)
+
+
+def _sidecar_is_current(path, sidecar, stamp):
+    meta = _read_sidecar_meta(sidecar) if os.path.exists(sidecar) else None
+    if meta is None:
+        return False, None
+    if any(meta.get(k) != stamp[k] for k in ('version', 'categories', 'read_csv')):
+        return False, meta
+    if meta['mtime'] == stamp['mtime'] and meta['size'] == stamp['size']:
+        return True, meta
+    # Touched but possibly unchanged: fall back to comparing contents
+    return meta.get('sha256') == file_hash(path), meta
+
+
+def _default_sidecar(source, path):
+    """`path` + '.feather', or a file beside the download cache when `source` is a URL"""
+
+    if not is_url(source):
+        return path + '.feather'
+    # The cache deletes unknown files in its objects/ directory, so keep sidecars
+    # in a directory of their own, named after the cached object
+    directory = os.path.join(os.path.dirname(os.path.dirname(path)), 'sidecars')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(path) + '.feather')
+
+
+def load_anes(path=ANES_URL, categories=ANES_CATEGORIES, sidecar=None, **kwargs):
+    """Load an ANES CSV with typed categories, reusing a columnar sidecar if current.
+
+    `path` can be a local file or a URL (read through `datapipe.httpcache`).
+    `sidecar` defaults to the CSV's path with `.feather` appended, or for a URL
+    to a file in the cache's `sidecars/` directory. Extra keyword
+    arguments are passed to `pd.read_csv()` when the sidecar is (re)built. If
+    `pyarrow` is not installed, the CSV is simply parsed every time.
+    """
+
+    source = path
+    with local_copy(source) as path:
+        try:
+            import pyarrow.feather as feather
+        except ImportError:
+            return apply_categories(pd.read_csv(path, **kwargs), categories)
+
+        if sidecar is None:
+            sidecar = _default_sidecar(source, path)
+        stamp = _source_stamp(path, dict(categories), kwargs)
+
+        current, meta = _sidecar_is_current(path, sidecar, stamp)
+        if current:
+            df = feather.read_table(sidecar, memory_map=True).to_pandas()
+            if meta['mtime'] != stamp['mtime']:
+                # Same contents under a new mtime: record it so the hash is skipped next time
+                stamp['sha256'] = meta['sha256']
+                _write_sidecar(df, sidecar, stamp)
+            return df
+
+        df = apply_categories(pd.read_csv(path, **kwargs), categories)
+        stamp['sha256'] = file_hash(path)
+        _write_sidecar(df, sidecar, stamp)
+        return df
+
+
+ANES_EXAMPLE_URL = "https://raw.githubusercontent.com/jkropko/DS-6001/master/localdata/anes_example.csv"
+
+# The column names of the 2016 pilot example in chapter 2 (`col_names` there)
+ANES_EXAMPLE_COLUMNS = [
+    'caseid', 'turnout12', 'turnout12b', 'vote12', 'percent16', 'meet', 'givefut',
+    'info', 'march', 'sign', 'give12mo', 'compromise', 'ftobama', 'ftblack',
+    'ftwhite', 'fthisp', 'ftgay', 'ftjeb', 'fttrump', 'ftcarson', 'fthrc', 'ftrubio',
+    'ftcruz', 'ftsanders', 'ftfiorina', 'ftpolice', 'ftfem', 'fttrans', 'ftmuslim',
+    'ftsci', 'reg', 'demcand', 'repcand', 'vote16jb', 'vote16bc', 'vote16tc',
+    'vote16mr', 'vote16dt', 'presjob', 'lazyb', 'lazyw', 'lazyh', 'lazym', 'violentb',
+    'violentw', 'violenth', 'violentm', 'econnow', 'econ12mo', 'pid1d', 'pid2d',
+    'pid1r', 'pid2r', 'pidstr', 'pidlean', 'lcself', 'lcd', 'lcr', 'lchc', 'lcbo',
+    'lcdt', 'lcmr', 'lctc', 'srv_spend', 'campfin', 'immig_legal', 'immig_numb',
+    'equalpay', 'parleave', 'crimespend', 'death', 'terror_worry', 'terror_12mo',
+    'terror_local', 'relig_bc', 'relig_bcstr', 'relig_srv', 'relig_srvstr',
+    'incgap20', 'isis_troops', 'syrians_a', 'syrians_b', 'pc_a', 'pc_b', 'minwage',
+    'healthspend', 'childcare', 'getahead', 'ladder', 'finwell', 'warm', 'warmbad',
+    'warmcause', 'warmdo', 'freetrade', 'stopwhite', 'stopblack', 'forcewhite',
+    'forceblack', 'stop_12mo', 'arrested_12mo', 'charged_12mo', 'jailed_12mo',
+    'convict_12mo', 'famstop_12mo', 'stop_ever', 'arrested_ever', 'charged_ever',
+    'jailed_ever', 'convict_ever', 'famstop_ever', 'pk_deficit', 'pk_sen', 'pk_spend',
+    'birthright_a', 'birthright_b', 'femoff_jobs', 'femoff_ed', 'femoff_spend',
+    'femoff_issues', 'lpres_pleased', 'lpres_immig', 'lpres_la', 'vaccine', 'autism',
+    'bo_muslim', 'bo_confid', 'amer_ident', 'race_ident', 'whitework', 'whitejob',
+    'wguilt1', 'wguilt2', 'wguilt3', 'buycott', 'boycott', 'skintone_mob', 'skintone',
+    'skin_discrim', 'africanam10_1', 'white10_1', 'hispanic10_1', 'asianam10_1',
+    'nativeam10_1', 'other10_1', 'other10_open', 'birthyr', 'gender', 'race',
+    'race_other', 'educ', 'marstat', 'speakspanish', 'employ', 'employ_t', 'faminc',
+    'faminc2', 'state', 'votereg', 'pid3', 'pid7', 'ideo5', 'newsint',
+    'pew_bornagain', 'pew_churatd', 'religpew', 'religpew_t', 'ever_vs_12mo_rand',
+]
+
+# Free-text answers; every other column that is not a count or scale is a coded item
+ANES_EXAMPLE_TEXT = ['pid2d', 'pid2r', 'other10_open', 'race_other', 'employ_t', 'religpew_t']
+
+# The narrowest dtype for each column of the example file: 0-100 scales (the
+# feeling thermometers and percent16) fit in one byte, ids and years in two,
+# coded items are categories and free text is stored as Arrow strings.
+ANES_EXAMPLE_SCHEMA = {}
+for _col in ANES_EXAMPLE_COLUMNS:
+    if _col.startswith('ft') or _col == 'percent16':
+        ANES_EXAMPLE_SCHEMA[_col] = 'UInt8'
+    elif _col in ('caseid', 'birthyr'):
+        ANES_EXAMPLE_SCHEMA[_col] = 'UInt16'
+    elif _col in ANES_EXAMPLE_TEXT:
+        ANES_EXAMPLE_SCHEMA[_col] = 'string'
+    else:
+        ANES_EXAMPLE_SCHEMA[_col] = 'category'
+del _col
+
+# Nonresponse codes that would not fit the dtypes above
+ANES_EXAMPLE_NA = {col: [998] for col, dtype in ANES_EXAMPLE_SCHEMA.items() if dtype == 'UInt8'}
+ANES_EXAMPLE_NA.update({col: ['__NA__'] for col in ANES_EXAMPLE_TEXT})
+
+
+def _string_dtype():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return pd.StringDtype()
+    return pd.StringDtype('pyarrow')
+
+
+def _parse_dtypes(schema):
+    """The dtypes to hand the parser for a schema of final dtypes.
+
+    pandas wraps integers that overflow a narrow dtype around without an
+    error, and parses nullable integers on a slow path, so small unsigned
+    integers are parsed as floats and narrowed once their range is checked.
+    """
+
+    dtypes = {}
+    for col, dtype in schema.items():
+        if dtype in ('UInt8', 'UInt16'):
+            dtypes[col] = 'float64'
+        elif dtype == 'string':
+            dtypes[col] = _string_dtype()
+        else:
+            dtypes[col] = dtype
+    return dtypes
+
+
+def _narrow(df, schema):
+    """Finish the dtypes the parser could not produce directly"""
+
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype in ('UInt8', 'UInt16'):
+            values = df[col].to_numpy()
+            info = np.iinfo(dtype.lower())
+            missing = np.isnan(values)
+            bad = ~missing & ((values < info.min) | (values > info.max) | (values % 1 != 0))
+            if bad.any():
+                raise ValueError("{} has values that are not whole numbers in {}-{}, such as {}; "
+                                 "add them to na_values".format(col, info.min, info.max,
+                                                                values[bad][0]))
+            narrow = np.where(missing, 0, values).astype(dtype.lower())
+            df[col] = pd.arrays.IntegerArray(narrow, missing)
+        elif dtype == 'category':
+            # The parser makes string categories; give coded items their numbers back
+            cats = df[col].cat.categories
+            numbers = pd.to_numeric(cats, errors='coerce')
+            if len(cats) and not numbers.isna().any():
+                if (numbers == numbers.round()).all():
+                    numbers = numbers.astype('int64')
+                df[col] = df[col].cat.rename_categories(numbers).cat.reorder_categories(
+                    numbers.sort_values())
+    return df
+
+
+def read_anes_example(path=ANES_EXAMPLE_URL, schema=ANES_EXAMPLE_SCHEMA,
+                      na_values=ANES_EXAMPLE_NA, **kwargs):
+    """Read the chapter 2 ANES example with the compact dtypes in `schema`.
+
+    The dtypes are applied by the parser, so no int64/float64/object copy of
+    the data is ever built. 998 is treated as missing in the 0-100 scales and
+    `__NA__` in the free-text columns. Extra keyword arguments go to
+    `pd.read_csv()`, e.g. `header=None, names=ANES_EXAMPLE_COLUMNS` for the
+    version without column names.
+    """
+
+    with local_copy(path) as path:
+        df = pd.read_csv(path, dtype=_parse_dtypes(schema), na_values=na_values, **kwargs)
+    return _narrow(df, schema)
+
+
+def memory_per_row(df):
+    """Bytes of memory per row, counting the contents of strings"""
+
+    return df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
@@ -0,0 +1,317 @@
+"""A pooled, rate-limited client for the JSON APIs used in chapter 4.
+
+Chapter 4 calls each API with a fresh `requests.get()`::
+
+    r = requests.get("https://en.wikipedia.org/w/api.php", params=p_dict)
+    r = requests.get("https://api.census.gov/data/2019/pep/charagegroups", params=mydict)
+
+Every call opens a new connection, and looping over every state, year or page
+title waits for each response in turn. `APIClient` keeps connections alive in
+a pool and sends a whole list of parameter sets at once over asyncio. A token
+bucket keeps the request rate under the API's limit. 429 and 5xx responses
+and dropped connections are retried with exponential backoff; a `Retry-After`
+header sets the wait when the server sends one::
+
+    census = APIClient(CENSUS_API, rate=10, params={'key': CensusKey})
+    years = census.gather([(CENSUS_API + "/{}/pep/population".format(year),
+                            {'get': 'GEO_ID,POP', 'for': 'state:*'})
+                           for year in range(2015, 2020)])
+
+Responses come back decoded with `datapipe.jsonio`, in the order of the
+parameter sets. Pass a `datapipe.apicache.ResponseCache` as `cache=` to answer
+repeated requests from disk without calling the API.
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import jsonio
+
+WIKIPEDIA_API = "https://en.wikipedia.org/w/api.php"
+CENSUS_API = "https://api.census.gov/data"
+HEADERS = {'user-agent': 'Kropko class example (jkropko@virginia.edu)'}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Returned by the cache for a request it does not hold; a cached body may be null
+_NOT_CACHED = object()
+
+
+class APIError(RuntimeError):
+    """Raised when a request still fails after every retry"""
+
+    def __init__(self, message, status=None, url=None, params=None):
+        super().__init__(message)
+        self.status = status
+        self.url = url
+        self.params = params
+
+
+class TokenBucket:
+    """Allow `rate` requests per second on average, in bursts of up to `burst`.
+
+    `reserve()` takes a token and returns how long the caller must wait before
+    using it, so the same bucket serves threads (`time.sleep`) and coroutines
+    (`asyncio.sleep`). Waiting callers are served in the order they arrived.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            # A negative balance is the queue of callers already waiting
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+def _retry_after(value):
+    """Seconds to wait from a Retry-After header, or None"""
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _require_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as err:
+        raise ImportError("APIClient.gather() requires aiohttp: pip install aiohttp") from err
+    return aiohttp
+
+
+class APIClient:
+    """Pooled JSON API client with rate limiting and retries.
+
+    `base_url` is used when a request gives no URL of its own. `params` are
+    sent with every request (an API key, say). `rate` is the most requests per
+    second, with bursts of `burst`; `None` means no limit. `limit` caps open
+    connections. A failed request is tried `retries` more times, waiting
+    `backoff * 2**attempt` seconds (with jitter, at most `max_backoff`) between
+    tries. With a `ResponseCache` as `cache`, cached responses are returned
+    without a request. The connection pools are kept between calls until
+    `close()`.
+    """
+
+    def __init__(self, base_url=None, params=None, rate=None, burst=1, limit=10, retries=4,
+                 backoff=0.5, max_backoff=30.0, timeout=30, headers=HEADERS, cache=None):
+        self.base_url = base_url
+        self.cache = cache
+        self.params = dict(params or {})
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.limit = limit
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=limit, pool_maxsize=limit)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.requests = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+        # aiohttp sessions by the event loop they belong to, and the loop
+        # `gather()` runs on, in a thread of its own
+        self._aio_sessions = {}
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+        sessions, self._aio_sessions = self._aio_sessions, {}
+        for loop, session in sessions.items():
+            if session.closed or loop.is_closed():
+                continue
+            if loop.is_running():
+                done = asyncio.run_coroutine_threadsafe(session.close(), loop)
+                if loop is self._loop:
+                    done.result()
+            else:
+                loop.run_until_complete(session.close())
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = self._loop_thread = None
+
+    def _aio(self):
+        """The aiohttp session for the running event loop, made on first use"""
+
+        aiohttp = _require_aiohttp()
+        loop = asyncio.get_running_loop()
+        session = self._aio_sessions.get(loop)
+        if session is None or session.closed:
+            # A session only works on the loop it was made on
+            for old in [old for old in self._aio_sessions if old.is_closed()]:
+                del self._aio_sessions[old]
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                            timeout=timeout)
+            self._aio_sessions[loop] = session
+        return session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, item, url):
+        """(url, params) for one item of a fan-out: a params dict or a (url, params) pair"""
+
+        if isinstance(item, tuple):
+            url, params = item
+        else:
+            params = item
+        url = url or self.base_url
+        if url is None:
+            raise ValueError("no URL given and the client has no base_url")
+        merged = dict(self.params)
+        merged.update(params or {})
+        return url, merged
+
+    def _wait(self, attempt, retry_after):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0.5, 1.0) * min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def _count(self, retry):
+        with self._lock:
+            self.requests += 1
+            if retry:
+                self.retried += 1
+
+    def _failed(self, url, params, status, detail):
+        # Leave secrets such as API keys out of the message
+        shown = {k: v for k, v in params.items() if k not in self.params}
+        return APIError("{} {} failed after {} tries: {}".format(url, shown, self.retries + 1,
+                                                                 detail),
+                        status=status, url=url, params=params)
+
+    def get(self, params=None, url=None, raw=False):
+        """Send one GET request and return the decoded JSON body, or the bytes if `raw`"""
+
+        url, params = self._request(params, url)
+        if self.cache is not None:
+            cached = self.cache.get(url, params, raw=raw, default=_NOT_CACHED)
+            if cached is not _NOT_CACHED:
+                return cached
+        for attempt in range(self.retries + 1):
+            if self.bucket is not None:
+                time.sleep(self.bucket.reserve())
+            self._count(attempt > 0)
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                status, detail, retry_after = None, repr(err), None
+            else:
+                if r.status_code not in RETRY_STATUSES:
+                    if r.status_code >= 400:
+                        raise APIError("{} returned {}: {}".format(url, r.status_code,
+                                                                    r.text[:200]),
+                                       status=r.status_code, url=url, params=params)
+                    data = r.content if raw else jsonio.loads_response(r)
+                    if self.cache is not None:
+                        self.cache.put(url, params, r.content, None if raw else data)
+                    return data
+                status, detail = r.status_code, "HTTP {}".format(r.status_code)
+                retry_after = _retry_after(r.headers.get('Retry-After'))
+            if attempt < self.retries:
+                time.sleep(self._wait(attempt, retry_after))
+        raise self._failed(url, params, status, detail)
+
+    async def _get_async(self, session, url, params, raw=False):
+        aiohttp = _require_aiohttp()
+        for attempt in range(self.retries + 1):
+            if self.bucket is not None:
+                await asyncio.sleep(self.bucket.reserve())
+            self._count(attempt > 0)
+            try:
+                async with session.get(url, params=params) as resp:
+                    if resp.status not in RETRY_STATUSES:
+                        body = await resp.read()
+                        if resp.status >= 400:
+                            raise APIError("{} returned {}: {}".format(
+                                url, resp.status, body[:200].decode('utf-8', 'replace')),
+                                status=resp.status, url=url, params=params)
+                        data = body if raw else jsonio.loads(body)
+                        if self.cache is not None:
+                            self.cache.put(url, params, body, None if raw else data)
+                        return data
+                    status, detail = resp.status, "HTTP {}".format(resp.status)
+                    retry_after = _retry_after(resp.headers.get('Retry-After'))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                status, detail, retry_after = None, repr(err), None
+            if attempt < self.retries:
+                await asyncio.sleep(self._wait(attempt, retry_after))
+        raise self._failed(url, params, status, detail)
+
+    async def gather_async(self, requests, url=None, return_exceptions=False, raw=False):
+        """Send every request concurrently and return the decoded bodies in order.
+
+        Each request is a params dict, sent to `url` (or `base_url`), or a
+        `(url, params)` pair. With `return_exceptions=True` a request that
+        fails gives its `APIError` in place of a body, as in `asyncio.gather()`.
+        `raw=True` returns the undecoded bytes.
+        """
+
+        calls = [self._request(item, url) for item in requests]
+        results = [_NOT_CACHED] * len(calls)
+        if self.cache is not None:
+            results = [self.cache.get(u, p, raw=raw, default=_NOT_CACHED) for u, p in calls]
+        missing = [i for i, value in enumerate(results) if value is _NOT_CACHED]
+        if not missing:
+            return results
+        session = self._aio()
+        fetched = await asyncio.gather(*[self._get_async(session, *calls[i], raw=raw)
+                                         for i in missing],
+                                       return_exceptions=return_exceptions)
+        for i, value in zip(missing, fetched):
+            results[i] = value
+        return results
+
+    def gather(self, requests, url=None, return_exceptions=False, raw=False):
+        """Blocking wrapper around `gather_async()`.
+
+        The requests run on an event loop in a background thread that the
+        client keeps, with its connection pool, until `close()`. This works
+        inside a Jupyter notebook too, where `await client.gather_async(...)`
+        is the alternative.
+        """
+
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     daemon=True)
+                self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(self.gather_async(
+            requests, url=url, return_exceptions=return_exceptions, raw=raw),
+            self._loop).result()
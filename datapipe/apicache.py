@@ -0,0 +1,210 @@
+"""Persistent cache of decoded API responses, keyed by a fingerprint of the request.
+
+The Census and Wikipedia queries in chapter 4 return the same data for hours,
+yet every rerun of the notebook waits for the API and spends quota on them.
+`ResponseCache` stores each JSON body in SQLite under a hash of the method,
+the URL and the sorted parameters. Secrets such as the Census `key` are left
+out of the hash, so changing keys does not empty the cache::
+
+    cache = ResponseCache(ttls={CENSUS_API: 24 * 3600, WIKIPEDIA_API: 3600})
+    census = APIClient(CENSUS_API, params={'key': CensusKey}, cache=cache)
+
+How long a response stays fresh depends on its endpoint: the longest URL
+prefix in `ttls` wins, and other URLs use `ttl`. The stored bodies are bounded
+by `max_bytes`, evicting the least recently used first. Recently used bodies
+are also kept decoded in memory, so a repeated call returns the parsed object
+without decoding JSON again.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+from . import jsonio
+from .httpcache import cache_directory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT PRIMARY KEY,
+    url TEXT,
+    body BLOB,
+    size INTEGER,
+    expires_at REAL,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+SECRET_PARAMS = ('key', 'api_key', 'apikey', 'access_token', 'token', 'client_secret')
+
+
+def fingerprint(method, url, params=None, exclude=SECRET_PARAMS):
+    """SHA-256 hex digest identifying a request, whatever the order of its parameters.
+
+    Parameters in the URL's query string count the same as those in `params`.
+    Names in `exclude` are ignored, and the scheme and host are lower-cased.
+    """
+
+    parts = urlsplit(url)
+    items = parse_qsl(parts.query, keep_blank_values=True)
+    for name, value in (params or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            items.extend((name, v) for v in value)
+        else:
+            items.append((name, value))
+    items = sorted((str(name), str(value)) for name, value in items
+                   if name not in exclude)
+    base = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', '', ''))
+    key = json.dumps([method.upper(), base, items], separators=(',', ':'))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Disk cache of JSON API responses with per-endpoint expiry.
+
+    `ttl` is how many seconds a response stays fresh; `ttls` maps URL prefixes
+    to their own lifetimes, and a lifetime of 0 turns caching off for that
+    prefix. `max_bytes` bounds the stored bodies and `memory_items` the number
+    kept decoded in memory. Objects returned from the cache are shared between
+    hits, so treat them as read-only.
+    """
+
+    def __init__(self, directory=None, ttl=3600, ttls=None, max_bytes=256 * 2**20,
+                 memory_items=256, exclude=SECRET_PARAMS):
+        if directory is None:
+            directory = os.path.join(cache_directory(), 'api')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ttl = ttl
+        # Longest prefix first, so the most specific endpoint matches
+        self.ttls = sorted((ttls or {}).items(), key=lambda item: -len(item[0]))
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.exclude = tuple(exclude)
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'responses.db'),
+                                   check_same_thread=False)
+        self._db.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;" + SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ttl_for(self, url):
+        """Seconds a response from `url` stays fresh"""
+
+        for prefix, ttl in self.ttls:
+            if url.startswith(prefix):
+                return ttl
+        return self.ttl
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, url, params=None, method='GET', raw=False, default=None):
+        """The decoded response for a request if a fresh one is cached, else `default`.
+
+        `raw=True` returns the stored body as bytes instead. A cached JSON
+        `null` decodes to None, so pass another `default` to tell it from a miss.
+        """
+
+        key = fingerprint(method, url, params, self.exclude)
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if not raw and cached is not None and cached[1] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            row = self._db.execute(
+                "SELECT body, expires_at FROM responses WHERE fingerprint = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return default
+            self._db.execute("UPDATE responses SET last_used = ? WHERE fingerprint = ?",
+                             (now, key))
+            self._db.commit()
+            if raw:
+                self.hits += 1
+                return bytes(row[0])
+            value = jsonio.loads(row[0])
+            self._remember(key, value, row[1])
+            self.hits += 1
+            return value
+
+    def put(self, url, params, body, value=None, method='GET'):
+        """Store the raw JSON `body` of a response; `value` is its decoded form, if known"""
+
+        ttl = self.ttl_for(url)
+        if not ttl:
+            return
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if len(body) > self.max_bytes:
+            return
+        key = fingerprint(method, url, params, self.exclude)
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, url, body, len(body), now + ttl, now))
+            if value is not None:
+                self._remember(key, value, now + ttl)
+            else:
+                self._memory.pop(key, None)
+            self._evict()
+
+    def size(self):
+        """Total bytes of the stored bodies"""
+
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        """Drop expired responses, then least recently used ones until under `max_bytes`"""
+
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        excess = self.size() - self.max_bytes
+        if excess > 0:
+            rows = self._db.execute("SELECT fingerprint, size FROM responses ORDER BY last_used")
+            doomed = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self._db.executemany("DELETE FROM responses WHERE fingerprint = ?", doomed)
+            for (key,) in doomed:
+                self._memory.pop(key, None)
+        self._db.commit()
+
+    def clear(self):
+        """Remove every cached response"""
+
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._memory.clear()
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {'hits': self.hits, 'misses': self.misses, 'entries': count,
+                    'bytes_cached': self.size()}
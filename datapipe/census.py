@@ -0,0 +1,188 @@
+"""Fetch Census API tables across many years and geographies at once.
+
+Chapter 4 makes one request for every state's population and builds the frame
+from the decoded list of lists::
+
+    r = requests.get("https://api.census.gov/data/2019/pep/charagegroups", params=mydict)
+    statepop = json.loads(r.text)
+    statepopDF = pd.DataFrame(statepop[1:], columns=statepop[0])
+
+County and tract tables over several years take thousands of such calls.
+`read_census()` splits a query into one shard per year, and per state when
+`states` is given (tracts can only be requested state by state). The shards
+are sent concurrently through a pooled `datapipe.api.APIClient`::
+
+    tracts = read_census('acs/acs5', ['NAME', 'B01003_001E'], years=range(2015, 2020),
+                         geography='tract:*', states=STATE_FIPS, key=CensusKey)
+
+Each response is kept as bytes and split into columns by
+`datapipe.jsoncolumns`, without a Python list per row. The columns of all the
+shards are joined as chunked Arrow arrays and cast to numbers in one call per
+column. Census codes for missing estimates, such as -666666666, become nulls.
+Geography codes, `NAME` and `GEO_ID` stay text, so leading zeros are kept.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .api import CENSUS_API, APIClient
+from .jsoncolumns import to_pandas, values_columns
+
+# The state FIPS codes of the 50 states, DC and Puerto Rico
+STATE_FIPS = ('01', '02', '04', '05', '06', '08', '09', '10', '11', '12', '13', '15', '16',
+              '17', '18', '19', '20', '21', '22', '23', '24', '25', '26', '27', '28', '29',
+              '30', '31', '32', '33', '34', '35', '36', '37', '38', '39', '40', '41', '42',
+              '44', '45', '46', '47', '48', '49', '50', '51', '53', '54', '55', '56', '72')
+# Annotation values the Census puts in numeric columns for missing estimates
+MISSING_CODES = (-999999999, -888888888, -666666666, -555555555, -333333333, -222222222)
+TEXT_COLUMNS = ('NAME', 'GEO_ID', 'GEOID')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as err:
+        raise ImportError("read_census() requires pyarrow: pip install pyarrow") from err
+    return pyarrow
+
+
+def _geography_names(*clauses):
+    """Column names of the geography levels in `for`/`in` clauses like 'state:01 county:*'"""
+
+    names = []
+    for clause in clauses:
+        # 'state:01 block group:*' splits into ['state', '01 block group', '*']
+        levels = (clause or '').split(':')[:-1]
+        names.extend(level if i == 0 else level.split(' ', 1)[-1]
+                     for i, level in enumerate(levels))
+    return names
+
+
+def census_shards(dataset, variables, years, geography='state:*', within=None, states=None,
+                  base_url=CENSUS_API):
+    """One `(year, url, params)` per year, and per state if `states` is given.
+
+    `within` is the `in` clause; with `states` it may hold a `{state}`
+    placeholder and defaults to `'state:{state}'`.
+    """
+
+    if isinstance(years, int):
+        years = [years]
+    if not isinstance(variables, str):
+        variables = ','.join(variables)
+    if states is not None and within is None:
+        within = 'state:{state}'
+    shards = []
+    for year in years:
+        url = '{}/{}/{}'.format(base_url.rstrip('/'), year, dataset)
+        for state in (states if states is not None else [None]):
+            params = {'get': variables, 'for': geography}
+            if within:
+                params['in'] = within.format(state=state) if state is not None else within
+            shards.append((year, url, params))
+    return shards
+
+
+def _typed(column, name, text):
+    """Cast an Arrow column of Census strings to int64 or float64 where every value allows"""
+
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    if name in text or not (pa.types.is_string(column.type) or
+                            pa.types.is_large_string(column.type)):
+        return column
+    for target in (pa.int64(), pa.float64()):
+        try:
+            numbers = pc.cast(column, target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+        missing = pc.is_in(numbers, value_set=pa.array(MISSING_CODES, target))
+        return pc.if_else(missing, pa.scalar(None, target), numbers)
+    return column
+
+
+def _combine(parts):
+    """One chunked array from the same column of every shard, cast to a common type"""
+
+    pa = _require_pyarrow()
+
+    types = [p.type for p in parts if not pa.types.is_null(p.type)]
+    if not types:
+        return pa.chunked_array(parts, pa.null())
+    target = types[0]
+    if any(pa.types.is_string(t) or pa.types.is_large_string(t) for t in types):
+        target = pa.large_string()
+    elif len(set(types)) > 1:
+        target = pa.float64()
+    return pa.chunked_array([p if p.type == target else p.cast(target) for p in parts], target)
+
+
+def _shard_columns(body):
+    """(header, Arrow columns without the header row) of one Census response"""
+
+    pa = _require_pyarrow()
+
+    if not body or not body.strip():
+        # The API answers 204 No Content when a geography has no rows
+        return None, None
+    columns = values_columns(body)
+    if columns is None:
+        raise ValueError("not a Census table: {!r}".format(body[:200]))
+    header, arrays = [], []
+    for column in columns:
+        if isinstance(column, list):
+            header.append(column[0])
+            column = pa.array(column[1:])
+        else:
+            header.append(column[0].as_py())
+            column = column.slice(1)
+        arrays.append(column)
+    return header, arrays
+
+
+def read_census(dataset, variables, years, geography='state:*', within=None, states=None,
+                key=None, client=None, base_url=CENSUS_API, dtype_backend=None):
+    """Read a Census table for every year (and state) into one data frame.
+
+    `dataset` is the path after the year, e.g. 'pep/charagegroups' or
+    'acs/acs5'. `variables` are the `get` columns; see `census_shards()` for
+    the shards. The frame gets a `year` column in front. `client` is an
+    `APIClient` to send the requests with (to share its rate limit or
+    `ResponseCache`); otherwise one is made with the API `key`. `base_url`
+    replaces `CENSUS_API`, e.g. to read from a local replay server.
+    `dtype_backend="pyarrow"` keeps the Arrow columns.
+    """
+
+    pa = _require_pyarrow()
+
+    shards = census_shards(dataset, variables, years, geography, within, states, base_url)
+    requests = [(url, params) for _, url, params in shards]
+    if client is None:
+        with APIClient(base_url, params={'key': key} if key else None) as client:
+            bodies = client.gather(requests, raw=True)
+    else:
+        bodies = client.gather(requests, raw=True)
+
+    names, chunks, shard_years = None, [], []
+    for (year, url, params), body in zip(shards, bodies):
+        header, arrays = _shard_columns(body)
+        if header is None:
+            continue
+        if names is None:
+            names = header
+        elif header != names:
+            raise ValueError("{} {} returned columns {}, expected {}".format(
+                url, params, header, names))
+        chunks.append(arrays)
+        shard_years.append((year, len(arrays[0]) if arrays else 0))
+    if names is None:
+        return pd.DataFrame(columns=['year'])
+
+    text = set(TEXT_COLUMNS) | set(_geography_names(geography, shards[0][2].get('in')))
+    data = {'year': pa.array(np.repeat([int(y) for y, _ in shard_years],
+                                       [n for _, n in shard_years]).astype(np.int16))}
+    for j, name in enumerate(names):
+        data[name] = _typed(_combine([arrays[j] for arrays in chunks]), name, text)
+    return pd.DataFrame({name: to_pandas(column, dtype_backend)
+                         for name, column in data.items()})
@@ -0,0 +1,154 @@
+"""Accumulate scraped or computed rows without re-copying a growing data frame.
+
+Chapter 5 stacks playlists with `wnrn_total_playlist.append(moredata)` inside a
+loop. Every append copies the whole frame built so far, so the loop is
+quadratic in the number of rows. `FrameCollector` keeps the chunks in a buffer
+and builds the frame once, or writes full batches to disk as it goes so memory
+stays flat.
+"""
+
+import itertools
+import os
+
+import pandas as pd
+
+
+class FrameCollector:
+    """Buffer chunks of rows and build one data frame at the end.
+
+    Chunks can be data frames or dictionaries that map column names to lists.
+    If `path` is given, buffered rows are written to that file whenever
+    `batch_rows` rows have accumulated: CSV (or any `sep`) by default, or
+    Parquet when the path ends in `.parquet`. An existing file at `path` is
+    only replaced with `overwrite=True`; otherwise `FileExistsError` is
+    raised before anything is collected.
+
+    Usage::
+
+        collector = FrameCollector()
+        for w in wnrn_url:
+            collector.add(wnrn_spider(w))
+        wnrn_total_playlist = collector.to_frame()
+    """
+
+    def __init__(self, columns=None, path=None, batch_rows=100000, sep=",", overwrite=False):
+        self.columns = list(columns) if columns is not None else None
+        self.path = path
+        self.overwrite = overwrite
+        if path is not None:
+            self._check_new()
+        self.batch_rows = batch_rows
+        self.sep = sep
+        self._chunks = []
+        self._buffered = 0
+        self._written = 0
+        self._parquet = None
+
+    def __len__(self):
+        return self._written + self._buffered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, chunk):
+        """Buffer one chunk of rows"""
+
+        if isinstance(chunk, pd.DataFrame):
+            names = list(chunk.columns)
+            nrows = len(chunk)
+        else:
+            chunk = dict(chunk)
+            names = list(chunk)
+            nrows = len(next(iter(chunk.values()))) if chunk else 0
+            if any(len(v) != nrows for v in chunk.values()):
+                raise ValueError("all columns in a chunk must have the same length")
+
+        if self.columns is None:
+            self.columns = names
+        if set(names) != set(self.columns):
+            raise ValueError("chunk columns {} do not match {}".format(
+                sorted(names), sorted(self.columns)))
+
+        self._chunks.append(chunk)
+        self._buffered += nrows
+
+        if self.path is not None and self._buffered >= self.batch_rows:
+            self.flush()
+
+    def _build(self):
+        """Concatenate the buffered chunks in a single pass"""
+
+        if not self._chunks:
+            return pd.DataFrame(columns=self.columns)
+        if all(isinstance(chunk, dict) for chunk in self._chunks):
+            # Plain lists: chain each column once, no intermediate frames
+            data = {c: list(itertools.chain.from_iterable(chunk[c] for chunk in self._chunks))
+                    for c in self.columns}
+            return pd.DataFrame(data, columns=self.columns)
+        frames = [chunk if isinstance(chunk, pd.DataFrame)
+                  else pd.DataFrame(chunk, columns=self.columns)
+                  for chunk in self._chunks]
+        return pd.concat(frames, ignore_index=True)[self.columns]
+
+    def _reset(self):
+        self._chunks = []
+        self._buffered = 0
+
+    def _check_new(self):
+        if not self.overwrite and os.path.exists(self.path):
+            raise FileExistsError("{} exists; pass overwrite=True to replace it".format(
+                self.path))
+
+    def flush(self):
+        """Write the buffered rows to `path` and clear the buffer"""
+
+        if self.path is None:
+            raise ValueError("flush() needs a path to write to")
+        if self._buffered == 0:
+            return
+        df = self._build()
+        if str(self.path).endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._check_new()
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            first = self._written == 0
+            if first:
+                self._check_new()
+            df.to_csv(self.path, sep=self.sep, index=False, header=first,
+                      mode="w" if first else "a")
+        self._written += self._buffered
+        self._reset()
+
+    def close(self):
+        """Flush any remaining rows when writing to disk"""
+
+        if self.path is not None:
+            self.flush()
+            if self._parquet is not None:
+                self._parquet.close()
+                self._parquet = None
+
+    def to_frame(self):
+        """Return every collected row as one data frame with a fresh index.
+
+        When writing to disk, the whole file is read back into memory. Call
+        `close()` instead when only the file is needed.
+        """
+
+        if self.path is None:
+            return self._build()
+        self.close()
+        if self._written == 0:
+            return pd.DataFrame(columns=self.columns)
+        if str(self.path).endswith(".parquet"):
+            return pd.read_parquet(self.path)
+        return pd.read_csv(self.path, sep=self.sep)
+
@@ -0,0 +1,239 @@
+"""Convert Excel, SAS, Stata and SPSS files to a columnar store once, then read from it.
+
+Chapter 2 loads an Excel workbook, a SAS file, a Stata file and an SPSS file.
+These parsers are slow, and the book runs them again on every build.
+`ColumnarStore` parses each file once and saves every workbook sheet, or the
+whole statistical file, as an uncompressed Feather (Arrow IPC) file. Later
+reads memory-map the stored copy and load only the sheets and columns asked
+for::
+
+    store = ColumnarStore()
+    nba = store.read_excel(url, sheet_name=[0, 2])
+    cbspoll = store.read_stata(url, columns=['q1', 'q2'])
+
+Stata and SPSS value labels become categoricals, as in `pd.read_stata()` and
+`pd.read_spss()`, and are stored as Arrow dictionaries, so they come back as
+categoricals. A file is converted again when its path, size or modification
+time changes, or when different reader options are used. URLs are read
+through `datapipe.httpcache`.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from . import jsonio
+from .httpcache import cache_directory, local_copy
+
+MANIFEST = 'manifest.json'
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as err:
+        raise ImportError("ColumnarStore requires pyarrow: pip install pyarrow") from err
+    return pyarrow
+
+
+def _to_table(df):
+    """Convert a frame to Arrow, turning mixed-type text columns into strings.
+
+    Excel sheets often hold numbers and text in the same column, which Arrow
+    cannot store in one typed column.
+    """
+
+    pa = _require_pyarrow()
+    if df.attrs:
+        # pd.read_spss() puts file metadata, including dates, in attrs; keep it as JSON
+        df = df.copy(deep=False)
+        df.attrs = json.loads(json.dumps(df.attrs, default=str))
+    try:
+        return pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.Array.from_pandas(df[col])
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return pa.Table.from_pandas(df)
+
+
+class ColumnarStore:
+    """Directory of converted files, one Feather file per sheet.
+
+    `directory` defaults to `columnar/` inside the `datapipe.httpcache`
+    directory.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.path.join(cache_directory(), 'columnar')
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.conversions = 0
+
+    def _key(self, source, reader, options):
+        st = os.stat(source)
+        stamp = json.dumps([os.path.realpath(source), st.st_size, st.st_mtime_ns, reader,
+                            options], sort_keys=True, default=str)
+        return hashlib.sha256(stamp.encode('utf-8')).hexdigest()
+
+    def _manifest(self, key):
+        try:
+            with open(os.path.join(self.directory, key, MANIFEST)) as f:
+                return jsonio.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key, source, reader, frames):
+        """Write the sheets of one converted file, replacing older conversions of it"""
+
+        import pyarrow.feather as feather
+
+        tmp = tempfile.mkdtemp(dir=self.directory, suffix='.part')
+        sheets = []
+        for i, (name, df) in enumerate(frames.items()):
+            filename = '{}.feather'.format(i)
+            # Uncompressed, so later reads can memory-map the file
+            feather.write_feather(_to_table(df), os.path.join(tmp, filename),
+                                  compression='uncompressed')
+            sheets.append([name, filename])
+        manifest = {'source': os.path.realpath(source), 'reader': reader, 'sheets': sheets}
+        with open(os.path.join(tmp, MANIFEST), 'w') as f:
+            jsonio.dump(manifest, f)
+
+        for other in os.listdir(self.directory):
+            if other.endswith('.part'):
+                continue
+            old = self._manifest(other)
+            if old is not None and old['source'] == manifest['source'] \
+                    and old['reader'] == reader:
+                shutil.rmtree(os.path.join(self.directory, other), ignore_errors=True)
+        target = os.path.join(self.directory, key)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        self.conversions += 1
+        return manifest
+
+    def _load(self, key, filename, columns):
+        import pyarrow.feather as feather
+
+        path = os.path.join(self.directory, key, filename)
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    def _convert(self, path, reader, parse, options):
+        """Return (key, manifest) for a file, converting it with `parse` on a miss"""
+
+        _require_pyarrow()
+        with local_copy(path) as source:
+            key = self._key(source, reader, options)
+            manifest = self._manifest(key)
+            if manifest is None:
+                manifest = self._save(key, source, reader, parse(source))
+        return key, manifest
+
+    def read_excel(self, path, sheet_name=0, columns=None, **kwargs):
+        """`pd.read_excel()` from the store.
+
+        The first read of a workbook converts every sheet, since the workbook
+        has to be parsed whole anyway. `sheet_name` works as in pandas: a
+        name, a position, a list of either (returning a dict) or None for all
+        sheets. `columns` limits which columns are loaded.
+        """
+
+        key, manifest = self._convert(
+            path, 'excel', lambda source: pd.read_excel(source, sheet_name=None, **kwargs),
+            kwargs)
+        sheets = manifest['sheets']
+        names = [name for name, _ in sheets]
+
+        def load(sheet):
+            if isinstance(sheet, int):
+                if not -len(sheets) <= sheet < len(sheets):
+                    raise ValueError("Worksheet index {} is invalid, {} worksheets found"
+                                     .format(sheet, len(sheets)))
+                return self._load(key, sheets[sheet][1], columns)
+            if sheet not in names:
+                raise ValueError("Worksheet named '{}' not found".format(sheet))
+            return self._load(key, sheets[names.index(sheet)][1], columns)
+
+        if sheet_name is None:
+            return {name: self._load(key, filename, columns) for name, filename in sheets}
+        if isinstance(sheet_name, (list, tuple)):
+            return {sheet: load(sheet) for sheet in sheet_name}
+        return load(sheet_name)
+
+    def _read_single(self, path, reader, parse, columns, kwargs):
+        key, manifest = self._convert(path, reader, lambda source: {None: parse(source)},
+                                      kwargs)
+        return self._load(key, manifest['sheets'][0][1], columns)
+
+    def read_sas(self, path, columns=None, **kwargs):
+        """`pd.read_sas()` from the store, loading only `columns` if given"""
+
+        return self._read_single(path, 'sas', lambda source: pd.read_sas(source, **kwargs),
+                                 columns, kwargs)
+
+    def read_stata(self, path, columns=None, **kwargs):
+        """`pd.read_stata()` from the store; value labels are kept as categoricals"""
+
+        return self._read_single(path, 'stata', lambda source: pd.read_stata(source, **kwargs),
+                                 columns, kwargs)
+
+    def read_spss(self, path, columns=None, **kwargs):
+        """`pd.read_spss()` from the store; value labels are kept as categoricals.
+
+        Unlike `pd.read_spss()`, `path` can be a URL.
+        """
+
+        return self._read_single(path, 'spss', lambda source: pd.read_spss(source, **kwargs),
+                                 columns, kwargs)
+
+    def clear(self):
+        """Remove every converted file"""
+
+        for name in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+
+_default = None
+
+
+def default_store():
+    """The shared store used by the module-level readers"""
+
+    global _default
+    if _default is None:
+        _default = ColumnarStore()
+    return _default
+
+
+def read_excel(path, sheet_name=0, columns=None, **kwargs):
+    """`ColumnarStore.read_excel()` on the shared store"""
+
+    return default_store().read_excel(path, sheet_name=sheet_name, columns=columns, **kwargs)
+
+
+def read_sas(path, columns=None, **kwargs):
+    """`ColumnarStore.read_sas()` on the shared store"""
+
+    return default_store().read_sas(path, columns=columns, **kwargs)
+
+
+def read_stata(path, columns=None, **kwargs):
+    """`ColumnarStore.read_stata()` on the shared store"""
+
+    return default_store().read_stata(path, columns=columns, **kwargs)
+
+
+def read_spss(path, columns=None, **kwargs):
+    """`ColumnarStore.read_spss()` on the shared store"""
+
+    return default_store().read_spss(path, columns=columns, **kwargs)
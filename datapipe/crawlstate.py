@@ -0,0 +1,122 @@
+"""Persistent crawl state so that re-running a spider only downloads what changed.
+
+Each visited URL is stored in SQLite with its ETag, Last-Modified date and a
+hash of the body. Extracted rows are stored under a hash of their contents,
+which lets a re-crawl tell old rows from new ones. Updates made inside
+`transaction()` are committed together, or not at all if the crawl fails.
+"""
+
+import contextlib
+import hashlib
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS rows (
+    row_hash TEXT PRIMARY KEY,
+    url TEXT,
+    seen_at REAL
+);
+"""
+
+
+def content_hash(body):
+    """SHA-256 hex digest of a response body, given as text or bytes"""
+
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body).hexdigest()
+
+
+class CrawlState:
+    """SQLite record of visited pages and the rows already extracted from them"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self._transactions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Commit the pages and rows recorded in the block only if it finishes"""
+
+        self._transactions += 1
+        try:
+            yield self
+        except BaseException:
+            if self._transactions == 1:
+                self.conn.rollback()
+            raise
+        else:
+            if self._transactions == 1:
+                self.conn.commit()
+        finally:
+            self._transactions -= 1
+
+    def _commit(self):
+        if not self._transactions:
+            self.conn.commit()
+
+    def __contains__(self, url):
+        cur = self.conn.execute("SELECT 1 FROM pages WHERE url = ?", (url,))
+        return cur.fetchone() is not None
+
+    def page(self, url):
+        """Return the stored (etag, last_modified, content_hash) for a URL, or None"""
+
+        cur = self.conn.execute(
+            "SELECT etag, last_modified, content_hash FROM pages WHERE url = ?", (url,))
+        return cur.fetchone()
+
+    def conditional_headers(self, url):
+        """Build If-None-Match / If-Modified-Since headers from what was stored"""
+
+        headers = {}
+        stored = self.page(url)
+        if stored is not None:
+            etag, last_modified, _ = stored
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def record_page(self, url, etag=None, last_modified=None, body_hash=None):
+        """Store or refresh the validators and body hash for a URL"""
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+            (url, etag, last_modified, body_hash, time.time()))
+        self._commit()
+
+    def add_rows(self, url, rows):
+        """Record rows (tuples) found on a URL and return a mask of the new ones"""
+
+        now = time.time()
+        mask = []
+        for row in rows:
+            key = content_hash('\x1f'.join([url] + ['' if v is None else str(v)
+                                                    for v in row]))
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO rows VALUES (?, ?, ?)", (key, url, now))
+            mask.append(cur.rowcount == 1)
+        self._commit()
+        return mask
@@ -0,0 +1,217 @@
+"""A vectorized reader for fixed-width files such as `njcc33850.dat` in chapter 2.
+
+`pd.read_fwf()` walks the file one line at a time in Python. When every record
+has the same length, as in the Roper Center files, the file can instead be
+memory-mapped and viewed as a 2-D array of bytes with one row per record.
+Each column is then a rectangular slice. Numbers are assembled digit by digit
+with numpy arithmetic, so no Python string is created for a numeric field.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+_SPACE, _MINUS, _PLUS, _DOT, _ZERO = (ord(c) for c in ' -+.0')
+# The largest int64 that can take one more digit without overflowing
+_INT64_LIMIT = (2**63 - 1 - 9) // 10
+
+
+def widths_to_colspecs(widths):
+    """Turn a list of widths into [start, end) pairs, like `datawidths` -> `datapos`"""
+
+    ends = np.cumsum(widths).tolist()
+    return [[end - w, end] for w, end in zip(widths, ends)]
+
+
+def _record_layout(buf):
+    """Return (record length including the newline, newline width)"""
+
+    newline = np.flatnonzero(buf[:1 << 16] == ord('\n'))
+    if len(newline) == 0:
+        return len(buf) + 1, 1
+    first = int(newline[0])
+    crlf = first > 0 and buf[first - 1] == ord('\r')
+    return first + 1, 2 if crlf else 1
+
+
+def _parse_numeric(field):
+    """Convert an (n, width) uint8 block to numbers.
+
+    Returns (values, ok, has_dot, integers, wide). `ok` flags the rows that
+    hold a plain decimal number (optionally signed, optionally padded with
+    blanks) or are entirely blank, and `has_dot` the rows written with a
+    decimal point. Blank rows come back as NaN. `integers` holds the digits of
+    each row as an exact int64, decimal point ignored, and `wide` flags the
+    rows with too many digits for that; their `values` are parsed as text.
+    """
+
+    # One transposed copy: each character position becomes a contiguous row,
+    # so every step below is a cheap elementwise pass over all records
+    chars = np.ascontiguousarray(field.T)
+    width, n = chars.shape
+    offset = chars - np.uint8(_ZERO)
+    digit = offset < 10
+    integers = np.zeros(n, dtype=np.int64)
+    wide = np.zeros(n, dtype=bool)
+    if digit.all():
+        # Common case, e.g. zero-padded codes: no blanks, signs or decimals
+        for j in range(width):
+            if j >= 18:
+                wide |= integers > _INT64_LIMIT
+            integers = integers * 10 + offset[j]
+        ok = np.ones(n, dtype=bool)
+        has_dot = np.zeros(n, dtype=bool)
+        values = integers.astype(np.float64)
+        if wide.any():
+            values[wide] = _text(field[wide]).astype(np.float64)
+        return values, ok, has_dot, integers, wide
+
+    space = chars == _SPACE
+    dot = chars == _DOT
+    sign = (chars == _MINUS) | (chars == _PLUS)
+    nonspace = ~space
+
+    ok = np.ones(n, dtype=bool)
+    seen = np.zeros(n, dtype=bool)          # a non-blank character has appeared
+    gap = np.zeros(n, dtype=bool)           # a blank has followed a non-blank
+    any_digit = np.zeros(n, dtype=bool)
+    dots = np.zeros(n, dtype=np.int8)
+    negative = np.zeros(n, dtype=bool)
+    scale = np.ones(n, dtype=np.float64)
+    for j in range(width):
+        d, s, p = digit[j], sign[j], dot[j]
+        ok &= d | space[j] | p | s
+        ok &= ~(nonspace[j] & gap)          # no blanks inside the number
+        ok &= ~(s & seen)                   # a sign only in front
+        gap |= space[j] & seen
+        negative |= s & (chars[j] == _MINUS)
+        scale = np.where(d & (dots > 0), scale * 10, scale)
+        if j >= 18:
+            wide |= d & (integers > _INT64_LIMIT)
+        integers = np.where(d, integers * 10 + offset[j], integers)
+        dots += p
+        any_digit |= d
+        seen |= nonspace[j]
+
+    blank = ~seen
+    ok &= (dots <= 1) & (any_digit | blank)
+    integers[negative] *= -1
+    values = integers / scale
+    values[blank] = np.nan
+    wide &= ok
+    if wide.any():
+        values[wide] = _text(field[wide]).astype(np.float64)
+    return values, ok | blank, dots > 0, integers, wide
+
+
+def _text(field):
+    """The rows of an (n, width) uint8 block as bytes with surrounding blanks removed"""
+
+    width = field.shape[1]
+    return np.char.strip(np.ascontiguousarray(field).view('S{}'.format(width)).ravel())
+
+
+def _parse_field(block, start, end, kind=None):
+    """Parse one column of a block.
+
+    Returns (values, has_dot, integers, wide) as from `_parse_numeric()`, or
+    (text, None, None, None).
+    """
+
+    field = block[:, start:end]
+    if kind != 'str':
+        values, ok, has_dot, integers, wide = _parse_numeric(field)
+        if ok.all():
+            return values, has_dot, integers, wide
+        if kind is not None:
+            values[~ok] = np.nan
+            return values, has_dot, integers, wide & ok
+    # Text: one vectorized strip per column, matching read_fwf's whitespace trimming
+    return _text(field), None, None, None
+
+
+def _integer_column(name, values, has_dot, integers, wide, fields):
+    """An integer column from the parsed parts of the column's `fields` blocks"""
+
+    missing = np.isnan(values)
+    if not has_dot.any() and not missing.any():
+        if wide.any():
+            # Beyond int64: uint64 or Python ints, as read_fwf gives
+            text = np.concatenate([_text(field) for field in fields])
+            return pd.to_numeric(np.char.decode(text, 'ascii').astype(object))
+        return integers
+    if wide.any():
+        raise ValueError("column {!r} has integers wider than 64 bits".format(name))
+    # Forced to int: blanks, and decimals with a fraction, become nulls
+    whole = ~missing & (values == np.floor(np.where(missing, 0, values)))
+    exact = np.where(has_dot, np.where(whole, values, 0).astype(np.int64), integers)
+    return pd.arrays.IntegerArray(exact, ~whole)
+
+
+def read_fixed_width(path, colspecs=None, widths=None, names=None, dtypes=None,
+                     encoding='utf-8'):
+    """Read a fixed-width file with equal-length records into a data frame.
+
+    Give either `colspecs` (a list of [start, end) pairs, like `datapos`) or
+    `widths` (like `datawidths`). Columns whose every value is a number become
+    int64, or float64 if any value has a decimal point or is blank. As with
+    `pd.read_fwf()`, integers too wide for int64 give uint64 or Python ints.
+    All other columns become strings with surrounding blanks removed, as
+    `pd.read_fwf()` does. `dtypes` forces 'int', 'float' or 'str' for
+    particular columns; an 'int' column holds nulls for blanks and for
+    numbers with a fraction, such as 1.5.
+    Positions count bytes, which equal characters for ASCII files.
+    Raises ValueError if the records are not all the same length; use
+    `pd.read_fwf()` for such files.
+    """
+
+    if (colspecs is None) == (widths is None):
+        raise ValueError("give exactly one of colspecs or widths")
+    if colspecs is None:
+        colspecs = widths_to_colspecs(widths)
+    colspecs = [tuple(c) for c in colspecs]
+    if names is None:
+        names = list(range(len(colspecs)))
+    dtypes = dtypes or {}
+
+    if os.path.getsize(path) == 0:
+        return pd.DataFrame(columns=names)
+    buf = np.memmap(path, dtype=np.uint8, mode='r')
+    reclen, nl = _record_layout(buf)
+    nfull, rest = divmod(len(buf), reclen)
+    if rest not in (0, reclen - nl):
+        raise ValueError("records are not all {} bytes long; use pd.read_fwf()".format(reclen))
+    if max(end for _, end in colspecs) > reclen - nl:
+        raise ValueError("colspecs extend past the {}-byte record".format(reclen - nl))
+
+    blocks = [buf[:nfull * reclen].reshape(nfull, reclen)]
+    if rest:
+        # Last record without a trailing newline
+        tail = np.full((1, reclen), ord('\n'), dtype=np.uint8)
+        tail[0, :rest] = buf[nfull * reclen:]
+        blocks.append(tail)
+    if not np.all(blocks[0][:, reclen - 1] == ord('\n')):
+        raise ValueError("records are not all {} bytes long; use pd.read_fwf()".format(reclen))
+
+    data = {}
+    for (start, end), name in zip(colspecs, names):
+        kind = dtypes.get(name)
+        parts = [_parse_field(b, start, end, kind) for b in blocks]
+        is_text = any(part[1] is None for part in parts)
+        if is_text and not all(part[1] is None for part in parts):
+            # Numeric in one block but text in the other: read both as text
+            parts = [_parse_field(b, start, end, 'str') for b in blocks]
+        if is_text:
+            text = np.char.decode(np.concatenate([p[0] for p in parts]), encoding).astype(object)
+            text[text == ''] = np.nan
+            data[name] = text
+            continue
+        values, has_dot, integers, wide = (np.concatenate(column) for column in zip(*parts))
+        integral = not has_dot.any() and not np.isnan(values).any()
+        if kind == 'int' or (kind is None and integral):
+            fields = [b[:, start:end] for b in blocks]
+            data[name] = _integer_column(name, values, has_dot, integers, wide, fields)
+        else:
+            data[name] = values
+    return pd.DataFrame(data, columns=names)
@@ -0,0 +1,199 @@
+"""Geocode many addresses at once, looking up each distinct address only once.
+
+Chapter 4 geocodes one address with the `googlemaps` client::
+
+    gmaps = googlemaps.Client(key=GoogleKey)
+    geocode_result = gmaps.geocode('60 Bonnycastle Dr Charlottesville, VA 22904')
+    geocode_result[0]['geometry']['location']
+
+Survey data repeats the same addresses, written in different ways.
+`geocode_many()` normalizes the addresses, so `60 Bonnycastle Drive` and
+`60 BONNYCASTLE DR.` are one lookup. It answers the ones already in a
+`GeocodeStore` from disk and sends the others to the geocoder from a thread
+pool. A token bucket keeps the request rate within the API quota::
+
+    store = GeocodeStore("geocodes.db")
+    coords = geocode_many(survey['address'], gmaps.geocode, store=store, rate=40)
+
+The result has one row per input address, in the same order, with `lat`,
+`lng`, `formatted_address` and a `status` column.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from . import jsonio
+from .api import TokenBucket
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocodes (
+    address TEXT PRIMARY KEY,
+    result TEXT,
+    fetched_at REAL
+);
+"""
+
+# USPS abbreviations for the words that vary most between spellings of an address
+ABBREVIATIONS = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'AV': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR',
+    'BOULEVARD': 'BLVD', 'LANE': 'LN', 'COURT': 'CT', 'PLACE': 'PL', 'TERRACE': 'TER',
+    'CIRCLE': 'CIR', 'HIGHWAY': 'HWY', 'PARKWAY': 'PKWY', 'SQUARE': 'SQ', 'TRAIL': 'TRL',
+    'APARTMENT': 'APT', 'SUITE': 'STE', 'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E',
+    'WEST': 'W', 'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+}
+_WORDS = re.compile(r'\b(?:{})\b'.format('|'.join(ABBREVIATIONS)))
+STATUSES = ('ok', 'cached', 'not_found', 'error', 'quota')
+
+
+def normalize_addresses(addresses):
+    """Canonical forms of a Series of addresses: upper case, no punctuation, USPS abbreviations"""
+
+    s = pd.Series(addresses, dtype=object).fillna('').astype(str).str.upper()
+    s = s.str.replace(r"[.,;']", ' ', regex=True)
+    s = s.str.replace(_WORDS, lambda m: ABBREVIATIONS[m.group(0)], regex=True)
+    return s.str.split().str.join(' ')
+
+
+def normalize_address(address):
+    """Canonical form of one address, as in `normalize_addresses()`"""
+
+    return normalize_addresses([address]).iloc[0]
+
+
+class GeocodeStore:
+    """SQLite store of geocoder results, keyed by normalized address.
+
+    Addresses the geocoder could not find are stored too, with an empty
+    result, so they are not looked up again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;" + SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+
+    def get_many(self, addresses):
+        """Dict of the stored results for those of `addresses` that are stored"""
+
+        found = {}
+        addresses = list(addresses)
+        with self._lock:
+            # SQLite allows a limited number of parameters per statement
+            for start in range(0, len(addresses), 900):
+                batch = addresses[start:start + 900]
+                rows = self.conn.execute(
+                    "SELECT address, result FROM geocodes WHERE address IN ({})".format(
+                        ','.join('?' * len(batch))), batch)
+                found.update((address, jsonio.loads(result)) for address, result in rows)
+        return found
+
+    def put_many(self, results):
+        """Store a dict of normalized address -> geocoder result"""
+
+        now = time.time()
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?)",
+                                  [(address, jsonio.dumps(result), now)
+                                   for address, result in results.items()])
+            self.conn.commit()
+
+
+def _location(result):
+    """(lat, lng, formatted_address) of the first match in a geocoder result"""
+
+    try:
+        first = result[0]
+        location = first['geometry']['location']
+        return float(location['lat']), float(location['lng']), first.get('formatted_address')
+    except (LookupError, TypeError, ValueError):
+        return np.nan, np.nan, None
+
+
+def geocode_many(addresses, geocode, store=None, workers=8, rate=None, burst=1, quota=None,
+                 flush_every=500):
+    """Geocode a sequence of addresses, one lookup per distinct normalized address.
+
+    `geocode` is called with the first spelling of each normalized address
+    in `addresses`, since the abbreviations that identify duplicates can
+    mislead a geocoder, and returns a list of results in the Google Geocoding
+    format, as `gmaps.geocode` does. Lookups
+    run on `workers` threads, at most `rate` per second, and at most `quota`
+    in this call; addresses left over get status 'quota'. Results are saved
+    to `store` every `flush_every` lookups. A lookup that raises gets status
+    'error' and is not stored, so the next call tries it again.
+    """
+
+    normalized = normalize_addresses(addresses)
+    codes, uniques = pd.factorize(normalized)
+    uniques = list(uniques)
+    # The normalized form is only the key; the geocoder gets an address as written
+    _, first = np.unique(codes, return_index=True)
+    spelling = dict(zip(uniques, pd.Series(addresses, dtype=object).iloc[first].astype(str)))
+    results = store.get_many(uniques) if store is not None else {}
+    status = {address: 'cached' if result else 'not_found'
+              for address, result in results.items()}
+
+    todo = [address for address in uniques if address and address not in results]
+    if quota is not None:
+        for address in todo[quota:]:
+            status[address] = 'quota'
+        todo = todo[:quota]
+    bucket = TokenBucket(rate, burst) if rate else None
+
+    def lookup(address):
+        if bucket is not None:
+            time.sleep(bucket.reserve())
+        return geocode(spelling[address])
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(lookup, address): address for address in todo}
+        for future in as_completed(futures):
+            address = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                status[address] = 'error'
+                continue
+            results[address] = pending[address] = result or []
+            status[address] = 'ok' if result else 'not_found'
+            if store is not None and len(pending) >= flush_every:
+                store.put_many(pending)
+                pending = {}
+    if store is not None and pending:
+        store.put_many(pending)
+
+    # Build the columns for the distinct addresses, then spread them over the rows
+    lat = np.full(len(uniques), np.nan)
+    lng = np.full(len(uniques), np.nan)
+    formatted = np.full(len(uniques), None, dtype=object)
+    states = np.full(len(uniques), 'not_found', dtype=object)
+    for i, address in enumerate(uniques):
+        if address in results:
+            lat[i], lng[i], formatted[i] = _location(results[address])
+        states[i] = status.get(address, 'not_found')
+    index = addresses.index if isinstance(addresses, (pd.Series, pd.Index)) else None
+    return pd.DataFrame({'address': normalized.to_numpy(), 'lat': lat[codes], 'lng': lng[codes],
+                         'formatted_address': formatted[codes],
+                         'status': pd.Categorical(states[codes], categories=STATUSES)},
+                        index=index)
@@ -0,0 +1,320 @@
+"""Content-addressed local cache for the remote data files the chapters load.
+
+The chapters call `pd.read_csv(url)` on the same GitHub files over and over.
+`HTTPCache.fetch()` downloads a URL once, stores the body under its SHA-256
+hash, and returns the local path on later calls. The cache is bounded in size
+and evicts the least recently used files first. In offline mode only cached
+files are served.
+
+The `read_*` functions are drop-in replacements for the `pandas` readers::
+
+    from datapipe import httpcache
+    anes = httpcache.read_csv(url, header=4)
+
+Another thread may evict a file as soon as `fetch()` returns its path. Code
+that reads the file should hold it with `local_copy()` (or
+`HTTPCache.pinned()`), which keeps it on disk until the block exits.
+
+The cache lives in `~/.cache/datapipe` unless `DATAPIPE_CACHE` is set, and
+`DATAPIPE_OFFLINE=1` turns on offline mode.
+"""
+
+import collections
+import contextlib
+import hashlib
+import os
+import posixpath
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    hash TEXT,
+    filename TEXT,
+    size INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL,
+    last_used REAL
+);
+"""
+
+
+class OfflineError(LookupError):
+    """Raised when a URL is requested in offline mode but is not in the cache"""
+
+
+def cache_directory():
+    """`DATAPIPE_CACHE`, or `~/.cache/datapipe` if it is not set"""
+
+    return os.environ.get('DATAPIPE_CACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'datapipe'))
+
+
+def is_url(path):
+    """True if `path` is an http(s) URL rather than a local file"""
+
+    return isinstance(path, str) and urlparse(path).scheme in ('http', 'https')
+
+
+class HTTPCache:
+    """Disk cache of downloaded files, keyed by URL and stored by content hash.
+
+    `max_bytes` bounds the total size of the stored files. `max_age` (seconds)
+    sets how long a cached copy is used before it is revalidated with a
+    conditional request; the default `None` never revalidates.
+    """
+
+    def __init__(self, directory=None, max_bytes=2 * 2**30, max_age=None,
+                 offline=None, headers=None):
+        if directory is None:
+            directory = cache_directory()
+        if offline is None:
+            offline = os.environ.get('DATAPIPE_OFFLINE', '') not in ('', '0')
+        self.directory = directory
+        self.objects = os.path.join(directory, 'objects')
+        os.makedirs(self.objects, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.offline = offline
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self._lock = threading.Lock()
+        # filename -> number of readers holding it; pinned files are never deleted
+        self._pins = collections.Counter()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.db'),
+                                   check_same_thread=False)
+        # A hit commits its last-used time; without WAL each commit waits on fsync
+        self._db.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;" + SCHEMA)
+
+    def close(self):
+        self.session.close()
+        self._db.close()
+
+    def _entry(self, url):
+        return self._db.execute(
+            "SELECT filename, etag, last_modified, fetched_at FROM entries WHERE url = ?",
+            (url,)).fetchone()
+
+    def _touch(self, url, fetched=False):
+        now = time.time()
+        if fetched:
+            self._db.execute("UPDATE entries SET last_used = ?, fetched_at = ? WHERE url = ?",
+                             (now, now, url))
+        else:
+            self._db.execute("UPDATE entries SET last_used = ? WHERE url = ?", (now, url))
+        self._db.commit()
+
+    def fetch(self, url):
+        """Return a local path holding the body of `url`, downloading it if needed"""
+
+        return self._fetch(url, pin=False)
+
+    @contextlib.contextmanager
+    def pinned(self, url):
+        """Fetch `url` and keep its file from being evicted until the block exits"""
+
+        path = self._fetch(url, pin=True)
+        try:
+            yield path
+        finally:
+            self._unpin(os.path.basename(path))
+
+    def _fetch(self, url, pin):
+        while True:
+            with self._lock:
+                entry = self._entry(url)
+                if entry is not None and not os.path.exists(os.path.join(self.objects, entry[0])):
+                    self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                    entry = None
+
+                if entry is not None:
+                    filename, etag, last_modified, fetched_at = entry
+                    fresh = self.max_age is None or time.time() - fetched_at < self.max_age
+                    if fresh or self.offline:
+                        self.hits += 1
+                        self._touch(url)
+                        return self._hold(filename, pin)
+                elif self.offline:
+                    raise OfflineError("{} is not cached and offline mode is on".format(url))
+
+            headers = {}
+            if entry is not None:
+                if entry[1]:
+                    headers['If-None-Match'] = entry[1]
+                if entry[2]:
+                    headers['If-Modified-Since'] = entry[2]
+            r = self.session.get(url, headers=headers, stream=True)
+            if r.status_code == 304:
+                r.close()
+                with self._lock:
+                    if os.path.exists(os.path.join(self.objects, entry[0])):
+                        self.hits += 1
+                        self._touch(url, fetched=True)
+                        return self._hold(entry[0], pin)
+                # Evicted while the request was out: download it again
+                continue
+            r.raise_for_status()
+            # Download outside the lock, so several threads can fetch at once
+            tmp, digest, size = self._download(r)
+            with self._lock:
+                self.misses += 1
+                path = self._store(url, r, tmp, digest, size)
+                self._evict(keep=url)
+                return self._hold(os.path.basename(path), pin)
+
+    def _hold(self, filename, pin):
+        """The path of a stored file, pinned if asked; call with the lock held"""
+
+        if pin:
+            self._pins[filename] += 1
+        return os.path.join(self.objects, filename)
+
+    def _unpin(self, filename):
+        with self._lock:
+            self._pins[filename] -= 1
+            if self._pins[filename] == 0:
+                del self._pins[filename]
+                if self._db.execute("SELECT 1 FROM entries WHERE filename = ?",
+                                    (filename,)).fetchone() is None:
+                    # Evicted or replaced while it was held
+                    os.remove(os.path.join(self.objects, filename))
+
+    def _download(self, r):
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.objects, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            for block in r.iter_content(1 << 16):
+                digest.update(block)
+                size += len(block)
+                f.write(block)
+        return tmp, digest.hexdigest(), size
+
+    def _store(self, url, r, tmp, digest, size):
+        self.bytes_downloaded += size
+
+        # Keep the extension: readers like pd.read_sas() infer the format from it
+        ext = posixpath.splitext(urlparse(url).path)[1]
+        filename = digest + ext
+        path = os.path.join(self.objects, filename)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+
+        now = time.time()
+        self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (url, digest, filename, size, r.headers.get('ETag'),
+                          r.headers.get('Last-Modified'), now, now))
+        self._db.commit()
+        self._collect_garbage()
+        return path
+
+    def _collect_garbage(self):
+        """Delete stored files that no URL points to any more and no reader holds"""
+
+        referenced = {row[0] for row in self._db.execute("SELECT filename FROM entries")}
+        referenced.update(self._pins)
+        for name in os.listdir(self.objects):
+            if name not in referenced and not name.endswith('.part'):
+                os.remove(os.path.join(self.objects, name))
+
+    def size(self):
+        """Total bytes of the distinct files in the cache"""
+
+        row = self._db.execute(
+            "SELECT SUM(size) FROM (SELECT DISTINCT filename, size FROM entries)").fetchone()
+        return row[0] or 0
+
+    def _evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in `max_bytes`
+
+        Entries whose file is pinned by a reader are skipped.
+        """
+
+        while self.size() > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT url, filename FROM entries WHERE url != ? ORDER BY last_used",
+                (keep or '',)).fetchall()
+            url = next((url for url, filename in rows if filename not in self._pins), None)
+            if url is None:
+                break
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self._db.commit()
+        self._collect_garbage()
+
+    def clear(self):
+        """Remove every cached file"""
+
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self._collect_garbage()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'bytes_downloaded': self.bytes_downloaded, 'bytes_cached': self.size()}
+
+
+_default = None
+
+
+def default_cache():
+    """The shared cache used by the module-level readers"""
+
+    global _default
+    if _default is None:
+        _default = HTTPCache()
+    return _default
+
+
+def local_path(path_or_url, cache=None):
+    """Map a URL to its cached local copy; local paths and buffers pass through.
+
+    The copy can be evicted once this returns; use `local_copy()` to read it.
+    """
+
+    if not is_url(path_or_url):
+        return path_or_url
+    return (cache or default_cache()).fetch(path_or_url)
+
+
+@contextlib.contextmanager
+def local_copy(path_or_url, cache=None):
+    """Like `local_path()`, but a cached copy stays on disk until the block exits"""
+
+    if not is_url(path_or_url):
+        yield path_or_url
+        return
+    with (cache or default_cache()).pinned(path_or_url) as path:
+        yield path
+
+
+def _cached_reader(reader):
+    def read(path_or_url, *args, cache=None, **kwargs):
+        with local_copy(path_or_url, cache) as path:
+            return reader(path, *args, **kwargs)
+    read.__name__ = reader.__name__
+    read.__doc__ = "Call `pd.{}()` on a cached local copy of a URL".format(reader.__name__)
+    return read
+
+
+read_csv = _cached_reader(pd.read_csv)
+read_fwf = _cached_reader(pd.read_fwf)
+read_json = _cached_reader(pd.read_json)
+read_excel = _cached_reader(pd.read_excel)
+read_sas = _cached_reader(pd.read_sas)
+read_stata = _cached_reader(pd.read_stata)
+read_spss = _cached_reader(pd.read_spss)
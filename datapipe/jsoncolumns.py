@@ -0,0 +1,497 @@
+"""Decode and encode `orient="split"` and `orient="values"` JSON column by column.
+
+Chapter 3 shows the `orient=` layouts of `to_json()`, and saves `users_df`
+with `users_df.to_json("myjson.json", orient="values")`. Reading such a file
+back with `pd.read_json()` or `json.loads()` builds a Python object for every
+cell and a list for every row, then copies them into columns again.
+
+`read_json_columns()` instead scans the raw bytes with numpy: it finds the
+quotes, brackets and commas, works out where every cell starts and ends, and
+gathers the bytes of each column into one Arrow string array. Numbers are then
+parsed by Arrow's cast kernels, so no Python object is made per row::
+
+    users_df = read_json_columns("myjson.json", orient="values")
+
+`write_json_columns()` goes the other way: each column is formatted as JSON
+text by Arrow kernels and rows are joined in Arrow buffers, which are written
+to the file as they are.
+
+The fast path covers the tables `to_json()` writes: rows of plain values,
+with no objects or arrays inside cells. JSON types are kept as they are,
+so a column of quoted numbers stays text. Anything else, and any string
+column with backslash escapes, is decoded by the standard `json` module
+instead, which keeps integers of any width.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import jsonio
+from .httpcache import local_copy
+
+ORIENTS = ('split', 'values')
+
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+_OPEN, _CLOSE = (ord('['), ord('{')), (ord(']'), ord('}'))
+_STRUCTURAL = np.zeros(256, dtype=bool)
+_STRUCTURAL[np.frombuffer(b'[]{},:', dtype=np.uint8)] = True
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[np.frombuffer(b' \t\r\n', dtype=np.uint8)] = True
+_GATHER_CELLS = 1 << 16
+_BOOLEAN = np.zeros(256, dtype=bool)
+_BOOLEAN[np.frombuffer(b'tf', dtype=np.uint8)] = True
+_NUMBER = np.zeros(256, dtype=bool)
+_NUMBER[np.frombuffer(b'-0123456789', dtype=np.uint8)] = True
+_FRACTION = np.zeros(256, dtype=bool)
+_FRACTION[np.frombuffer(b'.eE', dtype=np.uint8)] = True
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as err:
+        raise ImportError("read_json_columns() requires pyarrow: pip install pyarrow") from err
+    return pyarrow
+
+
+class _Unsupported(Exception):
+    """The document is not a flat table; decode it the ordinary way"""
+
+
+def _outside_strings(buf):
+    """A mask of the bytes that are not inside strings (closing quotes count as outside)"""
+
+    quotes = buf == _QUOTE
+    slashes = np.flatnonzero(buf == _BACKSLASH)
+    if len(slashes):
+        # A quote is escaped when it follows an odd run of backslashes
+        at = np.flatnonzero(quotes)
+        i = np.arange(len(slashes))
+        new_run = np.ones(len(slashes), dtype=bool)
+        new_run[1:] = np.diff(slashes) != 1
+        run_length = i - np.maximum.accumulate(np.where(new_run, i, 0)) + 1
+        k = np.minimum(np.searchsorted(slashes, at - 1), len(slashes) - 1)
+        quotes[at[(slashes[k] == at - 1) & (run_length[k] % 2 == 1)]] = False
+    # Running parity of the quotes seen so far: 1 from an opening quote to its closing one
+    return np.bitwise_xor.accumulate(quotes.view(np.uint8)) == 0
+
+
+class _Tokens:
+    """The structural characters of a compact JSON document and their depths"""
+
+    def __init__(self, buf, outside):
+        self.buf = buf
+        self.pos = np.flatnonzero(_STRUCTURAL[buf] & outside)
+        self.char = buf[self.pos]
+        opens = (self.char == _OPEN[0]) | (self.char == _OPEN[1])
+        closes = (self.char == _CLOSE[0]) | (self.char == _CLOSE[1])
+        # Depth after each token: 1 inside the outermost brackets
+        self.depth = np.cumsum(opens.astype(np.int32) - closes, dtype=np.int32)
+
+    def matching(self, i):
+        """Index of the token that closes the bracket at token i"""
+
+        level = self.depth[i] - 1
+        later = np.flatnonzero(self.depth[i + 1:] == level)
+        if not len(later):
+            raise _Unsupported()
+        return i + 1 + later[0]
+
+    def items(self, lo, hi):
+        """Start and end byte of each item of the array between tokens lo and hi"""
+
+        level = self.depth[lo]
+        inner = slice(lo + 1, hi)
+        if (self.depth[inner] > level).any():
+            raise _Unsupported()
+        commas = self.pos[inner]
+        starts = np.concatenate([[self.pos[lo] + 1], commas + 1])
+        ends = np.concatenate([commas, [self.pos[hi]]])
+        if len(starts) == 1 and starts[0] == ends[0]:
+            return starts[:0], ends[:0]
+        return starts, ends
+
+    def rows(self, lo, hi):
+        """Cell bounds, shaped (rows, columns), of the array of arrays between lo and hi"""
+
+        level = self.depth[lo]
+        inner = slice(lo + 1, hi)
+        char, depth = self.char[inner], self.depth[inner]
+        if hi == lo + 1:
+            return np.empty((0, 0), np.int64), np.empty((0, 0), np.int64)
+        if (depth > level + 1).any() or (char == _OPEN[1]).any() or (char == ord(':')).any():
+            raise _Unsupported()
+        row_open = (char == _OPEN[0]) & (depth == level + 1)
+        row_close = (char == _CLOSE[0]) & (depth == level)
+        row_comma = (char == ord(',')) & (depth == level)
+        bounds = self.pos[inner][~row_comma]
+        kinds = char[~row_comma]
+        nrows = int(row_open.sum())
+        if nrows == 0 or len(bounds) % nrows:
+            raise _Unsupported()
+        # Every row must be an array holding the same number of values
+        bounds = bounds.reshape(nrows, -1)
+        kinds = kinds.reshape(nrows, -1)
+        opened, closed = self.pos[inner][row_open], self.pos[inner][row_close]
+        if not ((kinds[:, 0] == _OPEN[0]).all() and (kinds[:, -1] == _CLOSE[0]).all()
+                and (kinds[:, 1:-1] == ord(',')).all()
+                and opened[0] == self.pos[lo] + 1 and closed[-1] == self.pos[hi] - 1
+                and (opened[1:] == closed[:-1] + 2).all()):
+            raise _Unsupported()
+        starts, ends = bounds[:, :-1] + 1, bounds[:, 1:]
+        if (starts == ends).any():
+            if bounds.shape[1] == 2 and (starts == ends).all():
+                return starts[:, :0], ends[:, :0]
+            raise _Unsupported()
+        return starts, ends
+
+
+def _compact(buf):
+    """The document without the whitespace between tokens, and its outside-strings mask"""
+
+    outside = _outside_strings(buf)
+    blanks = _WHITESPACE[buf]
+    blanks &= outside
+    if blanks.any():
+        # Dropping bytes outside strings leaves the rest of the mask as it was
+        keep = ~blanks
+        return buf[keep], outside[keep]
+    return buf, outside
+
+
+def _gather(buf, starts, ends, valid):
+    """One Arrow string array holding buf[start:end] for each cell"""
+
+    pa = _require_pyarrow()
+    lengths = np.where(valid, ends - starts, 0)
+    offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    data = np.empty(offsets[-1], dtype=np.uint8)
+    # A byte index per output byte is 8x the column, so build it a block of cells at a time
+    for lo in range(0, len(starts), _GATHER_CELLS):
+        hi = min(lo + _GATHER_CELLS, len(starts))
+        first, last = offsets[lo], offsets[hi]
+        index = np.repeat(starts[lo:hi] - offsets[lo:hi], lengths[lo:hi])
+        index += np.arange(first, last)
+        data[first:last] = buf[index]
+    nulls = None
+    null_count = int(len(valid) - valid.sum())
+    if null_count:
+        nulls = pa.py_buffer(np.packbits(valid, bitorder='little'))
+    return pa.LargeStringArray.from_buffers(len(starts), pa.py_buffer(offsets),
+                                            pa.py_buffer(data), nulls, null_count)
+
+
+def _objects(buf, starts, ends):
+    """Decode the cells one by one, for columns the fast path does not handle.
+
+    This uses the standard library, so integers wider than 64 bits stay exact.
+    """
+
+    cells = b','.join(buf[s:e].tobytes() for s, e in zip(starts, ends))
+    return json.loads(b'[' + cells + b']')
+
+
+def _column(buf, starts, ends):
+    """An Arrow array, or a list of Python values, for one column of cells"""
+
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    n = len(starts)
+    first = buf[starts]
+    lengths = ends - starts
+    valid = first != ord('n')
+    if not (lengths[~valid] == 4).all():
+        # Not `null`: let the JSON decoder report it
+        return _objects(buf, starts, ends)
+    present = first[valid]
+    if not len(present):
+        return pa.nulls(n)
+    if (present == _QUOTE).all() and (buf[ends[valid] - 1] == _QUOTE).all() and \
+            (lengths[valid] >= 2).all():
+        text = _gather(buf, starts + 1, ends - 1, valid)
+        if (np.frombuffer(text.buffers()[2], dtype=np.uint8) == _BACKSLASH).any():
+            return pa.array(_objects(buf, starts, ends), type=pa.large_string())
+        return text
+    if _BOOLEAN[present].all():
+        true = first == ord('t')
+        if (lengths[valid] == np.where(true, 4, 5)[valid]).all():
+            return pa.array(true, mask=~valid)
+    elif _NUMBER[present].all():
+        text = _gather(buf, starts, ends, valid)
+        digits = np.frombuffer(text.buffers()[2], dtype=np.uint8)
+        floating = _FRACTION[digits].any()
+        try:
+            return pc.cast(text, pa.float64() if floating else pa.int64())
+        except pa.ArrowInvalid:
+            # Integers wider than 64 bits, or not a number after all
+            pass
+    return _objects(buf, starts, ends)
+
+
+def to_pandas(column, dtype_backend=None):
+    """A Series from a column made here: an Arrow array, or a list of Python values.
+
+    `dtype_backend="pyarrow"` keeps the Arrow array; otherwise it is converted
+    to the default pandas dtype.
+    """
+
+    if isinstance(column, list):
+        values = np.empty(len(column), dtype=object)
+        values[:] = column
+        return pd.Series(values)
+    if dtype_backend == 'pyarrow':
+        return pd.Series(pd.arrays.ArrowExtensionArray(column))
+    return column.to_pandas()
+
+
+def _frame(buf, starts, ends, names, index, dtype_backend):
+    if not len(starts):
+        return pd.DataFrame(columns=names if names is not None else [], index=index)
+    data = [to_pandas(_column(buf, starts[:, j], ends[:, j]), dtype_backend)
+            for j in range(starts.shape[1])]
+    if names is None:
+        names = range(len(data))
+    if len(names) != len(data):
+        raise ValueError("{} column names for {} columns".format(len(names), len(data)))
+    df = pd.concat(data, axis=1, ignore_index=True) if data else \
+        pd.DataFrame(index=range(len(starts)))
+    df.columns = pd.Index(list(names))
+    if index is not None:
+        df.index = index
+    return df
+
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, str) and source.lstrip()[:1] in ('[', '{'):
+        return source.encode('utf-8')
+    with local_copy(source) as path, open(path, 'rb') as f:
+        return f.read()
+
+
+def _fallback(data, orient, columns):
+    doc = jsonio.loads(data)
+    if orient == 'values':
+        return pd.DataFrame(doc, columns=columns)
+    return pd.DataFrame(doc['data'], columns=doc.get('columns'), index=doc.get('index'))
+
+
+def _decode(data, orient, columns, dtype_backend):
+    buf, outside = _compact(np.frombuffer(data, dtype=np.uint8))
+    tokens = _Tokens(buf, outside)
+    if not len(tokens.pos) or tokens.pos[0] != 0 or tokens.pos[-1] != len(buf) - 1:
+        raise _Unsupported()
+    last = len(tokens.pos) - 1
+    if orient == 'values':
+        if buf[0] != _OPEN[0]:
+            raise _Unsupported()
+        starts, ends = tokens.rows(0, last)
+        return _frame(buf, starts, ends, columns, None, dtype_backend)
+
+    if buf[0] != _OPEN[1]:
+        raise _Unsupported()
+    # The keys of the top-level object and the token span of each value
+    spans, i = {}, 0
+    while i < last:
+        colon = i + 1
+        if tokens.char[colon] != ord(':') or tokens.depth[colon] != 1:
+            raise _Unsupported()
+        key = jsonio.loads(buf[tokens.pos[i] + 1:tokens.pos[colon]].tobytes())
+        if tokens.char[colon + 1] in _OPEN and tokens.pos[colon + 1] == tokens.pos[colon] + 1:
+            end = tokens.matching(colon + 1)
+            spans[key] = (colon + 1, end)
+            i = end + 1
+        else:
+            spans[key] = None
+            i = colon + 1
+        if tokens.char[i] not in (ord(','), _CLOSE[1]) or tokens.depth[i] > 1:
+            raise _Unsupported()
+    if 'data' not in spans or spans['data'] is None:
+        raise _Unsupported()
+    names = columns
+    if names is None and spans.get('columns'):
+        lo, hi = spans['columns']
+        names = jsonio.loads(buf[tokens.pos[lo]:tokens.pos[hi] + 1].tobytes())
+    index = None
+    if spans.get('index'):
+        index_starts, index_ends = tokens.items(*spans['index'])
+        index = pd.Index(to_pandas(_column(buf, index_starts, index_ends), dtype_backend))
+    starts, ends = tokens.rows(*spans['data'])
+    if index is not None and len(index) != len(starts):
+        raise _Unsupported()
+    return _frame(buf, starts, ends, names, index, dtype_backend)
+
+
+def values_columns(data):
+    """The columns of the values-orient table in bytes `data` as Arrow arrays.
+
+    Columns the fast path cannot gather come back as lists of Python values.
+    Returns None if `data` is not such a table.
+    """
+
+    try:
+        buf, outside = _compact(np.frombuffer(data, dtype=np.uint8))
+        tokens = _Tokens(buf, outside)
+        if not len(tokens.pos) or tokens.pos[0] != 0 or tokens.pos[-1] != len(buf) - 1 \
+                or buf[0] != _OPEN[0]:
+            return None
+        starts, ends = tokens.rows(0, len(tokens.pos) - 1)
+    except _Unsupported:
+        return None
+    return [_column(buf, starts[:, j], ends[:, j]) for j in range(starts.shape[1])]
+
+
+def read_json_columns(source, orient='split', columns=None, dtype_backend=None):
+    """Read an `orient="split"` or `orient="values"` JSON table column by column.
+
+    `source` is a path, URL, bytes or the JSON text itself. `columns` names
+    the columns of a values-orient table (they are numbered otherwise) and
+    overrides the names in a split-orient one. With `dtype_backend="pyarrow"`
+    the columns keep their Arrow arrays; otherwise they are converted to the
+    default pandas dtypes.
+    """
+
+    if orient not in ORIENTS:
+        raise ValueError("orient must be one of {}".format(ORIENTS))
+    data = _read_bytes(source)
+    try:
+        return _decode(data, orient, columns, dtype_backend)
+    except _Unsupported:
+        return _fallback(data, orient, columns)
+
+
+def _concat(*parts):
+    """Element-wise concatenation of large string arrays and str constants"""
+
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    parts = [pa.scalar(p, pa.large_string()) if isinstance(p, str) else
+             pc.cast(p, pa.large_string()) for p in parts]
+    return pc.binary_join_element_wise(*parts, pa.scalar('', pa.large_string()))
+
+
+def _json_text(series):
+    """Format one column as an Arrow array of JSON values, with no nulls"""
+
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    try:
+        arr = pa.Array.from_pandas(series)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        arr = None
+    if arr is not None and pa.types.is_dictionary(arr.type):
+        arr = arr.dictionary_decode()
+    if arr is not None and pa.types.is_timestamp(arr.type):
+        # ISO strings with milliseconds, in UTC with a Z if there is a time zone, as
+        # to_json(date_format="iso") writes them
+        utc = arr.type.tz is not None
+        arr = pc.cast(arr, pa.timestamp('ms', 'UTC' if utc else None), safe=False)
+        arr = pc.strftime(arr, format='%Y-%m-%dT%H:%M:%S' + ('Z' if utc else ''))
+    if arr is None:
+        text = None
+    elif pa.types.is_boolean(arr.type):
+        text = pc.if_else(arr, 'true', 'false')
+    elif pa.types.is_integer(arr.type):
+        text = pc.cast(arr, pa.string())
+    elif pa.types.is_floating(arr.type):
+        arr = pc.if_else(pc.is_finite(arr), arr, None)
+        text = pc.cast(arr, pa.string())
+        # Keep the `.0` of integral floats, so they are read back as floats
+        bare = pc.invert(pc.match_substring_regex(text, '[.e]'))
+        text = pc.if_else(bare, pc.binary_join_element_wise(text, '.0', ''), text)
+    elif pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type):
+        if pc.any(pc.match_substring_regex(arr, '[\x00-\x1f]')).as_py():
+            text = None
+        else:
+            escaped = pc.replace_substring(pc.replace_substring(arr, '\\', '\\\\'), '"', '\\"')
+            text = _concat('"', escaped, '"')
+    else:
+        text = None
+    if text is None:
+        # Mixed objects, control characters, ...: let the JSON encoder format them
+        values = [jsonio.dumps(None if v is pd.NA or v is pd.NaT or
+                               (isinstance(v, float) and not np.isfinite(v)) else v)
+                  for v in series.astype(object)]
+        return pa.array(values, type=pa.large_string())
+    # Large strings throughout, so a block of rows can pass 2 GiB
+    return pc.cast(pc.fill_null(text, 'null'), pa.large_string())
+
+
+def _joined(pieces, sep):
+    """The bytes of an Arrow string array's values, each followed by `sep`"""
+
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    joined = _concat(pieces, sep)
+    if isinstance(joined, pa.ChunkedArray):
+        joined = joined.combine_chunks()
+    # A string array's data buffer is its values back to back
+    offsets = np.frombuffer(joined.buffers()[1], dtype=np.int64)[joined.offset:]
+    start, end = int(offsets[0]), int(offsets[len(joined)])
+    return joined.buffers()[2][start:end]
+
+
+def _encode(df, orient, index, chunk_rows):
+    """Yield the pieces of the encoded document, as bytes or Arrow buffers"""
+
+    if orient not in ORIENTS:
+        raise ValueError("orient must be one of {}".format(ORIENTS))
+    if orient == 'split':
+        yield b'{"columns":' + jsonio.dumps([c for c in df.columns]).encode('utf-8')
+        if index:
+            yield b',"index":['
+            yield from _encode_rows([df.index.to_series(index=range(len(df)))], len(df),
+                                    chunk_rows, wrap=False)
+            yield b']'
+        yield b',"data":['
+    else:
+        yield b'['
+    columns = [df.iloc[:, j] for j in range(df.shape[1])]
+    yield from _encode_rows(columns, len(df), chunk_rows, wrap=True)
+    yield b']}' if orient == 'split' else b']'
+
+
+def _encode_rows(columns, nrows, chunk_rows, wrap):
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    for start in range(0, nrows, chunk_rows):
+        stop = min(start + chunk_rows, nrows)
+        cells = [_json_text(col.iloc[start:stop]) for col in columns]
+        if wrap:
+            if cells:
+                rows = pc.binary_join_element_wise(*cells, pa.scalar(',', pa.large_string()))
+            else:
+                rows = pa.array([''] * (stop - start), type=pa.large_string())
+            rows = _concat('[', rows, ']')
+        else:
+            rows = cells[0]
+        block = _joined(rows, ',')
+        # The separator after the last value of the table is not wanted
+        yield block if stop < nrows else block[:len(block) - 1]
+
+
+def encode_json_columns(df, orient='split', index=True, chunk_rows=100000):
+    """`df.to_json(orient=orient)` as bytes, formatted column by column.
+
+    Floats are written with every digit, where `to_json()` rounds them to
+    ten; timestamps as ISO strings.
+    """
+
+    return b''.join(bytes(piece) for piece in _encode(df, orient, index, chunk_rows))
+
+
+def write_json_columns(df, path, orient='split', index=True, chunk_rows=100000):
+    """Write `df` as an `orient="split"` or `orient="values"` JSON file"""
+
+    with open(path, 'wb') as f:
+        for piece in _encode(df, orient, index, chunk_rows):
+            f.write(piece)
@@ -0,0 +1,270 @@
+"""One place to encode and decode JSON, with the fastest library available.
+
+The chapters call `json.loads(r.text)` on API responses, `json.dumps()` on
+records, and `json.loads(df.to_json(orient="records"))` to turn a frame into
+documents for MongoDB. `loads()` and `dumps()` here are drop-in replacements
+that use `orjson` if it is installed, then `ujson`, then the standard library::
+
+    from datapipe import jsonio
+    users_json = jsonio.loads_response(requests.get(url))
+    wine_json = jsonio.to_records(total)
+
+Whatever the backend, `dumps()` writes numpy and pandas scalars and arrays,
+timestamps, dates and `pd.NA` without a custom encoder. orjson writes NaN as
+null, the other backends as `NaN`; `loads()` reads either. Input a fast
+backend cannot handle, such as `NaN` for orjson or integers wider than 64 bits,
+falls back to the standard library, so no precision is lost. Set
+`DATAPIPE_JSON` to `orjson`, `ujson` or `json` to pick a backend, or call
+`set_backend()`.
+"""
+
+import datetime
+import decimal
+import gc
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+# Documents at least this long are decoded with the cyclic garbage collector paused
+GC_PAUSE_SIZE = 1 << 20
+
+# A run of 19 or more digits that is not part of a fraction or exponent: an integer
+# that may not fit in 64 bits. orjson would quietly read it as a float.
+_WIDE_INTEGER = r'(?<![\d.eE+])-?\d{19,}(?![\d.eE])'
+_WIDE_INTEGER_BYTES = re.compile(_WIDE_INTEGER.encode('ascii'))
+# Maps digits to b'0', the decimal point to itself and everything else to a space,
+# so a quick substring search screens out documents before the regex runs. The
+# space in front skips the digits of fractions such as 0.0012345678901234567.
+_DIGIT_MASK = bytes(48 if 48 <= i < 58 else i if i == 46 else 32 for i in range(256))
+_DIGIT_RUN = b'0' * 19
+
+
+def _has_wide_integer(s):
+    data = s.encode('utf-8') if isinstance(s, str) else bytes(s)
+    masked = data.translate(_DIGIT_MASK)
+    if b' ' + _DIGIT_RUN not in masked and not masked.startswith(_DIGIT_RUN):
+        return False
+    return any(not -2**63 <= int(match.group()) < 2**64
+               for match in _WIDE_INTEGER_BYTES.finditer(data))
+
+
+def default(obj):
+    """Turn values the JSON libraries do not know into ones they do"""
+
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.datetime64):
+        return None if np.isnat(obj) else pd.Timestamp(obj).isoformat()
+    if isinstance(obj, np.timedelta64):
+        return None if np.isnat(obj) else pd.Timedelta(obj).isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, pd.Timedelta):
+        return obj.isoformat()
+    if isinstance(obj, (pd.Series, pd.Index, pd.api.extensions.ExtensionArray)):
+        return [default(v) if v is pd.NA or v is pd.NaT else v for v in obj.tolist()]
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+
+class _Stdlib:
+    name = 'json'
+
+    def loads(self, s):
+        return json.loads(s)
+
+    def dumps(self, obj, indent=None, sort_keys=False):
+        return json.dumps(obj, indent=indent, sort_keys=sort_keys, default=default)
+
+
+class _Ujson:
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.module = ujson
+
+    def loads(self, s):
+        return self.module.loads(s)
+
+    def dumps(self, obj, indent=None, sort_keys=False):
+        return self.module.dumps(obj, indent=indent or 0, sort_keys=sort_keys,
+                                 ensure_ascii=False, escape_forward_slashes=False,
+                                 default=default)
+
+
+class _Orjson:
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.module = orjson
+        self.options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def loads(self, s):
+        if _has_wide_integer(s):
+            raise ValueError("integer wider than 64 bits")
+        return self.module.loads(s)
+
+    def dumps(self, obj, indent=None, sort_keys=False):
+        if indent not in (None, 2):
+            # orjson only indents by two spaces
+            raise TypeError("orjson cannot indent by {}".format(indent))
+        options = self.options
+        if indent:
+            options |= self.module.OPT_INDENT_2
+        if sort_keys:
+            options |= self.module.OPT_SORT_KEYS
+        return self.module.dumps(obj, default=default, option=options).decode('utf-8')
+
+
+_CLASSES = {'orjson': _Orjson, 'ujson': _Ujson, 'json': _Stdlib}
+_stdlib = _Stdlib()
+_backend = None
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+
+class _PausedGC:
+    """Keep the cyclic collector off while any thread decodes a large document.
+
+    Decoding allocates millions of dicts and lists, which triggers a collection
+    pass over all of them every few thousand objects. Decoded JSON cannot hold
+    reference cycles, so those passes find nothing.
+    """
+
+    def __enter__(self):
+        global _gc_pauses, _gc_was_enabled
+        with _gc_lock:
+            if _gc_pauses == 0:
+                _gc_was_enabled = gc.isenabled()
+                gc.disable()
+            _gc_pauses += 1
+
+    def __exit__(self, *exc):
+        global _gc_pauses
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+def _decode(backend, s):
+    if len(s) < GC_PAUSE_SIZE:
+        return backend.loads(s)
+    with _PausedGC():
+        return backend.loads(s)
+
+
+def available_backends():
+    """Names of the backends that can be imported here, fastest first"""
+
+    names = []
+    for name in BACKENDS:
+        try:
+            _CLASSES[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_backend(name=None):
+    """Use the named backend, or the fastest one available if `name` is None"""
+
+    global _backend
+    if name is None:
+        name = os.environ.get('DATAPIPE_JSON') or available_backends()[0]
+    if name not in _CLASSES:
+        raise ValueError("unknown JSON backend {!r}; choose from {}".format(name, BACKENDS))
+    try:
+        _backend = _stdlib if name == 'json' else _CLASSES[name]()
+    except ImportError:
+        raise ImportError("the {0} JSON backend needs {0}: pip install {0}".format(name))
+    return _backend.name
+
+
+def get_backend():
+    """The name of the backend in use"""
+
+    if _backend is None:
+        set_backend()
+    return _backend.name
+
+
+def loads(s):
+    """Decode a JSON document given as str or bytes"""
+
+    if _backend is None:
+        set_backend()
+    try:
+        return _decode(_backend, s)
+    except ValueError:
+        if _backend is _stdlib:
+            raise
+        # NaN, huge numbers and other input only the standard library accepts;
+        # anything really broken raises json.JSONDecodeError from here
+        return _decode(_stdlib, s)
+
+
+def dumps(obj, indent=None, sort_keys=False):
+    """Encode `obj` as a JSON string"""
+
+    if _backend is None:
+        set_backend()
+    try:
+        return _backend.dumps(obj, indent=indent, sort_keys=sort_keys)
+    except (TypeError, OverflowError):
+        if _backend is _stdlib:
+            raise
+        return _stdlib.dumps(obj, indent=indent, sort_keys=sort_keys)
+
+
+def load(f):
+    """Decode the JSON document in an open file"""
+
+    return loads(f.read())
+
+
+def dump(obj, f, indent=None, sort_keys=False):
+    """Encode `obj` as JSON into an open text file"""
+
+    f.write(dumps(obj, indent=indent, sort_keys=sort_keys))
+
+
+def loads_response(response):
+    """Decode the JSON body of a `requests` response.
+
+    Same result as `json.loads(r.text)`, but decodes the raw bytes, so
+    requests does not have to guess the text encoding first.
+    """
+
+    encoding = (response.encoding or 'utf-8').lower().replace('-', '').replace('_', '')
+    # requests falls back to ISO-8859-1 when a text/* response names no charset,
+    # but JSON without a charset is UTF-8
+    if encoding not in ('utf8', 'ascii', 'iso88591'):
+        return loads(response.text)
+    return loads(response.content)
+
+
+def to_records(df, **kwargs):
+    """`json.loads(df.to_json(orient="records"))`: a list of plain-Python dicts.
+
+    Keyword arguments such as `date_format` go to `df.to_json()`.
+    """
+
+    return loads(df.to_json(orient='records', **kwargs))
@@ -0,0 +1,199 @@
+"""Read and write data frames as JSON Lines, one record per line.
+
+Chapter 3 saves the users data as one indented document with
+`json.dump(users_json, f, indent=4)`, and converts frames with
+`df.to_json(orient=...)`. Either way the whole document is built, or
+decoded, in one piece. In JSON Lines every line is a complete record, so
+a file can be cut at any newline::
+
+    write_jsonl(users_df, "users.jsonl")
+    users_df = read_jsonl("users.jsonl")
+
+`read_jsonl()` splits the file into byte ranges that end at newlines and
+decodes the ranges in a process pool, each worker reading its own range. Compressed
+files (`.gz`, `.zst`) cannot be split without being read, so the main process
+decompresses them and passes blocks of lines to the workers. `write_jsonl()`
+formats and writes `chunk_rows` rows at a time.
+"""
+
+import gzip
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import jsonio
+from .httpcache import local_copy
+from .writers import TextSink, split_path
+
+
+def _open_binary(path):
+    compression = split_path(path)[1]
+    if compression == 'gz':
+        return gzip.open(path, 'rb')
+    if compression == 'zst':
+        try:
+            import zstandard
+        except ImportError as err:
+            raise ImportError("reading .zst files requires zstandard: "
+                              "pip install zstandard") from err
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def _decode_block(data, offset, columns, normalize):
+    """Decode a block of whole lines into a frame; `offset` is its place in the file"""
+
+    lines = [line for line in data.split(b'\n') if line.strip()]
+    if not lines:
+        return None
+    try:
+        # One decoder call for the whole block instead of one per line
+        records = jsonio.loads(b'[' + b','.join(lines) + b']')
+    except ValueError:
+        records = []
+        position = offset
+        for line in data.split(b'\n'):
+            if line.strip():
+                try:
+                    records.append(jsonio.loads(line))
+                except ValueError as err:
+                    raise ValueError("invalid JSON on the line at byte {}: {}".format(
+                        position, err)) from None
+            position += len(line) + 1
+    if normalize:
+        df = pd.json_normalize(records)
+    else:
+        df = pd.DataFrame.from_records(records)
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    return df
+
+
+def _decode_range(path, start, end, columns, normalize):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return _decode_block(data, start, columns, normalize)
+
+
+def _ranges(path, chunk_bytes):
+    """Byte ranges of about `chunk_bytes` that end just after a newline"""
+
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            end = start + chunk_bytes
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            end = min(end, size)
+            yield start, end
+            start = end
+
+
+def _blocks(f, chunk_bytes):
+    """Blocks of whole lines read from a stream, with their offsets"""
+
+    offset, rest = 0, b''
+    while True:
+        data = f.read(chunk_bytes)
+        if not data:
+            break
+        data = rest + data
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            rest = data
+            continue
+        yield data[:cut], offset
+        offset += cut
+        rest = data[cut:]
+    if rest:
+        yield rest, offset
+
+
+def _submit_bounded(pool, fn, argument_lists, window):
+    """Results of `fn` over the argument lists, in order, with at most `window` pending"""
+
+    pending = []
+    for args in argument_lists:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.pop(0).result()
+    for job in pending:
+        yield job.result()
+
+
+def read_jsonl(source, columns=None, normalize=False, workers=None, chunk_bytes=16 << 20):
+    """Read a JSON Lines file or URL into a data frame, decoding chunks in parallel.
+
+    Each line becomes a row, as with `pd.read_json(source, lines=True)`, but
+    column types are inferred as `pd.DataFrame()` infers them from records:
+    strings that look like dates stay strings. `columns` keeps only those keys.
+    `normalize=True` flattens nested objects into dotted columns, as
+    `pd.json_normalize()` does. `workers=1` decodes in this process.
+    """
+
+    with local_copy(source) as path:
+        compressed = split_path(path)[1] is not None
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if not compressed and os.path.getsize(path) <= chunk_bytes:
+            workers = 1
+
+        if workers == 1:
+            with _open_binary(path) as f:
+                frames = [_decode_block(data, offset, columns, normalize)
+                          for data, offset in _blocks(f, chunk_bytes)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                if compressed:
+                    with _open_binary(path) as f:
+                        jobs = _submit_bounded(pool, _decode_block, (
+                            (data, offset, columns, normalize)
+                            for data, offset in _blocks(f, chunk_bytes)), 2 * workers)
+                        frames = list(jobs)
+                else:
+                    frames = list(pool.map(_decode_range, *zip(*[
+                        (path, start, end, columns, normalize)
+                        for start, end in _ranges(path, chunk_bytes)])))
+        frames = [df for df in frames if df is not None]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+
+def write_jsonl(df, path, index=False, chunk_rows=100000, date_format='iso', **kwargs):
+    """Write `df` as JSON Lines, `chunk_rows` rows at a time.
+
+    `path` is a file name, where `.gz` or `.zst` compress the output, or an
+    open file. With `index=True` the index is written as ordinary fields of
+    each record. Other keyword arguments go to `df.to_json()`, and the lines
+    are the same as those of `df.to_json(orient="records", lines=True,
+    date_format="iso")`; pass `force_ascii=False` to write non-ASCII text as
+    UTF-8 rather than `\\u` escapes.
+    """
+
+    if hasattr(path, 'write'):
+        sink, close = path, False
+        text = isinstance(path, io.TextIOBase)
+    else:
+        sink, close, text = TextSink(path, None), True, False
+    try:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            if index:
+                chunk = chunk.reset_index()
+            lines = chunk.to_json(orient='records', lines=True, date_format=date_format,
+                                  **kwargs)
+            if not lines.endswith('\n'):
+                lines += '\n'
+            sink.write(lines if text else lines.encode('utf-8'))
+    finally:
+        if close:
+            sink.close()
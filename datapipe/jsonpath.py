@@ -0,0 +1,183 @@
+"""Pull fields out of many JSON records with a plan compiled once.
+
+Chapter 3 extracts fields from the users data one record at a time::
+
+    [[u['name'], u['email'], u['company']['name']] for u in users_json]
+
+or flattens everything with `pd.json_normalize()` and keeps a few columns.
+`compile_paths()` turns a set of dotted paths into one generated Python
+function. The function walks every record once and appends each field
+straight into a column buffer: `array.array` for numbers and booleans,
+a list for text. A missing key, or a value of the wrong type, becomes a null::
+
+    extract = compile_paths(['name', 'email', 'company.name', 'address.geo.lat'],
+                            dtypes={'address.geo.lat': 'float64'})
+    users_df = extract(users_json)
+
+A path segment made only of digits indexes into a list, e.g. `tags.0`. With
+`attributes=True` the other segments are read as attributes instead of keys,
+for API objects such as tweepy's `tweet.user.screen_name`.
+"""
+
+import array
+import math
+
+import numpy as np
+import pandas as pd
+
+from . import jsonio
+from .httpcache import local_copy
+
+# dtype -> (array typecode, whether a validity mask is kept)
+_BUFFERS = {
+    'float64': ('d', False),
+    'int64': ('q', True),
+    'bool': ('b', True),
+}
+_MISSING_ERRORS = '(LookupError, TypeError, ValueError, AttributeError, OverflowError)'
+
+
+def _whole(v):
+    """A float with no fraction as an int; any other value is of the wrong type"""
+
+    if type(v) is float and v.is_integer():
+        return int(v)
+    raise TypeError(v)
+
+
+def _flag(v):
+    """0 or 1, as an int or float, as a bool; any other value is of the wrong type"""
+
+    if type(v) in (int, float) and (v == 0 or v == 1):
+        return v == 1
+    raise TypeError(v)
+
+
+def _expression(path, sep, attributes=False):
+    """Python source that indexes a record `r` along a dotted path"""
+
+    expr = 'r'
+    for part in path.split(sep):
+        if part.isdigit():
+            expr += '[{}]'.format(int(part))
+        elif attributes and part.isidentifier():
+            expr += '.' + part
+        else:
+            expr += '[{!r}]'.format(part)
+    return expr
+
+
+def _column_source(j, path, dtype, sep, attributes=False):
+    """Generated statements that append one field of `r` to column buffer j"""
+
+    expr = _expression(path, sep, attributes)
+    if dtype == 'float64':
+        return ["try: a{j}(float({e}))".format(j=j, e=expr),
+                "except {}: a{j}(nan)".format(_MISSING_ERRORS, j=j)]
+    if dtype == 'int64':
+        convert = "v if type(v) is int else whole(v)"
+    elif dtype == 'bool':
+        convert = "v if type(v) is bool else flag(v)"
+    else:
+        # Text or inferred: keep the Python value as it is
+        return ["try: a{j}({e})".format(j=j, e=expr),
+                "except {}: a{j}(None)".format(_MISSING_ERRORS, j=j)]
+    return ["try:",
+            "    v = {}".format(expr),
+            "    if v is None: raise TypeError",
+            "    a{j}({c}); m{j}(1)".format(j=j, c=convert),
+            "except {}: a{j}(0); m{j}(0)".format(_MISSING_ERRORS, j=j)]
+
+
+class PathExtractor:
+    """A compiled plan that extracts a fixed set of paths from records.
+
+    `paths` is a list of dotted paths, or a dict mapping column names to
+    paths. `dtypes` maps a column name to 'float64', 'int64', 'bool' or
+    'str'. Columns without a dtype are inferred by pandas. Integer and boolean
+    columns come back as nullable `Int64` / `boolean`; an 'int64' field takes
+    ints and whole floats such as 3.0, and anything else, such as 3.7 or
+    '3', is null. A 'bool' field takes booleans and the numbers 0 and 1;
+    anything else, such as 2, 0.7 or '1', is null. `attributes=True` reads
+    path segments as attributes rather than keys. The generated code is
+    kept in `.source`.
+    """
+
+    def __init__(self, paths, dtypes=None, sep='.', attributes=False):
+        if not isinstance(paths, dict):
+            paths = {p: p for p in paths}
+        self.paths = dict(paths)
+        self.dtypes = dict(dtypes or {})
+        unknown = set(self.dtypes.values()) - set(_BUFFERS) - {'str', 'object'}
+        if unknown:
+            raise ValueError("unsupported dtypes: {}".format(sorted(unknown)))
+        self.columns = list(self.paths)
+
+        lines = ["def extract(records, buffers):"]
+        for j, name in enumerate(self.columns):
+            lines.append("    a{j} = buffers[{j}][0].append".format(j=j))
+            if _BUFFERS.get(self.dtypes.get(name), (None, False))[1]:
+                lines.append("    m{j} = buffers[{j}][1].append".format(j=j))
+        lines.append("    for r in records:")
+        for j, name in enumerate(self.columns):
+            for stmt in _column_source(j, self.paths[name], self.dtypes.get(name), sep,
+                                       attributes):
+                lines.append("        " + stmt)
+        if not self.columns:
+            lines.append("        pass")
+        self.source = "\n".join(lines) + "\n"
+        namespace = {'nan': math.nan, 'whole': _whole, 'flag': _flag}
+        exec(compile(self.source, "<PathExtractor>", "exec"), namespace)
+        self._extract = namespace['extract']
+
+    def _buffers(self):
+        buffers = []
+        for name in self.columns:
+            typecode, masked = _BUFFERS.get(self.dtypes.get(name), (None, False))
+            values = array.array(typecode) if typecode else []
+            buffers.append((values, bytearray() if masked else None))
+        return buffers
+
+    def _frame(self, buffers, index=None):
+        data = {}
+        for name, (values, mask) in zip(self.columns, buffers):
+            dtype = self.dtypes.get(name)
+            if dtype == 'float64':
+                data[name] = np.frombuffer(values, dtype=np.float64)
+            elif dtype in ('int64', 'bool'):
+                # The buffers are typed already: wrap them without copying
+                valid = np.frombuffer(mask, dtype=np.bool_)
+                raw = np.frombuffer(values, dtype=np.int64 if dtype == 'int64' else np.int8)
+                if dtype == 'int64':
+                    data[name] = pd.arrays.IntegerArray(raw, ~valid)
+                else:
+                    data[name] = pd.arrays.BooleanArray(raw.astype(np.bool_), ~valid)
+            elif dtype in ('str', 'object'):
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+                data[name] = column
+            else:
+                data[name] = values
+        return pd.DataFrame(data, columns=self.columns, index=index)
+
+    def __call__(self, records, index=None):
+        """Extract the columns from an iterable of decoded records"""
+
+        buffers = self._buffers()
+        self._extract(records, buffers)
+        return self._frame(buffers, index)
+
+    extract = __call__
+
+    def extract_jsonl(self, source, encoding='utf-8'):
+        """Extract the columns from a JSON Lines file or URL, one line at a time"""
+
+        loads = jsonio.loads
+        with local_copy(source) as path, open(path, encoding=encoding) as f:
+            return self(loads(line) for line in f if not line.isspace())
+
+
+def compile_paths(paths, dtypes=None, sep='.', attributes=False):
+    """Compile dotted paths into a `PathExtractor`"""
+
+    return PathExtractor(paths, dtypes=dtypes, sep=sep, attributes=attributes)
@@ -0,0 +1,332 @@
+"""Normalize large JSON documents into data frames without loading them whole.
+
+Chapter 3 turns the Reddit listing into a data frame with::
+
+    reddit_json = json.loads(reddit.text)
+    reddit_df = pd.json_normalize(reddit_json, record_path=["data", "children"],
+                                  meta=['kind', ['data', 'after']], meta_prefix="meta")
+
+which holds the raw text, the whole tree of Python objects and the frame in
+memory at the same time. `iter_normalized()` reads the document in blocks,
+walks down to `record_path`, decodes one record at a time and yields
+flattened data frames of `batch_size` records, with the `meta` fields
+attached. Memory is bounded by one batch plus the largest single value::
+
+    for batch in iter_normalized("dump.json", record_path=["data", "children"],
+                                 meta=['kind', ['data', 'after']], meta_prefix="meta"):
+        ...
+
+Each value is decoded by the C decoder of the `json` module. Only the walk
+between values happens in Python.
+"""
+
+import io
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+
+from .httpcache import local_copy
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """A text stream read in blocks, with a cursor for walking JSON"""
+
+    def __init__(self, f, blocksize=1 << 20):
+        self.f = f
+        self.blocksize = blocksize
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        if self.eof:
+            return False
+        if self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        block = self.f.read(size or self.blocksize)
+        if not block:
+            self.eof = True
+            return False
+        self.buf += block
+        return True
+
+    def peek(self):
+        """The next non-blank character, or '' at the end of the stream"""
+
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError("expected {!r} but found {!r} in the JSON stream".format(
+                chars, char or 'end of input'))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete value, reading more of the stream as needed"""
+
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Probably cut off at the end of the block: read more and retry,
+                # growing the read so a huge value costs linear time overall
+                if self._fill(max(self.blocksize, len(self.buf) - self.pos)):
+                    continue
+                raise
+            # A number near the end of the block may continue in the next one: "12"
+            # then "3", or "12" then ".5", "e3" or "e-3", which decode as just "12"
+            left = len(self.buf) - end
+            if not self.eof and (left == 0 or (left <= 2 and type(obj) in (int, float))) \
+                    and self._fill(max(self.blocksize, len(self.buf) - self.pos)):
+                continue
+            self.pos = end
+            return obj
+
+
+def _as_path(path):
+    if path is None:
+        return []
+    return [path] if isinstance(path, str) else list(path)
+
+
+def _walk(reader, level, key, record_path, meta, found, keep=False):
+    """Walk the value at the cursor, yielding (record, parent key) pairs.
+
+    The value is `level` steps down `record_path`. Above the records it is
+    an object or an array of objects, each walked in turn as in
+    `pd.json_normalize()`. An object is identified by `key`, the tuple of its
+    positions at every level, and the meta fields wanted from it are stored
+    in `found[key]`; `meta` maps a level to (meta path, field, keys below
+    the field) triples. Unwanted values are decoded and dropped.
+    """
+
+    if level == len(record_path):
+        if reader.peek() != '[':
+            # A single object where records were expected, as in json_normalize
+            record = reader.value()
+            if record is not None:
+                yield record, key
+            return
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.pos += 1
+            return
+        while True:
+            yield reader.value(), key
+            if reader.expect(',]') == ']':
+                return
+
+    if reader.peek() != '[':
+        yield from _walk_object(reader, level, key + (0,), record_path, meta, found, keep)
+        return
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+    for i in itertools.count():
+        yield from _walk_object(reader, level, key + (i,), record_path, meta, found, keep)
+        if reader.expect(',]') == ']':
+            return
+
+
+def _walk_object(reader, level, key, record_path, meta, found, keep):
+    if reader.peek() != '{':
+        raise KeyError("record_path {} not found: {} is not an object or an array of "
+                       "objects".format(record_path, record_path[:level]))
+    wanted = meta.get(level, ())
+    values = found.setdefault(key, {}) if wanted else None
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            name = reader.value()
+            reader.expect(':')
+            fields = [(path, below) for path, field, below in wanted if field == name]
+            if name == record_path[level]:
+                yield from _walk(reader, level + 1, key, record_path, meta, found, keep)
+            elif fields:
+                obj = reader.value()
+                for path, below in fields:
+                    values[path] = _lookup(obj, below)
+            else:
+                reader.value()
+            if reader.expect(',}') == '}':
+                break
+    if not keep:
+        # Every record under the object has been handed out with its meta values
+        found.pop(key, None)
+
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+def _lookup(obj, keys):
+    for key in keys:
+        if not isinstance(obj, dict) or key not in obj:
+            return _MISSING
+        obj = obj[key]
+    return obj
+
+
+def _open(source, encoding):
+    """Return a text stream for the source and the function that releases it"""
+
+    if isinstance(source, str):
+        with local_copy(source) as path:
+            f = open(path, encoding=encoding)
+        return f, f.close
+    if isinstance(source, (bytes, bytearray)):
+        f = io.StringIO(source.decode(encoding))
+        return f, f.close
+    if isinstance(source.read(0), bytes):
+        # Detach when done, so closing the wrapper does not close the caller's file
+        f = io.TextIOWrapper(source, encoding=encoding)
+        return f, f.detach
+    return source, None
+
+
+def iter_records(source, record_path=None, meta=None, encoding='utf-8', errors='raise',
+                 blocksize=1 << 20):
+    """Yield (record, meta values) pairs from a JSON document one record at a time.
+
+    `source` is a path, URL, bytes or an open file. `record_path` and `meta`
+    work as in `pd.json_normalize()`: `record_path` may lead through arrays
+    of objects, and each record gets the `meta` values of its own parents,
+    as a dict keyed by path tuple. Meta fields that come after the records in the
+    document need a second pass over the input, so the source must then be a
+    path or a seekable file. The input is read `blocksize` characters at a time.
+    """
+
+    record_path = _as_path(record_path)
+    meta_paths = [tuple(_as_path(m)) for m in (meta or [])]
+    # As in pd.json_normalize(), a meta path of n keys is read from the objects
+    # n - 1 steps down record_path, or from the records' parents if it is longer
+    depths = {m: min(len(m), len(record_path)) - 1 for m in meta_paths}
+    levels = {}
+    for m, level in depths.items():
+        if level >= 0:
+            levels.setdefault(level, []).append((m, m[level], m[level + 1:]))
+
+    def lookup(key):
+        return {m: found.get(key[:level + 1], {}).get(m, _MISSING) if level >= 0 else _MISSING
+                for m, level in depths.items()}
+
+    f, release = _open(source, encoding)
+    try:
+        start = f.tell() if f.seekable() else None
+        found = {}
+        scanned = False
+        parent = values = None
+        for record, key in _walk(_Reader(f, blocksize), 0, (), record_path, levels, found):
+            if key != parent:
+                parent, values = key, lookup(key)
+                missing = [m for m, value in values.items() if value is _MISSING]
+                if missing and levels and not scanned:
+                    # Meta fields that follow the records: collect them in a pass of their own
+                    if start is None:
+                        raise ValueError("meta fields {} come after the records; pass a path "
+                                         "or a seekable file".format(missing))
+                    resume = f.tell()
+                    f.seek(start)
+                    for _ in _walk(_Reader(f, blocksize), 0, (), record_path, levels, found,
+                                   keep=True):
+                        pass
+                    f.seek(resume)
+                    scanned = True
+                    values = lookup(key)
+                    missing = [m for m, value in values.items() if value is _MISSING]
+                for m in missing:
+                    if errors == 'raise':
+                        raise KeyError("Key {!r} not found. To replace missing values of {!r} "
+                                       "with np.nan, pass in errors='ignore'".format(m[-1], m[-1]))
+                    values[m] = float('nan')
+            yield record, values
+    finally:
+        if release is not None:
+            release()
+
+
+def _frame(batch, runs, meta_prefix, record_prefix, sep, max_level):
+    """Flatten a batch of records; `runs` are [meta values, count] for consecutive records"""
+
+    if all(isinstance(r, dict) for r in batch):
+        df = pd.json_normalize(batch, sep=sep, max_level=max_level)
+    else:
+        df = pd.DataFrame(batch)
+    if record_prefix is not None:
+        df.columns = [record_prefix + str(c) for c in df.columns]
+    for path in runs[0][0]:
+        name = (meta_prefix or '') + sep.join(str(k) for k in path)
+        if name in df.columns:
+            raise ValueError("Conflicting metadata name {}, need distinguishing prefix "
+                             .format(name))
+        column = np.empty(len(df), dtype=object)
+        start = 0
+        for values, count in runs:
+            column[start:start + count].fill(values[path])
+            start += count
+        df[name] = column
+    return df
+
+
+def iter_normalized(source, record_path=None, meta=None, meta_prefix=None, record_prefix=None,
+                    errors='raise', sep='.', max_level=None, batch_size=10000,
+                    encoding='utf-8', blocksize=1 << 20):
+    """Yield `pd.json_normalize()` results for successive batches of records.
+
+    Takes the same arguments as `pd.json_normalize()`, plus `batch_size`
+    and the `encoding` and `blocksize` of `iter_records()`.
+    Stacking the batches gives the same frame as `pd.json_normalize()` on
+    the whole document, but each batch only has columns for the keys its own
+    records contain.
+    """
+
+    batch, runs = [], []
+    for record, values in iter_records(source, record_path, meta, encoding, errors,
+                                       blocksize):
+        batch.append(record)
+        # Records of the same parent share one dict of meta values
+        if runs and runs[-1][0] is values:
+            runs[-1][1] += 1
+        else:
+            runs.append([values, 1])
+        if len(batch) == batch_size:
+            yield _frame(batch, runs, meta_prefix, record_prefix, sep, max_level)
+            batch, runs = [], []
+    if batch:
+        yield _frame(batch, runs, meta_prefix, record_prefix, sep, max_level)
+
+
+def normalize_stream(source, record_path=None, meta=None, meta_prefix=None, record_prefix=None,
+                     errors='raise', sep='.', max_level=None, batch_size=10000,
+                     encoding='utf-8', blocksize=1 << 20):
+    """`pd.json_normalize()` on a file or URL, decoding one batch of records at a time"""
+
+    frames = list(iter_normalized(source, record_path, meta, meta_prefix, record_prefix,
+                                  errors, sep, max_level, batch_size, encoding, blocksize))
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    # Later batches may add record columns; keep the meta columns last, as pandas does
+    names = [(meta_prefix or '') + sep.join(str(k) for k in _as_path(m)) for m in (meta or [])]
+    return df[[c for c in df.columns if c not in names] + names]
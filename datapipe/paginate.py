@@ -0,0 +1,120 @@
+"""Read a paginated API page by page, fetching the next pages in the background.
+
+Chapters 4 and 9 read tweets one at a time and pack each into a tuple::
+
+    for tweet in tweepy.Cursor(api.search, q='#uva').items(1000):
+        msg = [tweet.text, tweet.created_at, tweet.user.screen_name]
+        msgs.append(tuple(msg))
+    tweets = pd.DataFrame(msgs, columns=['text', 'created_at', 'user'])
+
+The loop stops at every page boundary to wait for the API. `PageCursor`
+fetches pages on a background thread, up to `prefetch` pages ahead, while
+the loop works on the current one. Fields are pulled from each page with a
+compiled `datapipe.jsonpath` plan straight into column buffers, and each
+page comes out as a data frame::
+
+    cursor = PageCursor(tweepy.Cursor(api.search, q='#uva').pages(),
+                        {'text': 'text', 'created_at': 'created_at',
+                         'user': 'user.screen_name'}, attributes=True)
+    tweets = cursor.to_frame(limit=1000)
+
+The source is any iterable of pages (lists of records), or a function
+`fetch(token)` that returns `(records, next_token)` and is called with
+`start` first, until `next_token` is None.
+"""
+
+import queue
+import threading
+
+import pandas as pd
+
+from .jsonpath import PathExtractor
+
+_DONE = object()
+
+
+def iter_pages(fetch, start=None):
+    """Pages from a `fetch(token) -> (records, next_token)` function"""
+
+    token = start
+    while True:
+        records, token = fetch(token)
+        yield records
+        if token is None:
+            return
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class PageCursor:
+    """Frames of the fields in `paths`, one per page, with pages fetched ahead.
+
+    `paths`, `dtypes` and `attributes` are as for `PathExtractor`. `prefetch`
+    is how many pages may wait, fetched but not yet consumed. An error raised
+    while fetching is raised again in the consuming loop.
+    """
+
+    def __init__(self, source, paths, dtypes=None, prefetch=2, start=None, attributes=False):
+        self.source = iter_pages(source, start) if callable(source) else source
+        self.extract = PathExtractor(paths, dtypes=dtypes, attributes=attributes)
+        self.prefetch = max(1, prefetch)
+        self.pages = 0
+        self.rows = 0
+
+    def _produce(self, pages, stop):
+        def put(item):
+            # Give up when the consumer has left, instead of blocking for ever
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            for page in self.source:
+                if not put(page):
+                    return
+        except BaseException as err:
+            put(_Failure(err))
+            return
+        put(_DONE)
+
+    def frames(self, limit=None):
+        """Yield one data frame per page, `limit` rows in all at most"""
+
+        pages = queue.Queue(self.prefetch)
+        stop = threading.Event()
+        worker = threading.Thread(target=self._produce, args=(pages, stop), daemon=True)
+        worker.start()
+        try:
+            while limit is None or self.rows < limit:
+                page = pages.get()
+                if page is _DONE:
+                    break
+                if isinstance(page, _Failure):
+                    raise page.error
+                if not isinstance(page, (list, tuple)):
+                    page = list(page)
+                if limit is not None and self.rows + len(page) > limit:
+                    page = page[:limit - self.rows]
+                df = self.extract(page, index=pd.RangeIndex(self.rows, self.rows + len(page)))
+                self.pages += 1
+                self.rows += len(df)
+                yield df
+        finally:
+            stop.set()
+
+    __iter__ = frames
+
+    def to_frame(self, limit=None):
+        """All pages in one data frame"""
+
+        frames = list(self.frames(limit))
+        if not frames:
+            return self.extract([])
+        return pd.concat(frames)
@@ -0,0 +1,157 @@
+"""Work out how to call `pd.read_csv()` on a file by reading only its first few KB.
+
+Chapter 2 fixes a messy file by trial and error: load it, see what broke, and
+reload it with `header=4`, `comment='@'`, `na_values=-999`, `sep="\\t"` or
+`header=None`. Each attempt parses the whole file. `sniff()` inspects only
+the start of the file and returns the keyword arguments, so the file is
+parsed once::
+
+    config = sniff(url)            # e.g. {'sep': ',', 'header': 4, 'comment': '@'}
+    anes = pd.read_csv(url, **config)
+"""
+
+import collections
+import csv
+import re
+
+import pandas as pd
+
+from .httpcache import local_copy
+
+DELIMITERS = [',', '\t', ';', '|']
+# Negative all-nines codes: -9, -99, -999, ... Positive codes such as 99 are left
+# alone, since a sample of rows cannot tell them apart from real values.
+_SENTINEL = re.compile(r'^-9+(\.0*)?$')
+
+
+def _fields(line, sep):
+    return next(csv.reader([line], delimiter=sep))
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return value.strip() != ''
+
+
+def _choose_delimiter(lines):
+    """Pick the delimiter that splits the most lines into the same number of fields"""
+
+    best = (0.0, 1, ',')
+    for sep in DELIMITERS:
+        counts = [len(_fields(line, sep)) for line in lines]
+        width, hits = collections.Counter(counts).most_common(1)[0]
+        if width > 1 and (hits / len(counts), width) > best[:2]:
+            best = (hits / len(counts), width, sep)
+    return best[2], best[1]
+
+
+def _comment_char(lines, sep, width, start):
+    """The character that starts every misfit line in the body, if there is one"""
+
+    misfits = [line.lstrip() for line in lines[start:] if len(_fields(line, sep)) != width]
+    firsts = {line[0] for line in misfits if line}
+    if len(firsts) != 1:
+        return None
+    char = firsts.pop()
+    if char.isalnum() or char in '"\'-+.':
+        return None
+    # pandas drops everything after the comment character, so it must not occur in the data
+    if any(char in line for line in lines[start:] if len(_fields(line, sep)) == width):
+        return None
+    return char
+
+
+def _has_header(first, rows):
+    """True if the first row looks like names rather than data"""
+
+    if not rows or any(_is_number(v) for v in first):
+        return False
+    numeric_cols = [j for j in range(len(first))
+                    if all(_is_number(r[j]) or r[j] == '' for r in rows if j < len(r))
+                    and any(j < len(r) and _is_number(r[j]) for r in rows)]
+    if numeric_cols:
+        return True
+    return csv.Sniffer().has_header('\n'.join(','.join(r) for r in [first] + rows[:20]))
+
+
+def _sentinels(rows, width):
+    """Codes like -999 in columns whose other values are all non-negative"""
+
+    found = set()
+    for j in range(width):
+        values = [r[j].strip() for r in rows if j < len(r)]
+        numbers = [float(v) for v in values if _is_number(v)]
+        codes = {v for v in values if _SENTINEL.match(v)}
+        for code in codes:
+            c = float(code)
+            rest = [x for x in numbers if x != c]
+            if not rest or len(rest) == len(numbers):
+                continue
+            if min(rest) >= 0:
+                found.add(int(c) if c.is_integer() else c)
+    return sorted(found)
+
+
+def sniff(path, nbytes=65536, encoding='utf-8'):
+    """Infer `pd.read_csv()` options from the first `nbytes` of a file.
+
+    Returns a dict with `sep` and `header`, plus `comment`, `na_values` and
+    `skiprows` when they are needed. Detects:
+
+    * the delimiter (comma, tab, semicolon or pipe),
+    * lines of text above the column names (`header=` offset),
+    * a comment character that starts stray lines inside the data,
+    * numeric missing-value codes such as -999,
+    * whether the file has a row of column names at all (`header=None`).
+    """
+
+    with local_copy(path) as local, open(local, 'rb') as f:
+        raw = f.read(nbytes)
+        truncated = f.read(1) != b''
+    lines = raw.decode(encoding, errors='replace').splitlines()
+    if truncated and len(lines) > 1:
+        lines = lines[:-1]      # probably cut off mid-record
+    physical = [i for i, line in enumerate(lines) if line.strip()]
+    nonblank = [lines[i] for i in physical]
+    if not nonblank:
+        return {'sep': ',', 'header': 0}
+
+    sep, width = _choose_delimiter(nonblank)
+    fits = [len(_fields(line, sep)) == width for line in nonblank]
+    start = fits.index(True) if True in fits else 0
+    comment = _comment_char(nonblank, sep, width, start)
+
+    body = [_fields(line, sep) for line, ok in zip(nonblank[start:], fits[start:]) if ok]
+    first, rows = body[0], body[1:]
+    header = _has_header(first, rows)
+    if not header:
+        rows = body
+
+    config = {'sep': sep}
+    # pandas counts header rows over non-blank, non-comment lines
+    preamble = [line for line in nonblank[:start]
+                if comment is None or not line.lstrip().startswith(comment)]
+    if header:
+        config['header'] = len(preamble)
+    else:
+        config['header'] = None
+        if start:
+            config['skiprows'] = physical[start]
+    if comment is not None:
+        config['comment'] = comment
+    na_values = _sentinels(rows, width)
+    if na_values:
+        config['na_values'] = na_values
+    return config
+
+
+def read_sniffed(path, nbytes=65536, **overrides):
+    """Sniff a file and read it once with the inferred options (overrides win)"""
+
+    with local_copy(path) as local:
+        config = sniff(local, nbytes=nbytes)
+        config.update(overrides)
+        return pd.read_csv(local, **config)
@@ -0,0 +1,360 @@
+"""Scrape WNRN playlists from Spinitron, following the spider built in chapter 5.
+
+The synchronous `wnrn_spider()` is the same function the chapter builds. The
+asynchronous crawler fetches many playlists at once over a single pooled,
+keep-alive session. Spinitron's robots.txt asks for a crawl delay, so keep the
+per-host limit small when pointing this at the live site.
+"""
+
+import asyncio
+import os
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+from bs4.builder import HTMLTreeBuilder
+
+from .collect import FrameCollector
+from .crawlstate import CrawlState, content_hash
+
+SPINITRON = "https://spinitron.com/"
+HEADERS = {'user-agent': 'Kropko class example (jkropko@virginia.edu)'}
+COLUMNS = ['time', 'artist', 'song', 'album']
+
+
+# The classes that hold each column, as (tag, class) pairs
+TARGETS = {('td', 'spin-time'): 'time',
+           ('span', 'artist'): 'artist',
+           ('span', 'song'): 'song',
+           ('span', 'release'): 'album'}
+# BeautifulSoup closes these as soon as they open and keeps whitespace inside these
+VOID_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+PRESERVE_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+class _Markup(str):
+    """A comment, CDATA section, declaration or processing instruction.
+
+    BeautifulSoup keeps each as a string of its own, never merged with the
+    text around it.
+    """
+
+
+class _SpinParser(HTMLParser):
+    """Single-pass tokenizer that keeps only the playlist tags.
+
+    Nothing outside a target tag is stored. Inside one, just enough of the
+    subtree is kept to reproduce what BeautifulSoup's `.string` returns. The
+    names of all open tags are tracked, so end tags close the same elements
+    they do in BeautifulSoup's html.parser tree builder.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.columns = {c: [] for c in COLUMNS}
+        self._stack = []
+        self._open = []
+        self._closed_void = []
+        self._preserve = 0
+        self._split = False
+
+    def handle_starttag(self, tag, attrs, close_void=True):
+        column = None
+        if tag == 'span' or tag == 'td':
+            for name, value in attrs:
+                if name == 'class' and value:
+                    for cls in value.split():
+                        column = TARGETS.get((tag, cls))
+                        if column is not None:
+                            break
+                    break
+
+        void = close_void and tag in VOID_TAGS
+        if not void:
+            self._open.append(tag)
+            if tag in PRESERVE_TAGS:
+                self._preserve += 1
+        if column is None and not self._stack:
+            if void:
+                self._closed_void.append(tag)
+            return
+
+        node = [tag, column, None, [], self._preserve > 0]
+        if column is not None:
+            node[2] = len(self.columns[column])
+            self.columns[column].append(None)
+        if self._stack:
+            self._stack[-1][3].append(node)
+        if void:
+            self._close(node)
+            self._closed_void.append(tag)
+        else:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, close_void=False)
+        self._end(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void:
+            # The end tag of a void element BeautifulSoup has already closed
+            self._closed_void.remove(tag)
+        else:
+            self._end(tag)
+
+    def _end(self, tag):
+        """Close the innermost open `tag` and everything opened inside it"""
+
+        self._split = True
+        if tag not in self._open:
+            return
+        while True:
+            name = self._open.pop()
+            if name in PRESERVE_TAGS:
+                self._preserve -= 1
+            if self._stack:
+                self._close(self._stack.pop())
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        if self._stack:
+            children = self._stack[-1][3]
+            if children and type(children[-1]) is str and not self._split:
+                children[-1] += data
+            else:
+                children.append(data)
+            self._split = False
+
+    def _markup(self, data):
+        if self._stack:
+            self._stack[-1][3].append(_Markup(data))
+
+    def handle_comment(self, data):
+        self._markup(data)
+
+    def handle_decl(self, decl):
+        self._markup(decl[len('DOCTYPE '):])
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            data = data[len('CDATA['):]
+        self._markup(data)
+
+    def handle_pi(self, data):
+        self._markup(data)
+
+    def close(self):
+        super().close()
+        while self._stack:
+            self._close(self._stack.pop())
+
+    def _close(self, node):
+        if node[1] is not None:
+            self.columns[node[1]][node[2]] = _node_string(node)
+
+
+def _node_string(node):
+    """Mirror BeautifulSoup's `Tag.string`: the lone text inside a tag, else None"""
+
+    children = node[3]
+    if len(children) != 1:
+        return None
+    child = children[0]
+    if isinstance(child, str):
+        if not node[4] and not child.strip(ASCII_SPACES):
+            # BeautifulSoup collapses strings of only whitespace outside <pre>
+            return '\n' if '\n' in child else ' '
+        return str(child)
+    return _node_string(child)
+
+
+def _soup_columns(html):
+    """Extract the columns the way chapter 5 does, with a full BeautifulSoup tree"""
+
+    wnrn = BeautifulSoup(html, 'html.parser')
+
+    artistlist = wnrn.find_all("span", "artist")
+    songlist = wnrn.find_all("span", "song")
+    albumlist = wnrn.find_all("span", "release")
+    timelist = wnrn.find_all("td", "spin-time")
+
+    artists = [a.string for a in artistlist]
+    songs = [a.string for a in songlist]
+    albums = [a.string for a in albumlist]
+    times = [a.string for a in timelist]
+
+    return {'time': times, 'artist': artists, 'song': songs, 'album': albums}
+
+
+def playlist_columns(html, fast=True):
+    """Extract the time, artist, song, and album lists from a playlist page.
+
+    By default the page is tokenized once and only the target tags are kept.
+    Pass `fast=False` to build the full BeautifulSoup tree as chapter 5 does.
+    """
+
+    if not fast:
+        return _soup_columns(html)
+    parser = _SpinParser()
+    parser.feed(html)
+    parser.close()
+    return parser.columns
+
+
+def parse_playlist(html, fast=True):
+    """Extract the time, artist, song, and album of every spin on a playlist page"""
+
+    return pd.DataFrame(playlist_columns(html, fast=fast), columns=COLUMNS)
+
+
+def playlist_urls(html, base=SPINITRON):
+    """List the absolute URLs of the recent playlists linked from a Spinitron page"""
+
+    wnrn = BeautifulSoup(html, 'html.parser')
+    recent = wnrn.find("div", "recent-playlists")
+    if recent is None:
+        return []
+    return [urljoin(base, pl['href']) for pl in recent.find_all("a", href=True)
+            if "/pl/" in pl['href']]
+
+
+def wnrn_spider(url, session=None, headers=HEADERS):
+    """Perform web scraping for any WNRN playlist given the available link"""
+
+    getter = session if session is not None else requests
+    r = getter.get(url, headers=headers)
+    return parse_playlist(r.text)
+
+
+def wnrn_spider_many(urls, headers=HEADERS, path=None, overwrite=False):
+    """Scrape playlists one after another over one session and stack them.
+
+    Rows are buffered in a `FrameCollector` instead of appending to a growing
+    data frame. Without a `path` the stacked data frame is returned. With one,
+    rows are streamed to the file in batches and only the number of rows
+    written is returned, so memory stays flat; read the file to get the data.
+    An existing file at `path` is only replaced with `overwrite=True`.
+    """
+
+    collector = FrameCollector(COLUMNS, path=path, overwrite=overwrite)
+    with requests.Session() as session:
+        for url in urls:
+            r = session.get(url, headers=headers)
+            collector.add(playlist_columns(r.text))
+    if path is None:
+        return collector.to_frame()
+    collector.close()
+    return len(collector)
+
+
+def _get_if_changed(session, state, url):
+    """GET a URL conditionally, returning its text only if the body changed"""
+
+    r = session.get(url, headers=state.conditional_headers(url))
+    if r.status_code == 304:
+        return None
+    r.raise_for_status()
+    body_hash = content_hash(r.content)
+    stored = state.page(url)
+    state.record_page(url, r.headers.get('ETag'), r.headers.get('Last-Modified'),
+                      body_hash)
+    if stored is not None and stored[2] == body_hash:
+        return None
+    return r.text
+
+
+def wnrn_update(state_path, url=SPINITRON + "WNRN", path=None, headers=HEADERS,
+                recheck=True):
+    """Scrape only the spins that are new since the last run.
+
+    Visited pages, their ETag/Last-Modified validators and a hash of every
+    extracted spin are kept in the SQLite file at `state_path`. The landing page
+    and previously seen playlists are fetched with conditional requests, or not
+    at all for old playlists if `recheck=False`. Returns the new spins, and
+    appends them to the CSV at `path` if one is given.
+
+    The state is only saved once every playlist has been read and the spins
+    appended, so a run that fails partway is redone in full the next time.
+    """
+
+    collector = FrameCollector(COLUMNS)
+    with CrawlState(state_path) as state, requests.Session() as session, \
+            state.transaction():
+        session.headers.update(headers)
+        landing = _get_if_changed(session, state, url)
+        urls = playlist_urls(landing, base=url) if landing is not None else []
+
+        for u in urls:
+            if not recheck and u in state:
+                continue
+            html = _get_if_changed(session, state, u)
+            if html is None:
+                continue
+            columns = playlist_columns(html)
+            rows = list(zip(*[columns[c] for c in COLUMNS]))
+            new = state.add_rows(u, rows)
+            collector.add({c: [v for v, keep in zip(columns[c], new) if keep]
+                           for c in COLUMNS})
+
+        new_spins = collector.to_frame()
+        if path is not None and len(new_spins):
+            new_spins.to_csv(path, mode='a', index=False, header=not os.path.exists(path))
+    return new_spins
+
+
+def _require_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as err:
+        raise ImportError("The asynchronous crawler requires aiohttp: "
+                          "pip install aiohttp") from err
+    return aiohttp
+
+
+async def fetch_pages(urls, limit=10, per_host=2, headers=HEADERS, timeout=30):
+    """Download the raw HTML of every URL concurrently, returned in input order.
+
+    `limit` caps the number of open connections overall and `per_host` caps the
+    connections to any one server. Connections are kept alive and reused by
+    later requests to the same host.
+    """
+
+    aiohttp = _require_aiohttp()
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=per_host)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(connector=connector, headers=headers,
+                                     timeout=client_timeout) as session:
+
+        async def fetch(url):
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                return await resp.text()
+
+        return await asyncio.gather(*[fetch(u) for u in urls])
+
+
+async def wnrn_crawl_async(urls, limit=10, per_host=2, headers=HEADERS, timeout=30):
+    """Scrape many playlists concurrently and stack them into one data frame"""
+
+    pages = await fetch_pages(list(urls), limit=limit, per_host=per_host,
+                              headers=headers, timeout=timeout)
+    collector = FrameCollector(COLUMNS)
+    for html in pages:
+        collector.add(playlist_columns(html))
+    return collector.to_frame()
+
+
+def wnrn_crawl(urls, limit=10, per_host=2, headers=HEADERS, timeout=30):
+    """Blocking wrapper around `wnrn_crawl_async()`.
+
+    Inside a Jupyter notebook an event loop is already running, so use
+    `await wnrn_crawl_async(...)` there instead.
+    """
+
+    return asyncio.run(wnrn_crawl_async(urls, limit=limit, per_host=per_host,
+                                        headers=headers, timeout=timeout))
@@ -0,0 +1,150 @@
+"""Read large delimited files in chunks and aggregate them without holding the whole file.
+
+`pd.read_csv()` materializes the entire file, so peak memory grows with the
+file. `iter_csv()` yields typed chunks instead and accepts the same options
+chapter 2 uses (`na_values`, `comment`, `header`, `names`, `sep`, ...).
+`RunningAggregate` folds grouped statistics over those chunks, so a recode +
+aggregate pipeline only ever holds one chunk plus the per-group totals::
+
+    agg = RunningAggregate(by='state', columns=['ftobama', 'fttrump'])
+    for chunk in iter_csv(url, header=4, comment='@', na_values=-999):
+        agg.update(recode(chunk))
+    agg.result()
+"""
+
+import numpy as np
+import pandas as pd
+
+from .httpcache import local_copy
+
+STATS = ('count', 'sum', 'mean', 'var', 'std', 'min', 'max')
+
+
+def infer_dtypes(sample):
+    """Pick dtypes from a sample that stay valid for the rest of the file.
+
+    Integer and boolean columns become nullable (`Int64`, `boolean`), because a
+    missing value further down would otherwise turn them into floats or objects
+    in some chunks but not in others.
+    """
+
+    dtypes = {}
+    for col, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            dtypes[col] = 'boolean'
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[col] = 'Int64'
+        elif pd.api.types.is_float_dtype(dtype):
+            dtypes[col] = 'float64'
+    return dtypes
+
+
+def iter_csv(path, chunksize=100000, dtype=None, infer_rows=10000, **kwargs):
+    """Yield a delimited file as data frames of at most `chunksize` rows.
+
+    Every chunk has the same dtypes. If `dtype` is not given, numeric and boolean
+    columns are typed from the first `infer_rows` rows and text is left to the
+    parser. Other keyword arguments go to `pd.read_csv()`. URLs are read
+    through `datapipe.httpcache`, so the file is downloaded once.
+    """
+
+    with local_copy(path) as path:
+        if dtype is not None:
+            with pd.read_csv(path, chunksize=chunksize, dtype=dtype, **kwargs) as reader:
+                yield from reader
+            return
+
+        # Parsing straight into nullable dtypes goes through a slow path in pandas,
+        # so let the C parser infer and cast each chunk to the sampled schema.
+        schema = infer_dtypes(pd.read_csv(path, nrows=infer_rows, **kwargs))
+        with pd.read_csv(path, chunksize=chunksize, **kwargs) as reader:
+            for chunk in reader:
+                try:
+                    yield chunk.astype(schema)
+                except (TypeError, ValueError) as err:
+                    raise ValueError(
+                        "a chunk no longer fits the dtypes inferred from the first {} rows "
+                        "({}); pass dtype= explicitly".format(infer_rows, err))
+
+
+class RunningAggregate:
+    """Grouped count/sum/mean/var/std/min/max, updated one chunk at a time.
+
+    Only per-group totals are kept between chunks, so memory depends on the
+    number of groups, not the number of rows. Use `by=None` for overall totals.
+    """
+
+    def __init__(self, by=None, columns=None, stats=('count', 'mean')):
+        unknown = set(stats) - set(STATS)
+        if unknown:
+            raise ValueError("unsupported statistics: {}".format(sorted(unknown)))
+        self.by = by
+        self.columns = columns
+        self.stats = tuple(stats)
+        self.rows = 0
+        self._count = self._sum = self._mean = self._m2 = None
+        self._min = self._max = None
+
+    def update(self, chunk):
+        """Fold one chunk into the running totals"""
+
+        columns = self.columns
+        if columns is None:
+            columns = self.columns = [c for c in chunk.select_dtypes('number').columns
+                                      if self.by is None or c not in np.atleast_1d(self.by)]
+        values = chunk[columns].astype('float64')
+        if self.by is None:
+            keys = np.zeros(len(chunk), dtype=int)
+        else:
+            keys = [chunk[k] for k in np.atleast_1d(self.by)]
+        grouped = values.groupby(keys, observed=True)
+
+        count, total, low, high = grouped.count(), grouped.sum(), grouped.min(), grouped.max()
+        mean = total / count.where(count > 0)
+        m2 = grouped.var(ddof=0).fillna(0) * count
+        if self._count is None:
+            self._count, self._sum, self._mean, self._m2 = count, total, mean.fillna(0), m2
+            self._min, self._max = low, high
+        else:
+            # Chan et al.'s pairwise update keeps the variance numerically stable
+            groups = self._count.index.union(count.index)
+            n_a = self._count.reindex(groups, fill_value=0)
+            n_b = count.reindex(groups, fill_value=0)
+            n = n_a + n_b
+            delta = mean.reindex(groups).fillna(0) - self._mean.reindex(groups, fill_value=0)
+            safe_n = n.where(n > 0)
+            self._mean = (self._mean.reindex(groups, fill_value=0)
+                          + delta * n_b / safe_n).fillna(0)
+            self._m2 = (self._m2.reindex(groups, fill_value=0) + m2.reindex(groups, fill_value=0)
+                        + delta ** 2 * n_a * n_b / safe_n).fillna(0)
+            self._count = n
+            self._sum = self._sum.add(total, fill_value=0)
+            self._min = self._min.combine(low, np.fmin)
+            self._max = self._max.combine(high, np.fmax)
+        self.rows += len(chunk)
+
+    def result(self):
+        """Return the statistics, one row per group and a (column, stat) column index"""
+
+        if self._count is None:
+            return pd.DataFrame()
+        n = self._count
+        mean = self._mean.where(n > 0)
+        var = self._m2 / (n - 1).where(n > 1)
+        table = {'count': n, 'sum': self._sum, 'mean': mean, 'var': var,
+                 'std': np.sqrt(var), 'min': self._min, 'max': self._max}
+        out = pd.concat({s: table[s] for s in self.stats}, axis=1)
+        out = out.swaplevel(axis=1)[self.columns].sort_index()
+        if self.by is None:
+            out = out.reset_index(drop=True)
+        return out
+
+
+def aggregate_csv(path, by=None, columns=None, stats=('count', 'mean'), recode=None,
+                  chunksize=100000, **kwargs):
+    """Stream a file through an optional `recode(chunk)` function into grouped statistics"""
+
+    agg = RunningAggregate(by=by, columns=columns, stats=stats)
+    for chunk in iter_csv(path, chunksize=chunksize, **kwargs):
+        agg.update(recode(chunk) if recode is not None else chunk)
+    return agg.result()
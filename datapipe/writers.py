@@ -0,0 +1,226 @@
+"""Write one data frame to several files in a single pass.
+
+Chapter 2 saves the cleaned ANES data twice, with `anes.to_csv("anes_cleaned.csv")`
+and `anes.to_csv("anes_cleaned.txt", sep="\\t")`, and chapter 8 saves
+`anes_pilot2019_clean.csv` again. Each call turns every value into text from
+scratch. `write_many()` converts each block of rows to Arrow once, formats
+every column to text once, and hands the result to all of the files::
+
+    write_many(anes, ["anes_cleaned.csv", "anes_cleaned.txt",
+                      "anes_cleaned.csv.gz", "anes_cleaned.parquet"])
+
+Formatting, quoting, compression and writing use Arrow compute kernels and
+zlib, which release the GIL, so columns and files are handled in parallel
+threads across cores.
+"""
+
+import csv
+import gzip
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+TAB_EXTENSIONS = ('.tsv', '.tab', '.txt')
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather', '.arrow')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as err:
+        raise ImportError("write_many() requires pyarrow: pip install pyarrow") from err
+    return pyarrow
+
+
+def split_path(path):
+    """Return (extension without compression, compression or None)"""
+
+    root, ext = os.path.splitext(str(path).lower())
+    if ext in ('.gz', '.zst'):
+        return os.path.splitext(root)[1], ext[1:]
+    return ext, None
+
+
+class TextSink:
+    """A delimited text file, optionally gzip or zstd compressed"""
+
+    def __init__(self, path, sep):
+        self.sep = sep
+        self._raw = None
+        compression = split_path(path)[1]
+        if compression == 'gz':
+            self._file = gzip.open(path, 'wb', compresslevel=6)
+        elif compression == 'zst':
+            try:
+                import zstandard
+            except ImportError as err:
+                raise ImportError("writing .zst files requires zstandard: "
+                                  "pip install zstandard") from err
+            self._raw = open(path, 'wb')
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            self._file = open(path, 'wb')
+
+    def write(self, data):
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+        if self._raw is not None:
+            self._raw.close()
+
+
+class _ColumnarSink:
+    """A Parquet file, or a Feather (Arrow IPC) file for .feather and .arrow"""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, table):
+        pa = _require_pyarrow()
+        if self._writer is None:
+            if split_path(self.path)[0] == '.parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _format_column(series):
+    """Format one column as an Arrow string array the way `to_csv()` reads back.
+
+    Missing values become nulls, which are written as empty fields. Integral
+    floats keep their `.0`, so the column is read back as floats.
+    """
+
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    try:
+        arr = pa.Array.from_pandas(series)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        arr = None
+    if arr is not None and pa.types.is_dictionary(arr.type):
+        arr = arr.dictionary_decode()
+    if arr is None or not (pa.types.is_integer(arr.type) or pa.types.is_floating(arr.type)
+                           or pa.types.is_boolean(arr.type) or pa.types.is_string(arr.type)
+                           or pa.types.is_large_string(arr.type)):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            # Like to_csv(), leave the time off when every value is a midnight
+            present = series.dropna()
+            if (present == present.dt.normalize()).all():
+                series = series.dt.strftime('%Y-%m-%d')
+        # Anything else (mixed objects, ...) is formatted by Python
+        values = [None if pd.isna(v) else str(v) for v in series.astype(object)]
+        return pa.array(values, type=pa.string())
+
+    if pa.types.is_boolean(arr.type):
+        return pc.if_else(arr, 'True', 'False')
+    if pa.types.is_floating(arr.type):
+        arr = pc.if_else(pc.is_nan(arr), None, arr)
+        text = pc.cast(arr, pa.string())
+        bare = pc.invert(pc.match_substring_regex(text, '[.en]'))
+        return pc.if_else(bare, pc.binary_join_element_wise(text, '.0', ''), text)
+    return pc.cast(arr, pa.string())
+
+
+def _quote(text, sep):
+    """Quote the fields that contain the delimiter, a quote or a line break"""
+
+    import pyarrow.compute as pc
+
+    special = pc.match_substring_regex(text, '[{}"\r\n]'.format('\\t' if sep == '\t' else
+                                                               '\\' + sep))
+    if not pc.any(special).as_py():
+        return text
+    quoted = pc.binary_join_element_wise('"', pc.replace_substring(text, '"', '""'), '"', '')
+    return pc.if_else(special, quoted, text)
+
+
+def _join_rows(columns, sep):
+    """Join formatted columns into the bytes of one block of delimited lines"""
+
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    fields = [pc.fill_null(_quote(col, sep), '') for col in columns]
+    lines = pc.binary_join_element_wise(pc.binary_join_element_wise(*fields, sep), '\n', '')
+    if isinstance(lines, pa.ChunkedArray):
+        lines = lines.combine_chunks()
+    # A string array's data buffer is its values back to back: the block itself
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)[lines.offset:]
+    start, end = int(offsets[0]), int(offsets[len(lines)])
+    return lines.buffers()[2][start:end]
+
+
+def _header(names, sep):
+    out = io.StringIO()
+    csv.writer(out, delimiter=sep, lineterminator='\n').writerow(names)
+    return out.getvalue().encode('utf-8')
+
+
+def write_many(df, paths, index=True, seps=None, chunk_rows=100000, workers=None):
+    """Write `df` to every file in `paths`, formatting each value once.
+
+    The format follows the extension: `.parquet`, `.feather` and `.arrow` are
+    columnar, `.tsv`, `.tab` and `.txt` are tab separated and anything else
+    is comma separated. Add `.gz` or `.zst` to compress a text file (zstd needs
+    the `zstandard` package). `seps` maps a path to a different delimiter. As
+    with `to_csv()`, the index is written unless `index=False`. Text files
+    read back with `pd.read_csv()` give the same values as files written by
+    `to_csv()`.
+    """
+
+    pa = _require_pyarrow()
+    paths = list(paths)
+    seps = dict(seps or {})
+    names = [str(c) for c in df.columns]
+    if index:
+        index_frame = df.index.to_frame(index=False)
+        names = ['' if n is None else str(n) for n in df.index.names] + names
+
+    sinks, text_sinks = [], {}
+    try:
+        for path in paths:
+            ext = split_path(path)[0]
+            if ext in COLUMNAR_EXTENSIONS:
+                sinks.append(_ColumnarSink(path))
+                continue
+            sep = seps.get(path, '\t' if ext in TAB_EXTENSIONS else ',')
+            sink = TextSink(path, sep)
+            sink.write(_header(names, sep))
+            sinks.append(sink)
+            text_sinks.setdefault(sep, []).append(sink)
+        columnar = [s for s in sinks if isinstance(s, _ColumnarSink)]
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for start in range(0, max(len(df), 1), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                jobs = []
+                if columnar:
+                    table = pa.Table.from_pandas(chunk, preserve_index=bool(index))
+                    jobs += [pool.submit(sink.write, table) for sink in columnar]
+                if text_sinks and len(chunk):
+                    series = [chunk.iloc[:, j] for j in range(chunk.shape[1])]
+                    if index:
+                        part = index_frame.iloc[start:start + chunk_rows]
+                        series = [part.iloc[:, j] for j in range(part.shape[1])] + series
+                    columns = list(pool.map(_format_column, series))
+                    blocks = dict(zip(text_sinks, pool.map(
+                        lambda sep: _join_rows(columns, sep), text_sinks)))
+                    jobs += [pool.submit(sink.write, blocks[sep])
+                             for sep, group in text_sinks.items() for sink in group]
+                for job in jobs:
+                    job.result()
+    finally:
+        for sink in sinks:
+            sink.close()
@@ -0,0 +1,111 @@
+import json
+import time
+
+import pytest
+
+from benchmarks.fixtures import CensusStub, serve
+from datapipe.api import APIClient, APIError, TokenBucket
+from datapipe.apicache import ResponseCache
+
+pytest.importorskip("aiohttp")
+
+JSON = {"Content-Type": "application/json"}
+
+
+class Throttled:
+    """Answers 429 with `Retry-After` to the first `refusals` requests, then 200"""
+
+    def __init__(self, refusals, retry_after):
+        self.refusals = refusals
+        self.retry_after = retry_after
+        self.times = []
+
+    def __call__(self, params):
+        self.times.append(time.monotonic())
+        if len(self.times) <= self.refusals:
+            return 429, dict(JSON, **{"Retry-After": str(self.retry_after)}), '{}'
+        return 200, JSON, '{"n": %s}' % params.get('n', 0)
+
+
+def test_get_waits_for_retry_after():
+    route = Throttled(refusals=2, retry_after=0.2)
+    with serve({'/api': route}) as base, APIClient(base + '/api', backoff=0) as client:
+        assert client.get({'n': 1}) == {'n': 1}
+        assert client.requests == 3 and client.retried == 2
+    gaps = [b - a for a, b in zip(route.times, route.times[1:])]
+    assert all(gap >= 0.19 for gap in gaps)
+
+
+def test_gather_waits_for_retry_after():
+    route = Throttled(refusals=1, retry_after=0.3)
+    with serve({'/api': route}) as base, APIClient(base + '/api', backoff=0) as client:
+        start = time.monotonic()
+        assert client.gather([{'n': 1}]) == [{'n': 1}]
+        assert time.monotonic() - start >= 0.29
+        assert client.retried == 1
+
+
+def test_gives_up_after_retries():
+    route = Throttled(refusals=100, retry_after=0)
+    with serve({'/api': route}) as base, APIClient(base + '/api', retries=2) as client:
+        with pytest.raises(APIError) as err:
+            client.get()
+        assert err.value.status == 429
+        assert client.gather([{}], return_exceptions=True)[0].status == 429
+    assert len(route.times) == 6
+
+
+def test_gather_retries_census_throttling():
+    stub = CensusStub(throttle=0.3, retry_after=0, rows=3, seed=1)
+    queries = [{'get': 'NAME,POP', 'for': 'county:*', 'in': 'state:{:02d}'.format(s)}
+               for s in range(1, 21)]
+    with serve({'/data': stub}) as base, APIClient(base + '/data', retries=8) as client:
+        tables = client.gather(queries)
+        assert client.retried == stub.throttled > 0
+    assert tables == [json.loads(stub.table(q)) for q in queries]
+
+
+def test_token_bucket_spaces_reservations():
+    bucket = TokenBucket(20, burst=2)
+    waits = [bucket.reserve() for _ in range(12)]
+    assert waits[:2] == [0.0, 0.0]
+    # Every token after the burst waits one more 1/rate
+    assert waits[-1] == pytest.approx(10 / 20, abs=0.01)
+    assert all(b > a for a, b in zip(waits[2:], waits[3:]))
+
+
+def test_rate_limits_gather():
+    route = Throttled(refusals=0, retry_after=0)
+    with serve({'/api': route}) as base, APIClient(base + '/api', rate=25) as client:
+        start = time.monotonic()
+        client.gather([{'n': i} for i in range(11)])
+        assert time.monotonic() - start >= 10 / 25 - 0.02
+    span = route.times[-1] - route.times[0]
+    assert span >= 10 / 25 - 0.05
+
+
+def test_gather_keeps_its_session():
+    route = Throttled(refusals=0, retry_after=0)
+    with serve({'/api': route}) as base:
+        client = APIClient(base + '/api')
+        client.gather([{'n': 1}])
+        sessions = list(client._aio_sessions.values())
+        client.gather([{'n': 2}])
+        assert list(client._aio_sessions.values()) == sessions
+        client.close()
+        assert all(session.closed for session in sessions)
+
+
+def test_cached_null_is_not_fetched_again(tmp_path):
+    calls = []
+
+    def route(params):
+        calls.append(params)
+        return 200, JSON, 'null'
+
+    with serve({'/api': route}) as base, ResponseCache(str(tmp_path)) as cache, \
+            APIClient(base + '/api', cache=cache) as client:
+        assert client.gather([{'n': 1}]) == [None]
+        assert client.gather([{'n': 1}]) == [None]
+        assert client.get({'n': 1}) is None
+    assert len(calls) == 1
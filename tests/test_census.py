@@ -0,0 +1,36 @@
+import pytest
+
+from benchmarks.fixtures import CensusStub, serve
+from datapipe import census
+from datapipe.census import read_census
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("aiohttp")
+
+
+def test_shards_are_joined_and_typed():
+    stub = CensusStub(rows=4)
+    routes = {"/data/{}/acs/acs5".format(year): stub for year in (2018, 2019)}
+    with serve(routes) as base:
+        df = read_census('acs/acs5', ['NAME', 'B01003_001E'], years=[2018, 2019],
+                         geography='county:*', states=['01', '51'], base_url=base + '/data')
+    assert list(df.columns) == ['year', 'NAME', 'B01003_001E', 'state', 'county']
+    assert len(df) == 2 * 2 * 4 and stub.requests == 4
+    assert df['year'].tolist() == [2018] * 8 + [2019] * 8
+    assert df['state'].tolist()[:8] == ['01'] * 4 + ['51'] * 4
+    assert str(df['B01003_001E'].dtype) in ('int64', 'Int64', 'float64')
+
+
+def test_client_it_makes_is_closed(monkeypatch):
+    made = []
+
+    class Client(census.APIClient):
+        def close(self):
+            made.append(self)
+            super().close()
+
+    monkeypatch.setattr(census, 'APIClient', Client)
+    with serve({"/data/2019/pep/population": CensusStub()}) as base:
+        read_census('pep/population', ['NAME', 'POP'], 2019, base_url=base + '/data')
+    assert len(made) == 1
+    assert made[0]._loop is None
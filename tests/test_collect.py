@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from datapipe.collect import FrameCollector
+
+
+def test_chunks_build_one_frame():
+    collector = FrameCollector()
+    collector.add({'a': [1, 2], 'b': ['x', 'y']})
+    collector.add(pd.DataFrame({'b': ['z'], 'a': [3]}))
+    df = collector.to_frame()
+    assert df.to_dict('list') == {'a': [1, 2, 3], 'b': ['x', 'y', 'z']}
+
+
+def test_batches_are_written_to_path(tmp_path):
+    path = str(tmp_path / 'rows.csv')
+    with FrameCollector(path=path, batch_rows=2) as collector:
+        for i in range(5):
+            collector.add({'i': [i]})
+    assert pd.read_csv(path)['i'].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_existing_file_is_kept(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('keep me\n')
+    with pytest.raises(FileExistsError):
+        FrameCollector(path=str(path))
+    assert path.read_text() == 'keep me\n'
+
+
+def test_file_made_after_start_is_kept(tmp_path):
+    path = tmp_path / 'rows.csv'
+    collector = FrameCollector(path=str(path))
+    collector.add({'i': [1]})
+    path.write_text('keep me\n')
+    with pytest.raises(FileExistsError):
+        collector.flush()
+    assert path.read_text() == 'keep me\n'
+
+
+def test_overwrite_replaces_the_file(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('old\n')
+    with FrameCollector(path=str(path), overwrite=True) as collector:
+        collector.add({'i': [1, 2]})
+    assert pd.read_csv(path)['i'].tolist() == [1, 2]
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datapipe.fwf import read_fixed_width
+
+
+def _write(tmp_path, rows):
+    path = tmp_path / 'data.dat'
+    path.write_text(''.join(row + '\n' for row in rows))
+    return str(path)
+
+
+def test_matches_read_fwf(tmp_path):
+    path = _write(tmp_path, ['00120 -3.5 abc', '99999  1.0   x', '00007   2 de '])
+    widths = [5, 5, 4]
+    df = read_fixed_width(path, widths=widths)
+    pd.testing.assert_frame_equal(df, pd.read_fwf(path, widths=widths, header=None),
+                                  check_dtype=False)
+    assert df[0].dtype == np.int64 and df[1].dtype == np.float64
+
+
+@pytest.mark.parametrize('values', [
+    ['9007199254740993', '-9007199254740993'],
+    ['9223372036854775807', '-9223372036854775808'],
+    ['12345678901234567890', '1'],
+    ['1234567890123456789012345', '1'],
+    ['00000000000000000000000012', '-1'],
+])
+def test_wide_integers_stay_exact(tmp_path, values):
+    width = max(len(v) for v in values)
+    path = _write(tmp_path, [v.rjust(width) for v in values])
+    df = read_fixed_width(path, widths=[width])
+    expected = pd.read_fwf(path, widths=[width], header=None)
+    assert df[0].dtype == expected[0].dtype
+    assert df[0].tolist() == expected[0].tolist() == [int(v) for v in values]
+
+
+def test_forced_int_nulls_fractions(tmp_path):
+    path = _write(tmp_path, ['1.5', '2.0', '  3', '   ', '-4.', 'abc'])
+    df = read_fixed_width(path, widths=[3], dtypes={0: 'int'})
+    assert str(df[0].dtype) == 'Int64'
+    assert df[0].isna().tolist() == [True, False, False, True, False, True]
+    assert df[0].dropna().tolist() == [2, 3, -4]
+
+
+def test_forced_int_too_wide(tmp_path):
+    path = _write(tmp_path, ['12345678901234567890', '                   '])
+    with pytest.raises(ValueError, match='wider than 64 bits'):
+        read_fixed_width(path, widths=[20], dtypes={0: 'int'})
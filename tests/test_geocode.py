@@ -0,0 +1,56 @@
+import pandas as pd
+
+from benchmarks.bench_geocode import FakeGeocoder
+from datapipe.geocode import GeocodeStore, geocode_many, normalize_address
+
+ADDRESSES = ['60 Bonnycastle Drive, Charlottesville, VA 22904',
+             '60 BONNYCASTLE DR., Charlottesville, VA 22904',
+             '1 Court Square, Charlottesville, North Carolina',
+             '0 Nowhere Lane',
+             '60 Bonnycastle Dr Charlottesville VA 22904',
+             None]
+
+
+def test_one_lookup_per_distinct_address():
+    geocoder = FakeGeocoder(latency=0)
+    df = geocode_many(pd.Series(ADDRESSES, index=list('abcdef')), geocoder.geocode)
+    assert geocoder.calls == 3
+    assert df.index.tolist() == list('abcdef')
+    assert df['lat'].iloc[0] == df['lat'].iloc[1] == df['lat'].iloc[4]
+    assert df['status'].tolist() == ['ok', 'ok', 'ok', 'not_found', 'ok', 'not_found']
+
+
+def test_geocoder_gets_an_original_spelling():
+    sent = []
+
+    def geocode(address):
+        sent.append(address)
+        return []
+
+    geocode_many(ADDRESSES, geocode)
+    assert sorted(sent) == sorted(ADDRESSES[i] for i in (0, 2, 3))
+    assert normalize_address(ADDRESSES[2]) == '1 CT SQ CHARLOTTESVILLE N CAROLINA'
+
+
+def test_quota_stops_lookups():
+    geocoder = FakeGeocoder(latency=0)
+    df = geocode_many(ADDRESSES, geocoder.geocode, quota=1)
+    assert geocoder.calls == 1
+    assert df['status'].tolist() == ['ok', 'ok', 'quota', 'quota', 'ok', 'not_found']
+    assert df.loc[df['status'] == 'quota', 'lat'].isna().all()
+
+
+def test_store_answers_the_next_call(tmp_path):
+    path = str(tmp_path / 'geocodes.db')
+    geocoder = FakeGeocoder(latency=0)
+    with GeocodeStore(path) as store:
+        first = geocode_many(ADDRESSES, geocoder.geocode, store=store, quota=2)
+        assert len(store) == 2
+    with GeocodeStore(path) as store:
+        second = geocode_many(ADDRESSES, geocoder.geocode, store=store)
+        assert len(store) == 3
+    # Only the address left over by the quota is looked up again
+    assert geocoder.calls == 3
+    done = first['status'] != 'quota'
+    assert set(second.loc[done, 'status']) <= {'cached', 'not_found'}
+    pd.testing.assert_series_equal(first.loc[done, 'lat'], second.loc[done, 'lat'])
@@ -0,0 +1,40 @@
+import threading
+
+from benchmarks.fixtures import serve
+from datapipe import httpcache
+from datapipe.httpcache import HTTPCache
+
+
+def test_readers_survive_concurrent_eviction(tmp_path):
+    routes = {'/{}.csv'.format(i): 'x,y\n{},{}\n'.format(i, i * 2) for i in range(6)}
+    errors = []
+
+    def read(base, cache, i):
+        try:
+            for _ in range(40):
+                df = httpcache.read_csv('{}/{}.csv'.format(base, i), cache=cache)
+                assert df.values.tolist() == [[i, i * 2]]
+        except Exception as err:
+            errors.append(err)
+
+    with serve(routes) as base:
+        # Room for one file only, so every download evicts the others
+        cache = HTTPCache(str(tmp_path), max_bytes=1)
+        threads = [threading.Thread(target=read, args=(base, cache, i % 6)) for i in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        cache.close()
+    assert errors == []
+
+
+def test_pinned_file_outlives_its_entry(tmp_path):
+    with serve({'/a.csv': 'a\n1\n', '/b.csv': 'b\n2\n'}) as base:
+        cache = HTTPCache(str(tmp_path), max_bytes=1)
+        with cache.pinned(base + '/a.csv') as path:
+            cache.fetch(base + '/b.csv')
+            cache.clear()
+            assert open(path).read() == 'a\n1\n'
+        assert not (tmp_path / 'objects' / path.split('/')[-1]).exists()
+        cache.close()
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from datapipe import jsonio
+from datapipe.jsoncolumns import encode_json_columns, read_json_columns
+
+pytest.importorskip("pyarrow")
+
+
+def test_values_round_trip():
+    df = pd.DataFrame({'name': ['Leanne', 'Ervin'], 'id': [1, 2], 'score': [0.5, None]})
+    back = read_json_columns(encode_json_columns(df, orient='values', index=False),
+                             orient='values', columns=list(df.columns))
+    assert back['name'].tolist() == ['Leanne', 'Ervin']
+    assert back['id'].tolist() == [1, 2]
+    assert back['score'].iloc[0] == 0.5 and pd.isna(back['score'].iloc[1])
+
+
+def test_integers_wider_than_64_bits_stay_exact():
+    wide = 123456789012345678901234567890
+    df = read_json_columns('[[1,{}],[2,-5]]'.format(wide).encode(), orient='values')
+    assert df[0].tolist() == [1, 2]
+    assert df[1].tolist() == [wide, -5]
+    assert type(df[1].iloc[0]) is int
+
+
+@pytest.mark.parametrize('value', [2**64 + 1, -2**63 - 1, 10**30, -10**30])
+def test_jsonio_loads_keeps_wide_integers(value):
+    assert jsonio.loads('{"n": %d, "x": 0.5}' % value) == {'n': value, 'x': 0.5}
+    assert jsonio.loads(str(value)) == value
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from datapipe.jsonl import read_jsonl, write_jsonl
+
+
+def _frame():
+    return pd.DataFrame({'name': ['Zoë', 'Ervin', 'Łukasz', None, 'Ann'],
+                         'n': [1, 2, 3, 4, 5],
+                         'when': pd.date_range('2020-01-01', periods=5, freq='D')})
+
+
+def test_output_matches_to_json(tmp_path):
+    df = _frame()
+    path = tmp_path / 'users.jsonl'
+    write_jsonl(df, str(path), chunk_rows=2)
+    expected = df.to_json(orient='records', lines=True, date_format='iso')
+    assert path.read_bytes().decode('ascii') == expected.rstrip('\n') + '\n'
+
+
+def test_force_ascii_false_writes_utf8(tmp_path):
+    path = tmp_path / 'users.jsonl'
+    write_jsonl(_frame(), str(path), force_ascii=False)
+    assert 'Zoë' in path.read_text(encoding='utf-8')
+
+
+def test_round_trip(tmp_path):
+    df = _frame()
+    path = str(tmp_path / 'users.jsonl.gz')
+    write_jsonl(df, path, chunk_rows=2)
+    back = read_jsonl(path, workers=1)
+    assert back['name'].tolist()[:3] == ['Zoë', 'Ervin', 'Łukasz']
+    assert back['n'].tolist() == [1, 2, 3, 4, 5]
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from datapipe.jsonpath import PathExtractor
+
+
+def test_wrong_typed_values_become_null():
+    extract = PathExtractor({'n': 'a.n', 'x': 'a.x'}, dtypes={'n': 'int64', 'x': 'float64'})
+    df = extract([{'a': {'n': 1, 'x': 0.5}}, {'a': {'n': 3.0, 'x': '2'}},
+                  {'a': {'n': 3.7, 'x': 'two'}}, {'a': {'n': '3'}}, {'a': {'n': True}},
+                  {'a': {'n': 2**70}}, {'a': None}, {}])
+    assert df['n'].dtype == 'Int64'
+    assert df['n'].tolist()[:2] == [1, 3]
+    assert df['n'].isna().tolist() == [False, False] + [True] * 6
+    assert df['x'].tolist()[:2] == [0.5, 2.0]
+    assert df['x'].iloc[2:].isna().all()
+
+
+def test_list_indexes_and_column_names():
+    extract = PathExtractor({'first': 'tags.0', 'name': 'name'})
+    df = extract([{'tags': ['a', 'b'], 'name': 'x'}, {'tags': [], 'name': 'y'}])
+    pd.testing.assert_frame_equal(df, pd.DataFrame({'first': ['a', None], 'name': ['x', 'y']}),
+                                  check_dtype=False)
+
+
+def test_bool_takes_only_booleans_and_zero_or_one():
+    extract = PathExtractor(['b'], dtypes={'b': 'bool'})
+    df = extract([{'b': True}, {'b': False}, {'b': 1}, {'b': 0.0}, {'b': 0.7}, {'b': 2},
+                  {'b': '1'}, {'b': {'x': 1}}, {'b': None}, {}])
+    assert df['b'].dtype == 'boolean'
+    assert df['b'].tolist()[:4] == [True, False, True, False]
+    assert df['b'].iloc[4:].isna().all()
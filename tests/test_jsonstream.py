@@ -0,0 +1,89 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from datapipe.jsonstream import normalize_stream
+
+LISTING = {
+    'kind': 'Listing',
+    'data': {
+        'after': 't3_abc',
+        'children': [
+            {'kind': 't3', 'data': {'score': 12.5, 'ups': -3e-7, 'n': 123456789,
+                                    'big': 1E+21, 'title': 'a "quoted" title', 'ok': True,
+                                    'none': None, 'tags': ['x', 'y']}},
+            {'kind': 't3', 'data': {'score': 0.125, 'ups': 7, 'n': -0, 'big': 2.5e-10,
+                                    'title': 'café', 'ok': False, 'none': None,
+                                    'tags': []}},
+        ],
+        'dist': 1234.5678,
+    },
+}
+
+
+class Trickle(io.StringIO):
+    """A text stream whose reads return at most `step` characters"""
+
+    def __init__(self, text, step):
+        super().__init__(text)
+        self.step = step
+
+    def read(self, size=-1):
+        return super().read(self.step if size is None or size < 0 else min(size, self.step))
+
+
+@pytest.mark.parametrize('step', range(1, 8))
+def test_block_boundaries_inside_every_token(step):
+    # With reads this short every value is cut at every position at some point
+    text = json.dumps(LISTING, indent=1)
+    df = normalize_stream(Trickle(text, step), record_path=['data', 'children'],
+                          meta=['kind', ['data', 'after'], ['data', 'dist']],
+                          meta_prefix='meta', blocksize=1)
+    expected = pd.json_normalize(LISTING, record_path=['data', 'children'],
+                                 meta=['kind', ['data', 'after'], ['data', 'dist']],
+                                 meta_prefix='meta')
+    pd.testing.assert_frame_equal(df, expected)
+
+
+STATES = [
+    {'state': 'Florida', 'shortname': 'FL', 'info': {'governor': 'Rick Scott'},
+     'counties': [{'name': 'Dade', 'population': 12345},
+                  {'name': 'Broward', 'population': 40000},
+                  {'name': 'Palm Beach', 'population': 60000}]},
+    {'counties': [{'name': 'Summit', 'population': 1234},
+                  {'name': 'Cuyahoga', 'population': 1337}],
+     'info': {'governor': 'John Kasich'}, 'state': 'Ohio', 'shortname': 'OH'},
+]
+SHELVES = {'library': 'main', 'shelves': [
+    {'shelf': 1, 'books': [{'title': 'a', 'copies': [{'id': 1}, {'id': 2}]},
+                           {'title': 'b', 'copies': []}]},
+    {'books': [{'title': 'c', 'copies': [{'id': 3}]}], 'shelf': 2},
+    {'shelf': 3, 'books': []},
+]}
+
+
+@pytest.mark.parametrize('data, args', [
+    (STATES, dict(record_path='counties', meta=['state', 'shortname', ['info', 'governor']])),
+    (STATES, dict(record_path=['counties'], meta=['state'], meta_prefix='m.',
+                  record_prefix='r.')),
+    ({'states': STATES}, dict(record_path=['states', 'counties'],
+                              meta=[['states', 'state'], ['states', 'info', 'governor']])),
+    (SHELVES, dict(record_path=['shelves', 'books', 'copies'],
+                   meta=['library', ['shelves', 'shelf'], ['shelves', 'books', 'title']])),
+])
+@pytest.mark.parametrize('step', [1, 3, 1000])
+def test_arrays_along_record_path_match_json_normalize(data, args, step):
+    df = normalize_stream(Trickle(json.dumps(data), step), blocksize=1, **args)
+    pd.testing.assert_frame_equal(df, pd.json_normalize(data, **args))
+
+
+def test_missing_meta_per_parent():
+    data = [{'state': 'Florida', 'counties': [{'name': 'Dade'}]},
+            {'counties': [{'name': 'Summit'}]}]
+    df = normalize_stream(json.dumps(data).encode(), 'counties', ['state'], errors='ignore')
+    assert df['name'].tolist() == ['Dade', 'Summit']
+    assert df['state'].iloc[0] == 'Florida' and pd.isna(df['state'].iloc[1])
+    with pytest.raises(KeyError, match='state'):
+        normalize_stream(json.dumps(data).encode(), 'counties', ['state'])
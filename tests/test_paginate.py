@@ -0,0 +1,62 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from benchmarks.bench_paginate import FakeSearch
+from datapipe.paginate import PageCursor
+
+PATHS = {'id': 'id', 'user': 'user.screen_name'}
+
+
+def test_pages_come_out_in_order():
+    search = FakeSearch(pages=5, per_page=7, latency=0.001)
+    cursor = PageCursor(search.search, PATHS, attributes=True, prefetch=3)
+    df = cursor.to_frame()
+    assert df['id'].tolist() == list(range(34, -1, -1))
+    assert df.index.tolist() == list(range(35))
+    assert cursor.pages == 5 and search.calls == 5
+
+
+def test_limit_cuts_the_last_page():
+    search = FakeSearch(pages=5, per_page=10, latency=0)
+    df = PageCursor(search.search, PATHS, attributes=True).to_frame(limit=25)
+    assert df['id'].tolist() == list(range(49, 24, -1))
+
+
+def test_fetch_error_is_raised_in_the_loop():
+    def pages():
+        yield [{'id': 1}]
+        yield [{'id': 2}]
+        raise ConnectionError("page 3")
+
+    seen = []
+    with pytest.raises(ConnectionError, match="page 3"):
+        for df in PageCursor(pages(), {'id': 'id'}):
+            seen.extend(df['id'])
+    assert seen == [1, 2]
+
+
+def _other_threads():
+    return {t for t in threading.enumerate() if t.name != threading.current_thread().name}
+
+
+def test_leaving_early_stops_the_prefetch_thread():
+    fetched = []
+
+    def pages():
+        for i in itertools.count():
+            fetched.append(i)
+            yield [{'id': i}]
+
+    before = _other_threads()
+    frames = PageCursor(pages(), {'id': 'id'}, prefetch=2).frames()
+    assert next(frames)['id'].tolist() == [0]
+    frames.close()
+    deadline = time.monotonic() + 5
+    while _other_threads() - before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _other_threads() - before
+    # The thread read no further than the queue allows
+    assert len(fetched) <= 1 + 2 + 1
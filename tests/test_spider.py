@@ -0,0 +1,60 @@
+import random
+
+import pandas as pd
+import pytest
+import requests
+
+from benchmarks.fixtures import playlist_html, serve
+from datapipe.spider import playlist_columns, wnrn_spider_many, wnrn_update
+
+pytest.importorskip("bs4")
+
+
+def test_failed_update_is_redone(tmp_path):
+    state, path = str(tmp_path / 'state.db'), str(tmp_path / 'spins.csv')
+    links = ['/WNRN/pl/{}/'.format(i) for i in range(3)]
+    routes = {link: playlist_html(5, seed=i) for i, link in enumerate(links)}
+    routes['/WNRN'] = playlist_html(0, links=links)
+    good = routes[links[2]]
+    routes[links[2]] = lambda params: (500, {}, 'down')
+
+    with serve(routes) as base:
+        with pytest.raises(requests.HTTPError):
+            wnrn_update(state, url=base + '/WNRN', path=path)
+        routes[links[2]] = good
+        spins = wnrn_update(state, url=base + '/WNRN', path=path)
+        assert len(spins) == 15
+        assert len(pd.read_csv(path)) == 15
+        # Nothing changed since, so nothing is new
+        assert len(wnrn_update(state, url=base + '/WNRN', path=path)) == 0
+    assert len(pd.read_csv(path)) == 15
+
+
+@pytest.mark.parametrize('inner', [
+    'x', '<![CDATA[x]]>', 'A</div>B', 'x<?pi?>', '<?pi?>', '<!---->', '  \n  ', 'A</br>B',
+    '<b>x</b>', 'a&amp;b', '<!DOCTYPE html>',
+])
+def test_fast_parser_matches_soup(inner):
+    html = '<td class="spin-time">1</td><span class="artist">{}</span>'.format(inner)
+    assert playlist_columns(html) == playlist_columns(html, fast=False)
+
+
+def test_fast_parser_matches_soup_on_broken_markup():
+    tokens = ['<span class="artist">', '<span class="song x">', '<td class="spin-time">',
+              '<span>', '</span>', '</td>', '<div>', '</div>', '<br>', '</br>', '<br/>', '<b/>',
+              '<pre>', '</pre>', '<textarea>', 'x', ' ', '\n', '&amp;', '<!--c-->',
+              '<![CDATA[z]]>', '<?p?>']
+    rng = random.Random(0)
+    for _ in range(2000):
+        html = ''.join(rng.choice(tokens) for _ in range(rng.randint(1, 12)))
+        assert playlist_columns(html) == playlist_columns(html, fast=False), html
+
+
+def test_spider_many_to_path_returns_the_row_count(tmp_path):
+    routes = {'/pl/{}'.format(i): playlist_html(5, seed=i) for i in range(3)}
+    path = str(tmp_path / 'spins.csv')
+    with serve(routes) as base:
+        urls = ['{}/pl/{}'.format(base, i) for i in range(3)]
+        assert wnrn_spider_many(urls, path=path) == 15
+        expected = wnrn_spider_many(urls)
+    pd.testing.assert_frame_equal(pd.read_csv(path), expected, check_dtype=False)